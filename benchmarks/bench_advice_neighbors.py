@@ -0,0 +1,87 @@
+"""
+基准测试：在 N 个历史系统状态中查找最相近的 k 个，KD树与线性扫描的单次查询延迟
+
+历史状态为 (CPU, 内存, 磁盘) 使用率，围绕若干个"常见负载"聚集（与长期运行的机器上积累的分析记录相近）。
+"numpy 线性扫描" 为对全部向量计算距离后 argpartition，"纯Python" 为没有安装 numpy 时的退化实现。
+每个规模下都会核对KD树与线性扫描的结果一致。
+
+用法:
+    python benchmarks/bench_advice_neighbors.py [--sizes 1000,10000,100000] [--queries 2000] [--k 3]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.advice_neighbors import KDTree, _linear_query, np
+
+
+def make_states(count: int, seed: int = 0):
+    """生成聚集在若干负载附近的使用率向量"""
+    rng = random.Random(seed)
+    centers = [(rng.uniform(5, 95), rng.uniform(20, 95), rng.uniform(10, 95)) for _ in range(20)]
+    states = []
+    for _ in range(count):
+        center = rng.choice(centers)
+        states.append(tuple(min(100.0, max(0.0, round(rng.gauss(value, 6), 1))) for value in center))
+    return states
+
+
+def latencies_us(query, points, repeat: int = 1):
+    """每次查询的延迟（微秒）"""
+    result = []
+    for point in points:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            query(point)
+        result.append((time.perf_counter() - start) * 1e6 / repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    if np is None:
+        print("需要安装numpy: pip install numpy")
+        return
+
+    queries = make_states(args.queries, seed=1)
+    print(f"k={args.k}，每个规模 {args.queries} 次查询")
+    print(f"{'历史状态数':>10}{'建树 (ms)':>11}{'KD树 p50 (us)':>15}{'KD树 p99 (us)':>15}"
+          f"{'numpy扫描 p50':>15}{'纯Python p50':>15}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        states = make_states(size)
+        start = time.perf_counter()
+        tree = KDTree(states)
+        build_ms = (time.perf_counter() - start) * 1000
+        data = np.asarray(states)
+
+        def brute(point):
+            d = ((data - point) ** 2).sum(axis=1)
+            keep = np.argpartition(d, args.k - 1)[:args.k]
+            return keep[np.argsort(d[keep])]
+
+        for point in queries[:200]:
+            expected = sorted(_linear_query(states, point, args.k))
+            got = tree.query(point, args.k)
+            assert [round(d, 9) for d, _ in got] == [round(d, 9) for d, _ in expected], (point, got, expected)
+
+        tree_us = sorted(latencies_us(lambda p: tree.query(p, args.k), queries))
+        brute_us = latencies_us(brute, queries)
+        python_queries = queries[:max(1, args.queries * 1000 // size // 10)]
+        python_us = latencies_us(lambda p: _linear_query(states, p, args.k), python_queries)
+        print(f"{size:>10}{build_ms:>11.1f}{statistics.median(tree_us):>15.1f}"
+              f"{tree_us[int(len(tree_us) * 0.99)]:>15.1f}{statistics.median(brute_us):>15.1f}"
+              f"{statistics.median(python_us):>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+基准测试：为 N 台主机逐个调用 auto_advise() 与用 advise_batch() / advise_batch_async() 并发生成建议的总耗时
+
+使用 bench_llm_client.py 中的桩服务，--token-ms 模拟模型逐个生成token的耗时（完整回复约为 9 倍）。
+建议缓存和相近历史分析在测试中关闭，保证每台主机都请求一次LLM；历史记录写入临时目录。
+--rpm 不为0时同时验证限速：结果的总耗时不会少于 N / rpm 分钟（减去初始的突发配额）。
+
+用法:
+    python benchmarks/bench_advise_batch.py [--hosts 200] [--concurrency 16] [--token-ms 20] [--rpm 0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_llm_client import start_stub_server
+from core.advisor import Advisor
+from core.history_manager import get_manager
+from core.llm_client import openai
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--rpm", type=float, default=0)
+    args = parser.parse_args()
+
+    if openai is None:
+        print("需要安装openai库: pip install openai")
+        return
+
+    server, base_url, connections = start_stub_server(0, args.token_ms / 1000)
+    workdir = tempfile.mkdtemp(prefix="bench_advise_batch_")
+    config_path = os.path.join(workdir, "settings.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "llm": {"api_key": "sk-stub", "base_url": base_url, "max_retries": 0,
+                    "max_connections": args.concurrency, "requests_per_minute": args.rpm or None},
+            "advice_cache": {"enabled": False},
+            "advice_neighbors": {"enabled": False}
+        }, f)
+    get_manager(history_path=os.path.join(workdir, "history.json"))
+    advisor = Advisor(config_path)
+
+    statuses = {f"host{i:04d}": {"host": f"host{i:04d}", "cpu": i % 100, "memory": 50, "disk": 30}
+                for i in range(args.hosts)}
+    print(f"{args.hosts} 台主机，每个token {args.token_ms:.0f} ms，并发 {args.concurrency}"
+          + (f"，限速 {args.rpm:.0f} 次/分钟" if args.rpm else ""))
+
+    serial_hosts = list(statuses.items())[:max(1, args.hosts // 10)]
+    start = time.perf_counter()
+    for _, status in serial_hosts:
+        advisor.auto_advise(status)
+    per_call = (time.perf_counter() - start) / len(serial_hosts)
+    print(f"{'逐个调用 auto_advise（按前 %d 台外推）' % len(serial_hosts):<36}{per_call * args.hosts:>8.2f} s")
+
+    start = time.perf_counter()
+    results = list(advisor.advise_batch(statuses, args.concurrency))
+    first = min(result["elapsed"] for result in results)
+    print(f"{'advise_batch（线程池）':<36}{time.perf_counter() - start:>8.2f} s"
+          f"  成功 {sum(result['ok'] for result in results)}/{len(results)}，最快一个 {first * 1000:.0f} ms")
+
+    async def run_async():
+        count = 0
+        async for result in advisor.advise_batch_async(statuses, args.concurrency):
+            count += result["ok"]
+        return count
+
+    start = time.perf_counter()
+    ok = asyncio.run(run_async())
+    print(f"{'advise_batch_async（事件循环）':<36}{time.perf_counter() - start:>8.2f} s  成功 {ok}/{args.hosts}")
+    if advisor.rate_limiter is not None:
+        print(f"限速等待: {advisor.rate_limiter.stats()}")
+
+    advisor.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+基准测试：单个asyncio汇总服务接收大量本机回环代理的1Hz推送
+
+用法:
+    python benchmarks/bench_fleet.py [--agents 1000] [--seconds 10] [--unix /tmp/fleet.sock]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.fleet import FleetAggregator, run_async_agent
+
+
+def fake_status():
+    """生成随机状态，避免基准测试受本机采样影响"""
+    return {
+        "cpu": random.uniform(0, 100),
+        "memory": random.uniform(0, 100),
+        "disk": random.uniform(0, 100),
+        "network_sent_rate": random.uniform(0, 1e6),
+        "network_recv_rate": random.uniform(0, 1e6),
+        "details": {"process_count": random.randint(100, 500)}
+    }
+
+
+async def main(agents: int, seconds: float, unix_path: str = None):
+    aggregator = FleetAggregator()
+    address = await aggregator.start(path=unix_path)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(run_async_agent(address, f"host-{i:05d}", 1.0, fake_status, count=int(seconds)))
+        for i in range(agents)
+    ]
+    await asyncio.gather(*tasks)
+    await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    t = time.perf_counter()
+    top = aggregator.top_hosts("cpu", 5)
+    query_ms = (time.perf_counter() - t) * 1000
+    await aggregator.stop()
+
+    print(f"代理数: {agents}, 帧数: {aggregator.frames}, 错误: {aggregator.errors}")
+    print(f"耗时 {elapsed:.1f}s, 进程CPU时间 {cpu:.2f}s（含模拟代理）, 每帧 {cpu / max(aggregator.frames, 1) * 1e6:.0f} us")
+    print(f"top_hosts('cpu', 5) 用时 {query_ms:.2f} ms: {[(h, round(v, 1)) for h, v in top]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--unix", default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.agents, args.seconds, args.unix))
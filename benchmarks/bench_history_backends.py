@@ -0,0 +1,84 @@
+"""
+基准测试：json / journal / sqlite 三种历史存储后端在大量对话下的追加、列表和加载延迟
+
+用法:
+    python benchmarks/bench_history_backends.py [--conversations 10000] [--messages 4] [--rounds 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.history_manager import HistoryManager
+
+
+def make_conversations(count: int, messages: int):
+    """生成测试对话，消息内容长度与真实的分析建议相近"""
+    for i in range(count):
+        timestamp = f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"
+        yield {
+            "id": f"conv_{i:08d}",
+            "title": f"系统性能分析 {i}",
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "messages": [
+                {"role": "user" if k % 2 == 0 else "assistant", "content": "CPU使用率偏高，建议检查后台进程。" * 20,
+                 "timestamp": timestamp}
+                for k in range(messages)
+            ]
+        }
+
+
+def measure(func, rounds: int) -> float:
+    """返回每次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="history-bench-")
+    ids = [f"conv_{i:08d}" for i in range(args.conversations)]
+    print(f"{args.conversations} 个对话，每个 {args.messages} 条消息")
+    print(f"{'后端':<10}{'导入 (s)':>10}{'追加 (ms)':>12}{'列表 (ms)':>12}{'加载 (ms)':>12}{'冷启动 (ms)':>14}")
+    try:
+        for storage, filename in (("json", "history.json"), ("journal", "journal.json"), ("sqlite", "history.db")):
+            path = os.path.join(directory, filename)
+            manager = HistoryManager(path, storage)
+
+            start = time.perf_counter()
+            manager.store.bulk_create(make_conversations(args.conversations, args.messages))
+            imported = time.perf_counter() - start
+
+            # 整文件后端每次追加都要重写全部数据，减少轮数
+            rounds = max(1, args.rounds // 20) if storage == "json" else args.rounds
+            append = measure(lambda: manager.add_message(random.choice(ids), "user", "新问题"), rounds)
+            listing = measure(manager.get_history_list, max(1, rounds // 10))
+            load = measure(lambda: manager.switch_conversation(random.choice(ids)), rounds)
+            manager.close()
+
+            start = time.perf_counter()
+            manager = HistoryManager(path, storage)
+            manager.switch_conversation(ids[0])
+            cold = (time.perf_counter() - start) * 1000
+            manager.close()
+
+            print(f"{storage:<10}{imported:>10.2f}{append:>12.3f}{listing:>12.2f}{load:>12.3f}{cold:>14.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
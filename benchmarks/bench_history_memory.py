@@ -0,0 +1,98 @@
+"""
+基准测试：json/journal 后端常驻内存的对话状态，原有字典格式与紧凑模型（core.history_model）的内存占用对比
+
+两种格式都从同一份JSON解析得到（与加载 history.json 时相同），消息内容字符串两者共享，
+差值即为每条消息的结构开销。
+
+用法:
+    python benchmarks/bench_history_memory.py [--conversations 10000] [--messages 100]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.history_store import _ConversationState
+
+
+def make_document(conversations: int, messages: int) -> str:
+    """生成与 history.json 结构相同的JSON文本"""
+    convs = []
+    for i in range(conversations):
+        timestamp = f"2024-01-{i % 28 + 1:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+        convs.append({
+            "id": f"conv_{i:08d}",
+            "title": f"系统性能分析 {i}",
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "messages": [
+                {"role": "user" if k % 2 == 0 else "assistant", "content": f"消息内容 {i}-{k}",
+                 "timestamp": timestamp[:-2] + f"{k % 60:02d}"}
+                for k in range(messages)
+            ]
+        })
+    return json.dumps({"conversations": convs}, ensure_ascii=False)
+
+
+def measure(build):
+    """返回 (常驻内存字节数, 构建耗时秒, 结果)；耗时在未开启 tracemalloc 时单独测量"""
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=100)
+    args = parser.parse_args()
+    total = args.conversations * args.messages
+
+    document = make_document(args.conversations, args.messages)
+    print(f"{args.conversations} 个对话 x {args.messages} 条消息 = {total} 条消息，JSON {len(document) / 1e6:.0f} MB")
+
+    def content_only():
+        # 只保留消息内容字符串，作为两种格式共同的基线
+        data = json.loads(document)
+        return [m["content"] for conv in data["conversations"] for m in conv["messages"]]
+
+    baseline, _, contents = measure(content_only)
+    del contents
+
+    legacy, legacy_time, data = measure(lambda: json.loads(document)["conversations"])
+    del data
+
+    def compact():
+        state = _ConversationState()
+        state.load(json.loads(document)["conversations"])
+        return state
+
+    model, model_time, state = measure(compact)
+
+    start = time.perf_counter()
+    for conv_id in list(state.conversations)[:1000]:
+        state.get(conv_id)
+    to_dict = (time.perf_counter() - start) / min(1000, args.conversations) * 1000
+
+    print(f"{'格式':<8}{'内存 (MB)':>12}{'每条消息 (B)':>16}{'结构开销 (B/条)':>18}{'加载 (s)':>10}")
+    for name, size, elapsed in (("字典", legacy, legacy_time), ("紧凑模型", model, model_time)):
+        print(f"{name:<8}{size / 1e6:>12.1f}{size / total:>16.0f}{(size - baseline) / total:>18.0f}{elapsed:>10.2f}")
+    print(f"每条消息节省 {(legacy - model) / total:.0f} 字节（{(1 - model / legacy) * 100:.0f}%）；"
+          f"get() 转换为字典 {to_dict:.3f} ms/对话（{args.messages} 条消息）")
+
+
+if __name__ == "__main__":
+    main()
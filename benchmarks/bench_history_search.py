@@ -0,0 +1,101 @@
+"""
+基准测试：历史消息全文检索索引的建立、增量写入、查询延迟以及保存/加载耗时
+
+词表按Zipf分布抽样（少数高频词 + 大量低频词），中英文混合，接近真实的分析建议文本。
+
+用法:
+    python benchmarks/bench_history_search.py [--messages 100000] [--queries 200]
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.history_search import SearchIndex
+
+
+def make_vocabulary(rng: random.Random, size: int):
+    """生成词表：中文词由常用汉字区间内的2~4个字组成，英文词为小写字母串"""
+    words = []
+    for i in range(size):
+        if i % 4 == 0:
+            words.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))))
+        else:
+            words.append("".join(chr(rng.randint(0x4e00, 0x4e00 + 3000)) for _ in range(rng.randint(2, 4))))
+    return words
+
+
+def make_message(rng: random.Random, words, cum_weights, length: int) -> str:
+    parts = rng.choices(words, cum_weights=cum_weights, k=length)
+    # 英文词之间需要空格，中文词直接相连
+    return "".join(w if "一" <= w[0] else f" {w} " for w in parts)
+
+
+def measure(func, rounds: int) -> float:
+    """返回每次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=20000, help="词表大小")
+    parser.add_argument("--length", type=int, default=40, help="每条消息的词数")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = make_vocabulary(rng, args.words)
+    weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(args.messages):
+        index.add(f"conv_{i // 10:08d}", i % 10, make_message(rng, words, weights, args.length))
+    build = time.perf_counter() - start
+    print(f"{args.messages} 条消息，{len(index._postings)} 个词项，建立索引 {build:.1f} s "
+          f"（{build / args.messages * 1e6:.0f} us/条）")
+
+    # 查询：高频词、中频词、低频词、两词组合、中英混合
+    buckets = {
+        "高频词": words[1:50],
+        "中频词": words[200:2000],
+        "低频词": words[5000:],
+    }
+    for name, pool in buckets.items():
+        queries = [rng.choice(pool) for _ in range(args.queries)]
+        it = iter(queries * 2)
+        print(f"  查询 {name:<8}{measure(lambda: index.query(next(it), 10), args.queries):8.2f} ms")
+    pairs = [f"{rng.choice(words[:500])} {rng.choice(words[:5000])}" for _ in range(args.queries)]
+    it = iter(pairs)
+    print(f"  查询 {'两词组合':<8}{measure(lambda: index.query(next(it), 10), args.queries):8.2f} ms")
+
+    counter = iter(range(10 ** 9))
+    append = measure(lambda: index.add("conv_new", next(counter), make_message(rng, words, weights, args.length)), 1000)
+    print(f"  增量写入      {append:8.3f} ms/条")
+
+    directory = tempfile.mkdtemp(prefix="search-bench-")
+    try:
+        path = os.path.join(directory, "history.json.search")
+        start = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        SearchIndex(path).load()
+        loaded = time.perf_counter() - start
+        print(f"  保存 {saved:.2f} s，加载 {loaded:.2f} s，文件 {os.path.getsize(path) / 1e6:.1f} MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
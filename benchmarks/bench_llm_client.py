@@ -0,0 +1,189 @@
+"""
+基准测试：每次调用新建 openai 客户端（原来的做法）与复用 LLMClientPool 的单次调用延迟，
+以及流式调用（Advisor.user_advise_stream）的首个片段延迟
+
+在本机启动一个兼容 OpenAI 接口的桩服务（/v1/chat/completions 返回固定回复，stream=true 时以SSE逐段返回），
+--handshake-ms 在每个新连接上额外等待，模拟访问远程API时TCP+TLS握手的往返时间；
+--token-ms 为流式回复中每个片段之间的间隔，模拟模型逐个生成token。
+
+用法:
+    python benchmarks/bench_llm_client.py [--calls 200] [--handshake-ms 30] [--threads 8] [--token-ms 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.llm_client import LLMClientPool, openai
+
+
+REPLY_TOKENS = ["建议", "：", "关闭", "不需要", "的", "后台", "进程", "。"]
+
+REPLY = json.dumps({
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(REPLY_TOKENS)},
+                 "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 50, "completion_tokens": 10, "total_tokens": 60}
+}, ensure_ascii=False).encode("utf-8")
+
+
+def stream_events(tokens):
+    """流式回复的SSE事件"""
+    for i, token in enumerate(tokens + [None]):
+        delta = {"content": token} if token is not None else {}
+        chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": None if token is not None else "stop"}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+    yield b"data: [DONE]\n\n"
+
+
+def start_stub_server(handshake: float, token_delay: float = 0.0):
+    """
+    启动桩服务
+
+    Args:
+        handshake: 每个新连接额外等待的时间（秒）
+        token_delay: 流式回复中每个片段之间的间隔（秒）
+
+    Returns:
+        (server, base_url, 连接计数器)
+    """
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 头部和正文分两次写出，不关闭Nagle时会叠加客户端的延迟ACK（约40ms）
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            connections.append(1)
+            time.sleep(handshake)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for event in stream_events(REPLY_TOKENS):
+                        time.sleep(token_delay)
+                        self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端取消了流式请求
+                    self.close_connection = True
+                return
+            # 非流式回复在全部token生成后才返回
+            time.sleep(token_delay * (len(REPLY_TOKENS) + 1))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(REPLY)))
+            self.end_headers()
+            self.wfile.write(REPLY)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1", connections
+
+
+def request_params():
+    return {"model": "stub", "messages": [{"role": "user", "content": "CPU使用率 95%"}], "max_tokens": 100}
+
+
+def measure(call, calls: int, threads: int = 1):
+    """返回每次调用的延迟列表（毫秒）和总耗时（秒）"""
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        latencies = list(executor.map(timed, range(calls)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    if openai is None:
+        print("需要安装openai库: pip install openai")
+        return
+
+    server, base_url, connections = start_stub_server(args.handshake_ms / 1000)
+    llm_config = {"api_key": "sk-stub", "base_url": base_url, "max_retries": 0}
+
+    def new_client_call():
+        # 原来的 _call_openai：每次调用构建客户端
+        client = openai.OpenAI(api_key="sk-stub", base_url=base_url, max_retries=0)
+        try:
+            client.chat.completions.create(**request_params())
+        finally:
+            client.close()
+
+    pool = LLMClientPool(llm_config)
+
+    def pooled_call():
+        pool.get().chat.completions.create(**request_params())
+
+    print(f"{args.calls} 次调用，模拟握手 {args.handshake_ms:.0f} ms")
+    print(f"{'方式':<20}{'线程':>6}{'p50 (ms)':>10}{'p95 (ms)':>10}{'平均 (ms)':>10}{'总耗时 (s)':>12}{'新建连接':>10}")
+    for name, call, threads in (("每次新建客户端", new_client_call, 1), ("复用连接池", pooled_call, 1),
+                                ("每次新建客户端", new_client_call, args.threads),
+                                ("复用连接池", pooled_call, args.threads)):
+        before = len(connections)
+        latencies, elapsed = measure(call, args.calls, threads)
+        latencies.sort()
+        print(f"{name:<20}{threads:>6}{latencies[len(latencies) // 2]:>10.2f}"
+              f"{latencies[int(len(latencies) * 0.95)]:>10.2f}{statistics.mean(latencies):>10.2f}"
+              f"{elapsed:>12.2f}{len(connections) - before:>10}")
+
+    pool.close()
+    server.shutdown()
+
+    # 流式：首个片段的延迟与等待完整回复的延迟
+    server, base_url, _ = start_stub_server(0, args.token_ms / 1000)
+    pool = LLMClientPool({"api_key": "sk-stub", "base_url": base_url, "max_retries": 0})
+    calls = max(1, args.calls // 10)
+    full, first = [], []
+    for _ in range(calls):
+        start = time.perf_counter()
+        pool.get().chat.completions.create(**request_params())
+        full.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        stream = pool.get().chat.completions.create(stream=True, **request_params())
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                first.append((time.perf_counter() - start) * 1000)
+                break
+        stream.close()
+    print(f"\n每个token间隔 {args.token_ms:.0f} ms，{len(REPLY_TOKENS)} 个token，{calls} 次调用")
+    print(f"非流式等待完整回复 p50 {statistics.median(full):.1f} ms；流式首个片段 p50 {statistics.median(first):.1f} ms")
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
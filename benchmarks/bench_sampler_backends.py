@@ -0,0 +1,54 @@
+"""
+基准测试：psutil 与 /proc 快速路径两种采样数据源的单次采样开销
+
+用法:
+    python benchmarks/bench_sampler_backends.py [--rounds 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.procfs import ProcfsCollector
+from core.system_monitor import Sampler
+
+
+def measure(func, rounds: int) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    try:
+        ProcfsCollector().close()
+    except OSError as e:
+        print(f"procfs不可用: {e}")
+        return
+
+    samplers = {name: Sampler(backend=name) for name in ("psutil", "procfs")}
+    print(f"{'指标':<22}{'psutil (us)':>14}{'procfs (us)':>14}")
+    for label, call in (
+        ("cpu_times()", lambda b: b.cpu_times()),
+        ("virtual_memory()", lambda b: b.virtual_memory()),
+        ("net_io_counters()", lambda b: b.net_io_counters(pernic=True)),
+    ):
+        costs = [measure(lambda: call(samplers[name].backend), args.rounds) for name in ("psutil", "procfs")]
+        print(f"{label:<22}{costs[0]:>14.1f}{costs[1]:>14.1f}")
+
+    rounds = max(1, args.rounds // 10)
+    costs = [measure(samplers[name].sample, rounds) for name in ("psutil", "procfs")]
+    print(f"{'Sampler.sample()':<22}{costs[0]:>14.1f}{costs[1]:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
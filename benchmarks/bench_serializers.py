@@ -0,0 +1,96 @@
+"""
+基准测试：json/journal 后端文件格式的编码、解码吞吐量和文件大小
+
+编码的输入与存储落盘时相同（内存中的紧凑模型），解码包括结构校验，
+"加载" 为解码后再构建内存状态（即冷启动读取 history.json 的全部耗时）。
+未安装的可选序列化器（orjson / msgspec）会被跳过。
+
+用法:
+    python benchmarks/bench_serializers.py [--conversations 2000] [--messages 50] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.history_model import Conversation
+from core.history_store import _ConversationState
+from core.serializers import SERIALIZERS, JsonSerializer, get_serializer, orjson, msgspec
+
+
+def make_conversations(conversations: int, messages: int):
+    """生成与 history.json 结构相同的对话（紧凑模型）"""
+    result = []
+    for i in range(conversations):
+        timestamp = f"2024-01-{i % 28 + 1:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+        result.append(Conversation.from_dict({
+            "id": f"conv_{i:08d}",
+            "title": f"系统性能分析 {i}",
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "messages": [
+                {"role": "user" if k % 2 == 0 else "assistant",
+                 "content": f"CPU使用率 {k % 100}%，内存使用率 {i % 100}%，请给出优化建议。" * (1 + k % 3),
+                 "timestamp": timestamp[:-2] + f"{k % 60:02d}"}
+                for k in range(messages)
+            ]
+        }))
+    return result
+
+
+def best_of(repeat: int, func):
+    """多次运行取最短耗时（秒），返回 (耗时, 最后一次的结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    document = {"conversations": make_conversations(args.conversations, args.messages)}
+    total = args.conversations * args.messages
+    print(f"{args.conversations} 个对话 x {args.messages} 条消息 = {total} 条消息")
+
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None}
+    names = [name for name in SERIALIZERS if available.get(name, True)]
+    skipped = [name for name in SERIALIZERS if name not in names]
+
+    baseline = None
+    print(f"{'格式':<14}{'大小 (MB)':>10}{'编码 (s)':>10}{'编码 MB/s':>11}{'解码 (s)':>10}{'解码 MB/s':>11}{'加载 (s)':>10}")
+    for name in names:
+        serializer = get_serializer(name)
+        encode_time, raw = best_of(args.repeat, lambda: serializer.dumps(document))
+        decode_time, _ = best_of(args.repeat, lambda: serializer.loads(raw))
+
+        def load():
+            state = _ConversationState()
+            state.load(serializer.loads(raw, encoded_times=True)["conversations"])
+            return state
+
+        load_time, _ = best_of(args.repeat, load)
+        size = len(raw) / 1e6
+        print(f"{name:<14}{size:>10.1f}{encode_time:>10.3f}{size / encode_time:>11.0f}"
+              f"{decode_time:>10.3f}{size / decode_time:>11.0f}{load_time:>10.3f}")
+        if isinstance(serializer, JsonSerializer) and serializer.indent == 2:
+            baseline = (encode_time, load_time)
+    if baseline:
+        print(f"（json-pretty 为原来的 indent=2 格式，编码 {baseline[0]:.3f} s，加载 {baseline[1]:.3f} s）")
+    if skipped:
+        print(f"未安装，已跳过: {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,47 @@ from .system_monitor import (
     get_status,
     get_top_processes,
     get_system_uptime,
-    check_alerts
+    check_alerts,
+    get_sampler,
+    get_metric_store,
+    register_collector,
+    Sampler
+)
+
+from .timeseries import MetricStore
+
+from .alert_rules import (
+    AlertEngine,
+    AlertRule,
+    AlertEvent,
+    default_rules
+)
+
+from .fleet import (
+    FleetAgent,
+    FleetAggregator
+)
+
+from .process_tracker import (
+    get_process_tracker,
+    ProcessTracker
 )
 
 from .advisor import (
     auto_advise,
     user_advise,
+    auto_advise_stream,
+    user_advise_stream,
+    advise_batch,
     get_advisor,
-    Advisor
+    Advisor,
+    AdviceStream
 )
 
 from .history_manager import (
     get_history_list,
+    list_conversations,
+    search,
     switch_conversation,
     create_conversation,
     add_message,
@@ -39,15 +68,34 @@ __all__ = [
     'get_top_processes',
     'get_system_uptime',
     'check_alerts',
+    'AlertEngine',
+    'AlertRule',
+    'AlertEvent',
+    'default_rules',
+    'FleetAgent',
+    'FleetAggregator',
+    'get_sampler',
+    'get_metric_store',
+    'register_collector',
+    'Sampler',
+    'MetricStore',
+    'get_process_tracker',
+    'ProcessTracker',
     
     # AI建议
     'auto_advise',
     'user_advise',
+    'auto_advise_stream',
+    'user_advise_stream',
+    'advise_batch',
     'get_advisor',
     'Advisor',
+    'AdviceStream',
     
     # 历史管理
     'get_history_list',
+    'list_conversations',
+    'search',
     'switch_conversation',
     'create_conversation',
     'add_message',
@@ -0,0 +1,235 @@
+"""
+建议缓存模块
+周期性调用 auto_advise 时，CPU/内存/磁盘往往与几分钟前基本相同，没有必要每次都请求LLM。
+缓存以量化后的系统状态为键：
+- CPU/内存/磁盘使用率按 bucket 个百分点分桶（默认5，即 82% 和 84% 落在同一个桶）
+- 加上 check_alerts 给出的告警集合（去掉告警文本中的具体数值）
+
+淘汰策略为 LRU + TTL：超过容量时淘汰最久未使用的条目，超过 ttl 秒的条目视为过期。
+指定 path 时缓存写入JSON文件（临时文件 + 原子替换），重启后继续使用未过期的条目。
+写入按 flush_delay 合并：一段时间内的多次修改（如批量分析）只重写一次文件，close() 和进程退出时立即落盘。
+"""
+import atexit
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from .history_store import atomic_write
+from .system_monitor import check_alerts
+from .utils import ensure_data_directory
+
+
+def status_fingerprint(status: Dict[str, Any], alerts: List[str], bucket: float = 5.0) -> str:
+    """
+    计算系统状态的量化指纹
+
+    Args:
+        status: 系统状态字典
+        alerts: check_alerts() 的结果
+        bucket: 分桶宽度（百分点）
+
+    Returns:
+        指纹字符串，如 "cpu=16|memory=13|disk=9|⚠️ CPU使用率过高"
+    """
+    parts = [f"{metric}={int(float(status.get(metric, 0) or 0) // bucket)}" for metric in ("cpu", "memory", "disk")]
+    # 告警文本形如 "⚠️ CPU使用率过高: 85%"，只保留冒号前的部分
+    parts.extend(sorted({alert.split(":")[0].strip() for alert in alerts}))
+    return "|".join(parts)
+
+
+class AdviceCache:
+    """按量化系统状态缓存 auto_advise 的建议，LRU + TTL 淘汰，可选持久化"""
+
+    def __init__(self, capacity: int = 256, ttl: float = 600.0, bucket: float = 5.0,
+                 path: str = None, thresholds: Dict[str, float] = None, flush_delay: float = 2.0):
+        """
+        初始化缓存
+
+        Args:
+            capacity: 最多保存的条目数
+            ttl: 条目有效期（秒）
+            bucket: 使用率分桶宽度（百分点）
+            path: 持久化文件路径，None表示只保存在内存中
+            thresholds: 计算告警集合时传给 check_alerts 的阈值
+            flush_delay: 写后合并的最长延迟（秒），0表示每次修改立即写入文件
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.bucket = bucket
+        self.path = path
+        self.thresholds = thresholds
+        self.flush_delay = flush_delay
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._dirty = False
+        self._flush_timer = None
+        if path:
+            self._load()
+            if flush_delay > 0:
+                atexit.register(self.flush)
+
+    def key(self, status: Dict[str, Any]) -> str:
+        """计算系统状态对应的缓存键"""
+        return status_fingerprint(status, check_alerts(status, self.thresholds), self.bucket)
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        查找未过期的建议并更新命中统计
+
+        Returns:
+            (conv_id, advice)，未命中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created_at"] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["conv_id"], entry["advice"]
+
+    def put(self, key: str, conv_id: str, advice: str):
+        """写入建议，超过容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = {"conv_id": conv_id, "advice": advice, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._changed()
+
+    def invalidate(self, key: str) -> bool:
+        """删除一个条目，返回条目是否存在"""
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._changed()
+            return True
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+            self._changed()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        命中率统计
+
+        Returns:
+            {"size", "capacity", "hits", "misses", "hit_rate", "evictions", "expirations"}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def flush(self):
+        """立即写入尚未落盘的修改"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._dirty:
+                self._save()
+
+    def close(self):
+        """落盘尚未写出的修改"""
+        self.flush()
+        if self.path and self.flush_delay > 0:
+            atexit.unregister(self.flush)
+
+    def _changed(self):
+        """记录一次尚未落盘的修改（调用方持有锁）：立即写入，或在 flush_delay 秒后合并写入"""
+        if not self.path:
+            return
+        self._dirty = True
+        if self.flush_delay <= 0:
+            self._save()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _load(self):
+        """读取持久化文件，丢弃已过期的条目；文件损坏时从空缓存开始"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get("entries", [])
+        except FileNotFoundError:
+            return
+        except (ValueError, AttributeError) as e:
+            print(f"建议缓存文件损坏，已忽略: {e}")
+            return
+        now = time.time()
+        # 文件中按从旧到新的使用顺序保存
+        for entry in entries[-self.capacity:]:
+            if now - entry.get("created_at", 0) <= self.ttl:
+                self._entries[entry["key"]] = {key: entry[key] for key in ("conv_id", "advice", "created_at")}
+
+    def _save(self):
+        """原子写入持久化文件（调用方持有锁）"""
+        if not self.path:
+            return
+        self._dirty = False
+        data = {"entries": [dict(entry, key=key) for key, entry in self._entries.items()]}
+        try:
+            ensure_data_directory(self.path)
+            atomic_write(self.path, lambda f: json.dump(data, f, ensure_ascii=False))
+        except OSError as e:
+            print(f"保存建议缓存失败: {e}")
+
+
+def alert_thresholds(config: Dict[str, Any]) -> Dict[str, float]:
+    """配置中 monitoring.*_warning_threshold 对应的 check_alerts 阈值"""
+    monitoring = config.get("monitoring", {})
+    return {
+        metric: monitoring.get(f"{metric}_warning_threshold", default)
+        for metric, default in (("cpu", 80), ("memory", 85), ("disk", 90))
+    }
+
+
+def create_advice_cache(config: Dict[str, Any]) -> Optional[AdviceCache]:
+    """
+    根据配置创建建议缓存
+
+    Args:
+        config: 完整配置字典，读取 advice_cache 段（enabled / capacity / ttl / bucket / path / flush_delay）
+                和 monitoring.*_warning_threshold（告警集合使用的阈值）
+
+    Returns:
+        缓存实例，advice_cache.enabled 为 false 时返回None
+    """
+    cache_config = config.get("advice_cache", {})
+    if not cache_config.get("enabled", True):
+        return None
+    return AdviceCache(
+        capacity=cache_config.get("capacity", 256),
+        ttl=cache_config.get("ttl", 600.0),
+        bucket=cache_config.get("bucket", 5.0),
+        path=cache_config.get("path"),
+        thresholds=alert_thresholds(config),
+        flush_delay=cache_config.get("flush_delay", 2.0)
+    )
@@ -0,0 +1,350 @@
+"""
+相似系统状态的历史建议检索模块
+建议缓存只能命中落在同一个桶中的状态。历史中已有大量 auto_advise 创建的分析对话，
+这里以其输入的 (CPU, 内存, 磁盘) 使用率为向量建立最近邻索引：
+- 安装了 numpy 时使用 KD 树（按跨度最大的维度在中位数处切分，叶子内向量化计算距离）
+- 没有 numpy 时退化为纯Python的线性扫描
+
+Advisor 用它找出最相似的 k 个历史状态：距离足够近时直接复用那次的建议，
+否则把相近的历史建议作为参考交给LLM。索引只保存对话ID和向量，建议文本在使用时从历史中读取。
+"""
+import heapq
+import math
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时线性扫描
+    np = None
+
+from .advice_cache import alert_thresholds
+from .system_monitor import check_alerts
+
+
+# advisor.build_status_message() 生成的用户消息，分析对话的标题取自其开头
+ANALYSIS_PREFIX = "请分析以下系统状态"
+_METRIC_PATTERNS = [
+    re.compile(r"CPU使用率: (-?[\d.]+)%"),
+    re.compile(r"内存使用率: (-?[\d.]+)%"),
+    re.compile(r"磁盘使用率: (-?[\d.]+)%"),
+]
+
+
+def status_vector(status: Dict[str, Any]) -> Tuple[float, float, float]:
+    """系统状态的 (CPU, 内存, 磁盘) 使用率向量"""
+    return tuple(float(status.get(metric, 0) or 0) for metric in ("cpu", "memory", "disk"))
+
+
+def parse_status_message(text: str) -> Optional[Tuple[float, float, float]]:
+    """
+    从 build_status_message() 生成的消息中解析使用率向量
+
+    Returns:
+        (CPU, 内存, 磁盘)，不是分析消息时返回None
+    """
+    if not text.startswith(ANALYSIS_PREFIX):
+        return None
+    vector = []
+    for pattern in _METRIC_PATTERNS:
+        match = pattern.search(text)
+        if match is None:
+            return None
+        try:
+            vector.append(float(match.group(1)))
+        except ValueError:
+            return None
+    return tuple(vector)
+
+
+class KDTree:
+    """基于 numpy 的静态 KD 树，节点保存在平行列表中，查询时用栈代替递归"""
+
+    def __init__(self, points, leaf_size: int = 32):
+        """
+        建树
+
+        Args:
+            points: (n, d) 的向量数组
+            leaf_size: 叶子节点最多包含的向量数
+        """
+        points = np.asarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self._order = np.arange(len(points))
+        self._points = points
+        # 节点: [lo, hi) 为 _order 中的区间；_left 为 -1 表示叶子
+        self._lo: List[int] = []
+        self._hi: List[int] = []
+        self._dim: List[int] = []
+        self._split: List[float] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        if len(points):
+            self._build(0, len(points))
+        # 按叶子顺序连续存放，叶子内的距离计算只需切片
+        self._data = points[self._order]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _build(self, lo: int, hi: int) -> int:
+        node = len(self._lo)
+        self._lo.append(lo)
+        self._hi.append(hi)
+        self._dim.append(0)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        if hi - lo <= self.leaf_size:
+            return node
+        segment = self._order[lo:hi]
+        values = self._points[segment]
+        dim = int(np.argmax(values.max(axis=0) - values.min(axis=0)))
+        mid = (lo + hi) // 2
+        # 左子树的坐标 <= split，右子树 >= split
+        self._order[lo:hi] = segment[np.argpartition(values[:, dim], mid - lo)]
+        self._dim[node] = dim
+        self._split[node] = float(self._points[self._order[mid], dim])
+        self._left[node] = self._build(lo, mid)
+        self._right[node] = self._build(mid, hi)
+        return node
+
+    def query(self, point: Sequence[float], k: int = 1) -> List[Tuple[float, int]]:
+        """
+        查询最近的 k 个向量
+
+        Returns:
+            [(欧氏距离, 向量下标), ...]，按距离从近到远排序
+        """
+        if not self._lo or k <= 0:
+            return []
+        coords = tuple(float(value) for value in point)
+        point = np.asarray(coords)
+        best_d = np.empty(0)
+        best_i = np.empty(0, dtype=np.int64)
+        worst = math.inf
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+            left = self._left[node]
+            if left < 0:
+                lo, hi = self._lo[node], self._hi[node]
+                diff = self._data[lo:hi] - point
+                distances = np.einsum("ij,ij->i", diff, diff)
+                closer = distances < worst
+                if not closer.any():
+                    continue
+                best_d = np.concatenate((best_d, distances[closer]))
+                best_i = np.concatenate((best_i, self._order[lo:hi][closer]))
+                if len(best_d) > k:
+                    keep = np.argpartition(best_d, k - 1)[:k]
+                    best_d, best_i = best_d[keep], best_i[keep]
+                if len(best_d) == k:
+                    worst = float(best_d.max())
+                continue
+            delta = coords[self._dim[node]] - self._split[node]
+            near, far = (left, self._right[node]) if delta <= 0 else (self._right[node], left)
+            # 先压入远侧，近侧先出栈
+            stack.append((far, max(bound, delta * delta)))
+            stack.append((near, bound))
+        order = np.argsort(best_d, kind="stable")
+        return [(math.sqrt(float(best_d[i])), int(best_i[i])) for i in order]
+
+
+def _linear_query(points: List[Tuple[float, ...]], point: Sequence[float], k: int) -> List[Tuple[float, int]]:
+    """纯Python线性扫描"""
+    distances = ((sum((a - b) * (a - b) for a, b in zip(vector, point)), i) for i, vector in enumerate(points))
+    return [(math.sqrt(d), i) for d, i in heapq.nsmallest(k, distances)]
+
+
+class AdviceNeighbors:
+    """
+    历史分析的最近邻索引：对话ID + 使用率向量
+
+    KD树覆盖前 _tree_size 个条目，之后新增的条目线性扫描；新增或删除的条目超过树大小的 1/8 时重建。
+    """
+
+    def __init__(self, k: int = 3, reuse_distance: float = 3.0, context_distance: float = 15.0,
+                 context_chars: int = 800, include_archived: bool = True,
+                 thresholds: Dict[str, float] = None, leaf_size: int = 32):
+        """
+        初始化索引（第一次查询前由 Advisor 调用 build() 从历史记录中收集）
+
+        Args:
+            k: 每次查询的近邻数
+            reuse_distance: 最近的历史状态在该距离（百分点）以内且告警集合相同时直接复用其建议
+            context_distance: 在该距离以内的历史建议作为参考加入提示词
+            context_chars: 每条参考建议最多保留的字符数
+            include_archived: 是否收集已归档的对话
+            thresholds: 比较告警集合时传给 check_alerts 的阈值
+            leaf_size: KD树叶子节点的大小
+        """
+        self.k = k
+        self.reuse_distance = reuse_distance
+        self.context_distance = context_distance
+        self.context_chars = context_chars
+        self.include_archived = include_archived
+        self.thresholds = thresholds
+        self.leaf_size = leaf_size
+        self.built = False
+        self.reuses = 0
+        self.contexts = 0
+        self._conv_ids: List[str] = []
+        self._vectors: List[Tuple[float, float, float]] = []
+        self._positions: Dict[str, int] = {}
+        self._removed = set()
+        self._tree: Optional[KDTree] = None
+        self._tree_size = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conv_ids) - len(self._removed)
+
+    def add(self, conv_id: str, vector: Sequence[float]):
+        """添加（或替换）一个历史状态"""
+        with self._lock:
+            if conv_id in self._positions:
+                self._removed.add(self._positions[conv_id])
+            self._positions[conv_id] = len(self._conv_ids)
+            self._conv_ids.append(conv_id)
+            self._vectors.append(tuple(float(value) for value in vector))
+
+    def remove(self, conv_id: str) -> bool:
+        """删除一个历史状态（标记删除，查询时跳过）"""
+        with self._lock:
+            position = self._positions.pop(conv_id, None)
+            if position is None:
+                return False
+            self._removed.add(position)
+            return True
+
+    def build(self, manager) -> int:
+        """
+        从历史记录中收集全部分析对话（标题以分析消息开头的对话），替换当前内容
+
+        Args:
+            manager: HistoryManager
+
+        Returns:
+            收集到的历史状态数
+        """
+        headers = list(manager.store.iter_headers())
+        if self.include_archived:
+            headers.extend(manager.list_archived())
+        conv_ids, vectors = [], []
+        for header in headers:
+            title = header.get("title", "")
+            if not (title.startswith(ANALYSIS_PREFIX) or title == "系统性能分析"):
+                continue
+            first = next(manager.iter_messages(header["id"]), None)
+            vector = parse_status_message(first[1].get("content", "")) if first else None
+            if vector is not None:
+                conv_ids.append(header["id"])
+                vectors.append(vector)
+        with self._lock:
+            self._conv_ids = conv_ids
+            self._vectors = vectors
+            self._positions = {conv_id: i for i, conv_id in enumerate(conv_ids)}
+            self._removed = set()
+            self._rebuild()
+            self.built = True
+        return len(conv_ids)
+
+    def ensure_built(self, manager):
+        """第一次使用前从历史记录收集（多个线程同时调用时只收集一次）"""
+        if self.built:
+            return
+        with self._build_lock:
+            if not self.built:
+                self.build(manager)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        使用统计
+
+        Returns:
+            {"size": 索引中的历史状态数, "reuses": 直接复用的次数, "contexts": 以历史建议为参考调用LLM的次数}
+        """
+        with self._lock:
+            return {"size": len(self._conv_ids) - len(self._removed), "reuses": self.reuses, "contexts": self.contexts}
+
+    def record(self, reused: bool):
+        """
+        记录一次有效的查询结果（多个线程同时分析时计数不会丢失）
+
+        Args:
+            reused: True 表示直接复用了历史建议，False 表示以历史建议为参考调用LLM
+        """
+        with self._lock:
+            if reused:
+                self.reuses += 1
+            else:
+                self.contexts += 1
+
+    def same_alerts(self, a: Sequence[float], b: Sequence[float]) -> bool:
+        """两个使用率向量是否触发相同的告警"""
+        def labels(vector):
+            status = dict(zip(("cpu", "memory", "disk"), vector))
+            return {alert.split(":")[0] for alert in check_alerts(status, self.thresholds)}
+        return labels(a) == labels(b)
+
+    def query(self, vector: Sequence[float], k: int = None) -> List[Tuple[float, str]]:
+        """
+        查询最相似的 k 个历史状态（k 为None时使用初始化时的 k）
+
+        Returns:
+            [(距离, 对话ID), ...]，距离为使用率向量的欧氏距离（百分点），按从近到远排序
+        """
+        k = self.k if k is None else k
+        with self._lock:
+            limit = max(64, self._tree_size // 8)
+            if len(self._vectors) - self._tree_size > limit or len(self._removed) > limit:
+                self._rebuild()
+            fetch = k + len(self._removed)
+            hits = _linear_query(self._vectors[self._tree_size:], vector, fetch)
+            if self._tree is not None:
+                hits = sorted(self._tree.query(vector, fetch) +
+                              [(distance, i + self._tree_size) for distance, i in hits])
+            return [(distance, self._conv_ids[i]) for distance, i in hits if i not in self._removed][:k]
+
+    def _rebuild(self):
+        """重建KD树并压缩掉已删除的条目（调用方持有锁）"""
+        if self._removed:
+            keep = [i for i in range(len(self._conv_ids)) if i not in self._removed]
+            self._conv_ids = [self._conv_ids[i] for i in keep]
+            self._vectors = [self._vectors[i] for i in keep]
+            self._positions = {conv_id: i for i, conv_id in enumerate(self._conv_ids)}
+            self._removed = set()
+        if np is not None and self._vectors:
+            self._tree, self._tree_size = KDTree(self._vectors, self.leaf_size), len(self._vectors)
+        else:
+            self._tree, self._tree_size = None, 0
+
+
+def create_advice_neighbors(config: Dict[str, Any]) -> Optional[AdviceNeighbors]:
+    """
+    根据配置创建历史建议索引
+
+    Args:
+        config: 完整配置字典，读取 advice_neighbors 段（enabled / k / reuse_distance / context_distance /
+                context_chars / include_archived）和 monitoring.*_warning_threshold
+
+    Returns:
+        索引实例（尚未收集历史），advice_neighbors.enabled 为 false 时返回None
+    """
+    neighbors_config = config.get("advice_neighbors", {})
+    if not neighbors_config.get("enabled", True):
+        return None
+    return AdviceNeighbors(
+        k=neighbors_config.get("k", 3),
+        reuse_distance=neighbors_config.get("reuse_distance", 3.0),
+        context_distance=neighbors_config.get("context_distance", 15.0),
+        context_chars=neighbors_config.get("context_chars", 800),
+        include_archived=neighbors_config.get("include_archived", True),
+        thresholds=alert_thresholds(config)
+    )
@@ -2,10 +2,222 @@
 AI建议模块
 负责调用LLM生成系统优化建议和处理用户对话
 """
+import asyncio
 import json
-from typing import Dict, Any, Optional
-from .utils import load_config
-from .history_manager import get_manager, create_conversation, add_message
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, Callable, Iterable, Union
+from .history_manager import get_manager
+from .llm_client import LLMClientPool, openai
+from .rate_limit import create_rate_limiter, estimate_tokens
+from .timeseries import MetricStore
+from .advice_cache import create_advice_cache
+from .advice_neighbors import create_advice_neighbors, parse_status_message, status_vector
+from .utils import load_config, truncate_text
+
+
+AUTO_ADVISE_PROMPT = """你是一个专业的系统性能分析助手。
+根据用户提供的系统状态数据，分析系统性能并给出具体的优化建议。
+建议应该：
+1. 简洁明了，条理清晰
+2. 针对具体问题提供可操作的解决方案
+3. 考虑不同严重程度的问题
+4. 使用友好的语气
+"""
+
+# 相近系统状态的历史建议作为参考附加在 AUTO_ADVISE_PROMPT 之后
+REFERENCE_PROMPT = """
+以下是系统状态相近时给出过的建议，可以参考，但请以当前数据为准：
+"""
+
+CHAT_PROMPT = """你是一个专业的系统性能分析和优化助手。
+你可以：
+1. 回答关于系统性能、资源管理的问题
+2. 提供系统优化建议
+3. 解释技术概念
+4. 帮助用户诊断和解决系统问题
+
+请用友好、专业的语气与用户交流。"""
+
+
+# 调用失败时返回的提示文本前缀，以及流式输出中途断开时追加的说明；这样的回复不写入建议缓存
+FAILURE_PREFIXES = ("调用LLM失败", "OpenAI API调用失败", "请先安装openai库", "请在配置文件中设置有效的API Key")
+STREAM_INTERRUPTED = "\n\n[输出中断: "
+
+
+def is_failure_reply(reply: str) -> bool:
+    """
+    判断LLM回复是否为调用失败的提示文本
+    
+    Args:
+        reply: _call_llm() 或流式调用得到的回复
+        
+    Returns:
+        是否调用失败
+    """
+    return reply.startswith(FAILURE_PREFIXES) or STREAM_INTERRUPTED in reply
+
+
+def _usage_tokens(response) -> Optional[int]:
+    """响应（或流式的最后一个片段）中的 usage.total_tokens，没有用量信息时返回None"""
+    return getattr(getattr(response, "usage", None), "total_tokens", None)
+
+
+def build_status_message(status: Dict[str, Any]) -> str:
+    """
+    根据系统状态构建自动分析时发送给LLM的用户消息
+    
+    Args:
+        status: 系统状态字典
+        
+    Returns:
+        用户消息文本
+    """
+    # 批量分析集群中的主机时（FleetAggregator.latest() 的快照带有 host），在消息中注明主机
+    host = f"主机: {status['host']}\n" if status.get("host") else ""
+    return f"""请分析以下系统状态并给出优化建议：
+
+{host}CPU使用率: {status.get('cpu', 0)}%
+内存使用率: {status.get('memory', 0)}%
+磁盘使用率: {status.get('disk', 0)}%
+系统摘要: {status.get('summary', '未知')}
+
+请提供详细的分析和建议。"""
+
+
+class _StreamState:
+    """
+    流式回复的公共状态：收到的文本片段、首个片段的延迟，结束时保存回复并记录指标
+
+    结束（迭代完或被关闭）时调用 save(reply, completed) 把拼接后的回复写入历史，返回对话ID；
+    一个片段都没有收到就被关闭时不保存。record 接收本次调用的指标，为None时不记录。
+    """
+
+    def __init__(self, save: Optional[Callable[[str, bool], str]],
+                 record: Optional[Callable[[Dict[str, float]], None]]):
+        self.conv_id: Optional[str] = None
+        self.text = ""
+        self.ttft: Optional[float] = None
+        self.completed = False
+        self._save = save
+        self._record = record
+        self._parts = []
+        self._start = None
+        self._finished = False
+
+    def _begin(self):
+        self._start = time.perf_counter()
+
+    def _on_chunk(self, chunk: str):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self._start
+        self._parts.append(chunk)
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        if self._parts:
+            self.text = "".join(self._parts)
+        if self._save is not None and self._parts:
+            self.conv_id = self._save(self.text, self.completed)
+        if self._record is not None and self._start is not None:
+            metrics = {"duration": time.perf_counter() - self._start, "chunks": len(self._parts),
+                       "completed": 1.0 if self.completed else 0.0}
+            if self.ttft is not None:
+                metrics["ttft"] = self.ttft
+            self._record(metrics)
+
+
+class AdviceStream(_StreamState):
+    """
+    同步流式回复，迭代得到LLM逐段返回的文本
+
+    迭代结束、调用 close() 或在 with 块中提前退出时，把已收到的回复写入历史；
+    之后 text（完整回复）、conv_id（对话ID）、ttft（首个片段的延迟，秒）、completed（是否完整）可用。
+    """
+
+    def __init__(self, chunks: Iterator[str], save: Optional[Callable[[str, bool], str]],
+                 record: Optional[Callable[[Dict[str, float]], None]]):
+        super().__init__(save, record)
+        self._gen = self._run(chunks)
+
+    def _run(self, chunks: Iterator[str]) -> Iterator[str]:
+        self._begin()
+        try:
+            for chunk in chunks:
+                self._on_chunk(chunk)
+                yield chunk
+            self.completed = True
+        finally:
+            # 提前关闭时同时关闭底层的HTTP流
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            self._finish()
+
+    def __iter__(self) -> Iterator[str]:
+        return self._gen
+
+    def __next__(self) -> str:
+        return next(self._gen)
+
+    def close(self):
+        """取消：停止接收并保存已收到的部分"""
+        self._gen.close()
+        self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncAdviceStream(_StreamState):
+    """AdviceStream 的异步版本，用 async for 迭代，aclose() 取消；结束时在默认线程池中保存回复"""
+
+    def __init__(self, chunks: AsyncIterator[str], save: Optional[Callable[[str, bool], str]],
+                 record: Optional[Callable[[Dict[str, float]], None]]):
+        super().__init__(save, record)
+        self._gen = self._run(chunks)
+
+    async def _run(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        self._begin()
+        try:
+            async for chunk in chunks:
+                self._on_chunk(chunk)
+                yield chunk
+            self.completed = True
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            await self._finish_async()
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._gen
+
+    async def __anext__(self) -> str:
+        return await self._gen.__anext__()
+
+    async def _finish_async(self):
+        """写历史记录是文件I/O，不在事件循环中执行"""
+        if not self._finished:
+            await asyncio.get_running_loop().run_in_executor(None, self._finish)
+
+    async def aclose(self):
+        """取消：停止接收并保存已收到的部分"""
+        await self._gen.aclose()
+        await self._finish_async()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
 
 
 class Advisor:
@@ -21,6 +233,18 @@ class Advisor:
         self.config = load_config(config_path)
         self.llm_config = self.config.get("llm", {})
         self.history_manager = get_manager()
+        # 长期复用的客户端，第一次调用LLM时创建
+        self.llm_pool = LLMClientPool(self.llm_config)
+        # llm.requests_per_minute / tokens_per_minute 限速，未配置时为None
+        self.rate_limiter = create_rate_limiter(self.llm_config)
+        # 流式调用的指标：ttft（首个片段延迟，秒）、duration、chunks、completed
+        self.stream_metrics = MetricStore(capacity=1000)
+        # auto_advise 的建议缓存，配置 advice_cache.enabled 为 false 时为None
+        self.advice_cache = create_advice_cache(self.config)
+        # 历史分析的最近邻索引，第一次自动分析时从历史记录收集；advice_neighbors.enabled 为 false 时为None
+        self.advice_neighbors = create_advice_neighbors(self.config)
+        # advise_batch 的默认并发数和队列长度
+        self.batch_config = self.config.get("batch", {})
         
     def _call_llm(self, messages: list, system_prompt: str = None) -> str:
         """
@@ -50,46 +274,240 @@ class Advisor:
             LLM的回复
         """
         try:
-            # 尝试导入openai库
-            try:
-                import openai
-            except ImportError:
+            if openai is None:
                 return "请先安装openai库: pip install openai"
             
-            api_key = self.llm_config.get("api_key", "")
-            if not api_key or api_key == "your-api-key-here":
+            if self._api_key() is None:
                 return "请在配置文件中设置有效的API Key"
             
-            # 设置API配置
-            client = openai.OpenAI(
-                api_key=api_key,
-                base_url=self.llm_config.get("base_url", "https://api.openai.com/v1")
-            )
+            # 复用连接池中的客户端（keep-alive连接）
+            client = self.llm_pool.get()
             
-            # 准备消息
-            api_messages = []
-            if system_prompt:
-                api_messages.append({"role": "system", "content": system_prompt})
+            # 调用API
+            params = self._request_params(messages, system_prompt)
+            estimate = self._wait_for_quota(params)
+            usage_tokens = 0
+            try:
+                response = client.chat.completions.create(**params)
+                usage_tokens = _usage_tokens(response)
+            finally:
+                # 请求失败时按0结算，退还预约的token
+                self._settle_quota(estimate, usage_tokens)
             
-            for msg in messages:
-                api_messages.append({
-                    "role": msg.get("role", "user"),
-                    "content": msg.get("content", "")
-                })
+            return response.choices[0].message.content
             
-            # 调用API
-            response = client.chat.completions.create(
-                model=self.llm_config.get("model", "gpt-3.5-turbo"),
-                messages=api_messages,
-                temperature=self.llm_config.get("temperature", 0.7),
-                max_tokens=self.llm_config.get("max_tokens", 1000)
-            )
+        except Exception as e:
+            return f"OpenAI API调用失败: {str(e)}\n\n提示：请确保已安装openai库并配置了正确的API Key"
+    
+    async def _call_llm_async(self, messages: list, system_prompt: str = None) -> str:
+        """
+        _call_llm() 的协程版本
+        
+        Args:
+            messages: 消息列表
+            system_prompt: 系统提示词
+            
+        Returns:
+            LLM的回复
+        """
+        try:
+            return await self._call_openai_async(messages, system_prompt)
+        except Exception as e:
+            return f"调用LLM失败: {str(e)}"
+    
+    async def _call_openai_async(self, messages: list, system_prompt: str = None) -> str:
+        """
+        使用当前事件循环的 openai.AsyncOpenAI 客户端调用API，等待响应期间不阻塞事件循环
+        
+        Args:
+            messages: 消息列表
+            system_prompt: 系统提示词
+            
+        Returns:
+            LLM的回复
+        """
+        try:
+            if openai is None:
+                return "请先安装openai库: pip install openai"
+            
+            if self._api_key() is None:
+                return "请在配置文件中设置有效的API Key"
+            
+            client = self.llm_pool.get_async()
+            params = self._request_params(messages, system_prompt)
+            estimate = await self._wait_for_quota_async(params)
+            usage_tokens = 0
+            try:
+                response = await client.chat.completions.create(**params)
+                usage_tokens = _usage_tokens(response)
+            finally:
+                self._settle_quota(estimate, usage_tokens)
             
             return response.choices[0].message.content
             
         except Exception as e:
             return f"OpenAI API调用失败: {str(e)}\n\n提示：请确保已安装openai库并配置了正确的API Key"
     
+    def _stream_openai(self, messages: list, system_prompt: str = None) -> Iterator[str]:
+        """
+        以流式方式调用OpenAI API，逐段生成回复文本
+
+        出错时生成与 _call_openai() 相同的提示文本；输出中途出错时在已输出的内容后追加中断说明。
+        生成器被关闭时同时关闭HTTP响应。
+        
+        Args:
+            messages: 消息列表
+            system_prompt: 系统提示词
+            
+        Yields:
+            回复文本片段
+        """
+        if openai is None:
+            yield "请先安装openai库: pip install openai"
+            return
+        if self._api_key() is None:
+            yield "请在配置文件中设置有效的API Key"
+            return
+        
+        params = self._request_params(messages, system_prompt)
+        try:
+            estimate = self._wait_for_quota(params)
+            stream = None
+            try:
+                stream = self.llm_pool.get().chat.completions.create(
+                    stream=True, stream_options={"include_usage": True}, **params)
+            finally:
+                if stream is None:
+                    self._settle_quota(estimate, 0)
+        except Exception as e:
+            yield f"OpenAI API调用失败: {str(e)}\n\n提示：请确保已安装openai库并配置了正确的API Key"
+            return
+        
+        usage_tokens, emitted = None, 0
+        try:
+            for chunk in stream:
+                usage_tokens = _usage_tokens(chunk) or usage_tokens
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    emitted += len(content)
+                    yield content
+        except Exception as e:
+            yield f"{STREAM_INTERRUPTED}{str(e)}]"
+        finally:
+            stream.close()
+            self._settle_stream_quota(estimate, params, usage_tokens, emitted)
+    
+    async def _stream_openai_async(self, messages: list, system_prompt: str = None) -> AsyncIterator[str]:
+        """
+        _stream_openai() 的异步版本
+        
+        Args:
+            messages: 消息列表
+            system_prompt: 系统提示词
+            
+        Yields:
+            回复文本片段
+        """
+        if openai is None:
+            yield "请先安装openai库: pip install openai"
+            return
+        if self._api_key() is None:
+            yield "请在配置文件中设置有效的API Key"
+            return
+        
+        params = self._request_params(messages, system_prompt)
+        try:
+            estimate = await self._wait_for_quota_async(params)
+            stream = None
+            try:
+                stream = await self.llm_pool.get_async().chat.completions.create(
+                    stream=True, stream_options={"include_usage": True}, **params)
+            finally:
+                if stream is None:
+                    self._settle_quota(estimate, 0)
+        except Exception as e:
+            yield f"OpenAI API调用失败: {str(e)}\n\n提示：请确保已安装openai库并配置了正确的API Key"
+            return
+        
+        usage_tokens, emitted = None, 0
+        try:
+            async for chunk in stream:
+                usage_tokens = _usage_tokens(chunk) or usage_tokens
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    emitted += len(content)
+                    yield content
+        except Exception as e:
+            yield f"{STREAM_INTERRUPTED}{str(e)}]"
+        finally:
+            self._settle_stream_quota(estimate, params, usage_tokens, emitted)
+            await stream.close()
+    
+    def _wait_for_quota(self, params: Dict[str, Any]) -> int:
+        """按 rpm/tpm 限速等待配额（未配置限速时不等待），返回预估的token数"""
+        estimate = estimate_tokens(params)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(estimate)
+        return estimate
+    
+    async def _wait_for_quota_async(self, params: Dict[str, Any]) -> int:
+        """_wait_for_quota() 的协程版本"""
+        estimate = estimate_tokens(params)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(estimate)
+        return estimate
+    
+    def _settle_quota(self, estimate: int, actual: Optional[int]):
+        """用实际token用量结算预估值，actual 为None时不结算"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.settle(estimate, actual)
+    
+    def _settle_stream_quota(self, estimate: int, params: Dict[str, Any], usage_tokens: Optional[int], emitted: int):
+        """
+        流式请求结束（完成、出错或被取消）时结算配额
+        
+        优先使用最后一个片段中的 usage（stream_options.include_usage）；服务端不返回用量时
+        按与预估相同的口径，以实际输出的字符数代替预估中的 max_tokens。
+        """
+        if usage_tokens is None:
+            usage_tokens = estimate - int(params.get("max_tokens") or 0) + emitted
+        self._settle_quota(estimate, usage_tokens)
+    
+    def _api_key(self) -> Optional[str]:
+        """获取配置的API Key，未配置时返回None"""
+        api_key = self.llm_config.get("api_key", "")
+        if not api_key or api_key == "your-api-key-here":
+            return None
+        return api_key
+    
+    def _request_params(self, messages: list, system_prompt: str = None) -> Dict[str, Any]:
+        """
+        构建 chat.completions.create 的参数
+        
+        Args:
+            messages: 消息列表
+            system_prompt: 系统提示词
+            
+        Returns:
+            请求参数字典
+        """
+        api_messages = []
+        if system_prompt:
+            api_messages.append({"role": "system", "content": system_prompt})
+        
+        for msg in messages:
+            api_messages.append({
+                "role": msg.get("role", "user"),
+                "content": msg.get("content", "")
+            })
+        
+        return {
+            "model": self.llm_config.get("model", "gpt-3.5-turbo"),
+            "messages": api_messages,
+            "temperature": self.llm_config.get("temperature", 0.7),
+            "max_tokens": self.llm_config.get("max_tokens", 1000)
+        }
+    
     def auto_advise(self, status: Dict[str, Any]) -> tuple[str, str]:
         """
         根据系统状态自动生成优化建议
@@ -98,39 +516,170 @@ class Advisor:
             status: 系统状态字典（来自system_monitor.get_status()）
             
         Returns:
-            (conv_id, advice) - 对话ID和建议内容
+            (conv_id, advice) - 对话ID和建议内容；命中建议缓存或复用相近的历史分析时为生成该建议的对话
         """
-        # 构建系统提示词
-        system_prompt = """你是一个专业的系统性能分析助手。
-根据用户提供的系统状态数据，分析系统性能并给出具体的优化建议。
-建议应该：
-1. 简洁明了，条理清晰
-2. 针对具体问题提供可操作的解决方案
-3. 考虑不同严重程度的问题
-4. 使用友好的语气
-"""
+        user_message = build_status_message(status)
         
-        # 构建用户消息
-        user_message = f"""请分析以下系统状态并给出优化建议：
-
-CPU使用率: {status.get('cpu', 0)}%
-内存使用率: {status.get('memory', 0)}%
-磁盘使用率: {status.get('disk', 0)}%
-系统摘要: {status.get('summary', '未知')}
-
-请提供详细的分析和建议。"""
+        # 系统状态与不久前的某次分析落在同一个桶中、或与某次历史分析足够接近时直接复用
+        key, cached, system_prompt = self._lookup_advice(status, user_message)
+        if cached is not None:
+            return cached
         
         # 调用LLM
         messages = [{"role": "user", "content": user_message}]
         advice = self._call_llm(messages, system_prompt)
         
         # 创建新对话并保存
-        conv_id = create_conversation("系统性能分析")
-        add_message(conv_id, "user", user_message)
-        add_message(conv_id, "assistant", advice)
+        conv_id = self._save_analysis(user_message, advice)
+        self._remember_advice(key, status, conv_id, advice)
+        
+        return conv_id, advice
+    
+    async def auto_advise_async(self, status: Dict[str, Any]) -> tuple[str, str]:
+        """
+        auto_advise() 的协程版本，一个事件循环可以同时处理多个分析请求
+        
+        查找建议缓存和历史分析、保存对话都要读写文件，在事件循环的默认线程池中执行。
+        
+        Args:
+            status: 系统状态字典
+            
+        Returns:
+            (conv_id, advice) - 对话ID和建议内容
+        """
+        loop = asyncio.get_running_loop()
+        user_message = build_status_message(status)
+        key, cached, system_prompt = await loop.run_in_executor(None, self._lookup_advice, status, user_message)
+        if cached is not None:
+            return cached
+        
+        advice = await self._call_llm_async([{"role": "user", "content": user_message}], system_prompt)
+        
+        save = self._analysis_saver(user_message, status, key)
+        conv_id = await loop.run_in_executor(None, save, advice, True)
         
         return conv_id, advice
     
+    def _lookup_advice(self, status: Dict[str, Any], user_message: str) -> tuple:
+        """
+        自动分析调用LLM之前的查找：先查建议缓存，再查相近的历史分析
+        
+        Returns:
+            (缓存键, 命中时的 (conv_id, advice), 调用LLM时使用的系统提示词)
+        """
+        key, cached = self._cached_advice(status, user_message)
+        if cached is None:
+            cached, references = self._neighbor_advice(status)
+            if cached is not None:
+                if key is not None:
+                    self.advice_cache.put(key, *cached)
+            elif references:
+                return key, None, AUTO_ADVISE_PROMPT + REFERENCE_PROMPT + "\n\n".join(references)
+        return key, cached, AUTO_ADVISE_PROMPT
+    
+    def _neighbor_advice(self, status: Dict[str, Any]) -> tuple:
+        """
+        查询最相近的 k 次历史分析
+        
+        最近的一次在 reuse_distance 以内且告警集合相同时直接复用；否则 context_distance 以内的
+        历史建议（截断到 context_chars）作为参考。已删除的对话和调用失败的回复从索引中去掉。
+        
+        Returns:
+            (复用时的 (conv_id, advice), 参考建议文本列表)
+        """
+        index = self.advice_neighbors
+        if index is None:
+            return None, []
+        index.ensure_built(self.history_manager)
+        vector = status_vector(status)
+        references = []
+        for distance, conv_id in index.query(vector):
+            if distance > index.context_distance:
+                break
+            analysis = self._stored_analysis(conv_id)
+            if analysis is None:
+                index.remove(conv_id)
+                continue
+            past_vector, advice = analysis
+            if not references and distance <= index.reuse_distance and index.same_alerts(vector, past_vector):
+                index.record(reused=True)
+                return (conv_id, advice), []
+            cpu, memory, disk = past_vector
+            references.append(f"[CPU {cpu}% / 内存 {memory}% / 磁盘 {disk}%]\n"
+                              f"{truncate_text(advice, index.context_chars)}")
+        if references:
+            index.record(reused=False)
+        return None, references
+    
+    def _stored_analysis(self, conv_id: str) -> Optional[tuple]:
+        """
+        读取历史分析对话的输入向量和建议（第一条用户消息和第一条回复）
+        
+        Returns:
+            (使用率向量, advice)，对话不存在或建议为调用失败的提示文本时返回None
+        """
+        conversation = self.history_manager.get_conversation(conv_id)
+        messages = (conversation or {}).get("messages", [])
+        if len(messages) < 2 or messages[1].get("role") != "assistant":
+            return None
+        vector = parse_status_message(messages[0].get("content", ""))
+        advice = messages[1].get("content", "")
+        if vector is None or is_failure_reply(advice):
+            return None
+        return vector, advice
+    
+    def _cached_advice(self, status: Dict[str, Any], user_message: str) -> tuple:
+        """
+        查找建议缓存
+        
+        缓存的对话已被删除时，用缓存的建议重新创建一个"系统性能分析"对话，不再调用LLM。
+        
+        Returns:
+            (缓存键, 命中时的 (conv_id, advice))；未启用缓存时缓存键为None
+        """
+        if self.advice_cache is None:
+            return None, None
+        key = self.advice_cache.key(status)
+        cached = self.advice_cache.get(key)
+        if cached is not None and not self.history_manager.has_conversation(cached[0]):
+            conv_id = self._save_analysis(user_message, cached[1])
+            self.advice_cache.put(key, conv_id, cached[1])
+            self._index_analysis(conv_id, status)
+            cached = (conv_id, cached[1])
+        return key, cached
+    
+    def _remember_advice(self, key: Optional[str], status: Dict[str, Any], conv_id: str, advice: str):
+        """把成功生成的建议写入缓存和最近邻索引（调用失败的提示文本不保留）"""
+        if is_failure_reply(advice):
+            return
+        if key is not None:
+            self.advice_cache.put(key, conv_id, advice)
+        self._index_analysis(conv_id, status)
+    
+    def _index_analysis(self, conv_id: str, status: Dict[str, Any]):
+        """新的分析对话加入最近邻索引（尚未收集时跳过，收集时会从历史记录读到）"""
+        if self.advice_neighbors is not None and self.advice_neighbors.built:
+            self.advice_neighbors.add(conv_id, status_vector(status))
+    
+    def _save_analysis(self, user_message: str, advice: str) -> str:
+        """
+        创建"系统性能分析"对话并保存一轮问答，三次写入合并为一次落盘
+        
+        Returns:
+            对话ID
+        """
+        with self.history_manager.batch():
+            conv_id = self.history_manager.create_conversation("系统性能分析")
+            self.history_manager.add_message(conv_id, "user", user_message)
+            self.history_manager.add_message(conv_id, "assistant", advice)
+        return conv_id
+    
+    def _save_turn(self, conv_id: str, text: str, response: str):
+        """保存一轮用户消息和回复，两次写入合并为一次落盘"""
+        with self.history_manager.batch():
+            self.history_manager.add_message(conv_id, "user", text)
+            self.history_manager.add_message(conv_id, "assistant", response)
+    
     def user_advise(self, conv_id: str, text: str) -> str:
         """
         处理用户与AI的对话
@@ -147,28 +696,307 @@ CPU使用率: {status.get('cpu', 0)}%
         if not conversation:
             return "对话不存在，请先创建新对话"
         
-        # 构建系统提示词
-        system_prompt = """你是一个专业的系统性能分析和优化助手。
-你可以：
-1. 回答关于系统性能、资源管理的问题
-2. 提供系统优化建议
-3. 解释技术概念
-4. 帮助用户诊断和解决系统问题
-
-请用友好、专业的语气与用户交流。"""
-        
         # 获取历史消息
         history_messages = conversation.get("messages", [])
         
         # 调用LLM
-        response = self._call_llm(history_messages + [{"role": "user", "content": text}], system_prompt)
+        response = self._call_llm(history_messages + [{"role": "user", "content": text}], CHAT_PROMPT)
         
         # 保存消息
-        add_message(conv_id, "user", text)
-        add_message(conv_id, "assistant", response)
+        self._save_turn(conv_id, text, response)
         
         return response
     
+    async def user_advise_async(self, conv_id: str, text: str) -> str:
+        """
+        user_advise() 的协程版本，读取和保存对话在事件循环的默认线程池中执行
+        
+        Args:
+            conv_id: 对话ID
+            text: 用户输入的文本
+            
+        Returns:
+            AI的回复
+        """
+        loop = asyncio.get_running_loop()
+        conversation = await loop.run_in_executor(None, self.history_manager.get_conversation, conv_id)
+        if not conversation:
+            return "对话不存在，请先创建新对话"
+        
+        history_messages = conversation.get("messages", [])
+        response = await self._call_llm_async(history_messages + [{"role": "user", "content": text}], CHAT_PROMPT)
+        
+        await loop.run_in_executor(None, self._save_turn, conv_id, text, response)
+        
+        return response
+    
+    def auto_advise_stream(self, status: Dict[str, Any]) -> AdviceStream:
+        """
+        auto_advise() 的流式版本
+        
+        Args:
+            status: 系统状态字典
+            
+        Returns:
+            AdviceStream，迭代得到建议的文本片段；结束或取消后 conv_id 为新建的"系统性能分析"对话。
+            命中建议缓存或复用历史分析时整段建议作为一个片段返回，conv_id 立即可用
+        """
+        user_message = build_status_message(status)
+        key, cached, system_prompt = self._lookup_advice(status, user_message)
+        if cached is not None:
+            return self._cached_stream(AdviceStream(iter([cached[1]]), None, None), cached)
+        chunks = self._stream_openai([{"role": "user", "content": user_message}], system_prompt)
+        return AdviceStream(chunks, self._analysis_saver(user_message, status, key), self.stream_metrics.append)
+    
+    def auto_advise_stream_async(self, status: Dict[str, Any]) -> AsyncAdviceStream:
+        """
+        auto_advise_stream() 的异步版本，用 async for 迭代
+        
+        查找建议缓存和历史分析在迭代开始后、第一个片段之前于事件循环的默认线程池中执行，
+        因此命中缓存时 conv_id 在收到第一个片段后可用。
+        
+        Args:
+            status: 系统状态字典
+            
+        Returns:
+            AsyncAdviceStream
+        """
+        user_message = build_status_message(status)
+        
+        async def chunks():
+            loop = asyncio.get_running_loop()
+            key, cached, system_prompt = await loop.run_in_executor(None, self._lookup_advice, status, user_message)
+            if cached is not None:
+                self._cached_stream(stream, cached)._record = None
+                yield cached[1]
+                return
+            stream._save = self._analysis_saver(user_message, status, key)
+            replies = self._stream_openai_async([{"role": "user", "content": user_message}], system_prompt)
+            try:
+                async for chunk in replies:
+                    yield chunk
+            finally:
+                # 提前关闭时同时关闭底层的HTTP流
+                await replies.aclose()
+        
+        stream = AsyncAdviceStream(chunks(), None, self.stream_metrics.append)
+        return stream
+
+    
+    @staticmethod
+    def _cached_stream(stream: _StreamState, cached: tuple):
+        """命中缓存的流：对话ID和完整文本在迭代前即可用"""
+        stream.conv_id, stream.text = cached
+        return stream
+    
+    def _analysis_saver(self, user_message: str, status: Dict[str, Any],
+                        key: Optional[str]) -> Callable[[str, bool], str]:
+        """流式自动分析结束时保存对话的回调，完整接收的建议写入缓存和最近邻索引"""
+        def save(advice: str, completed: bool) -> str:
+            conv_id = self._save_analysis(user_message, advice)
+            if completed:
+                self._remember_advice(key, status, conv_id, advice)
+            return conv_id
+        return save
+    
+    def _turn_saver(self, conv_id: str, text: str) -> Callable[[str, bool], str]:
+        """流式对话结束时保存一轮问答的回调"""
+        def save(response: str, completed: bool) -> str:
+            self._save_turn(conv_id, text, response)
+            return conv_id
+        return save
+    
+    def user_advise_stream(self, conv_id: str, text: str) -> AdviceStream:
+        """
+        user_advise() 的流式版本
+        
+        Args:
+            conv_id: 对话ID
+            text: 用户输入的文本
+            
+        Returns:
+            AdviceStream，迭代得到回复的文本片段；对话不存在时只生成提示文本，不保存
+        """
+        conversation = self.history_manager.get_conversation(conv_id)
+        if not conversation:
+            return AdviceStream(iter(["对话不存在，请先创建新对话"]), None, None)
+        
+        history_messages = conversation.get("messages", [])
+        chunks = self._stream_openai(history_messages + [{"role": "user", "content": text}], CHAT_PROMPT)
+        return AdviceStream(chunks, self._turn_saver(conv_id, text), self.stream_metrics.append)
+    
+    def user_advise_stream_async(self, conv_id: str, text: str) -> AsyncAdviceStream:
+        """
+        user_advise_stream() 的异步版本，用 async for 迭代
+        
+        读取对话历史在迭代开始后于事件循环的默认线程池中执行。
+        
+        Args:
+            conv_id: 对话ID
+            text: 用户输入的文本
+            
+        Returns:
+            AsyncAdviceStream
+        """
+        async def chunks():
+            loop = asyncio.get_running_loop()
+            conversation = await loop.run_in_executor(None, self.history_manager.get_conversation, conv_id)
+            if not conversation:
+                stream._record = None
+                yield "对话不存在，请先创建新对话"
+                return
+            stream._save = self._turn_saver(conv_id, text)
+            history_messages = conversation.get("messages", [])
+            replies = self._stream_openai_async(history_messages + [{"role": "user", "content": text}], CHAT_PROMPT)
+            try:
+                async for chunk in replies:
+                    yield chunk
+            finally:
+                await replies.aclose()
+        
+        stream = AsyncAdviceStream(chunks(), None, self.stream_metrics.append)
+        return stream
+    
+    def _batch_options(self, concurrency: Optional[int], queue_size: Optional[int]) -> tuple:
+        """批量分析的并发数和队列长度（参数为None时读取配置 batch 段）"""
+        concurrency = max(1, concurrency or self.batch_config.get("concurrency", 8))
+        queue_size = max(1, queue_size or self.batch_config.get("queue_size", concurrency * 4))
+        return concurrency, queue_size
+    
+    @staticmethod
+    def _batch_items(statuses) -> Iterator[tuple]:
+        """批量分析的输入：字典按 (键, 状态) 遍历，其他可迭代对象以序号为键"""
+        return iter(statuses.items()) if isinstance(statuses, Mapping) else enumerate(statuses)
+    
+    @staticmethod
+    def _batch_result(key: Any, started: float, conv_id: Optional[str], advice: str,
+                      error: Optional[str] = None) -> Dict[str, Any]:
+        """批量分析中一个系统状态的结果"""
+        return {
+            "key": key,
+            "conv_id": conv_id,
+            "advice": advice,
+            "ok": error is None and not is_failure_reply(advice),
+            "error": error,
+            "elapsed": time.perf_counter() - started
+        }
+    
+    def advise_batch(self, statuses: Union[Mapping, Iterable[Dict[str, Any]]], concurrency: int = None,
+                     queue_size: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        为多个系统状态（如集群中各主机的最新状态）并发生成优化建议，按完成顺序返回
+        
+        每个状态经过与 auto_advise() 相同的流程（建议缓存、相近的历史分析、保存到历史记录），
+        在线程池中执行，LLM请求受 llm.requests_per_minute / tokens_per_minute 限速。
+        同时提交的任务最多 concurrency + queue_size 个，调用方取结果慢时不再读取 statuses。
+        
+        Args:
+            statuses: {主机名: 状态} 字典，或状态的可迭代对象（以序号为键），可以是生成器
+            concurrency: 同时执行的分析数，默认读取 batch.concurrency（8）
+            queue_size: 执行中之外最多排队的任务数，默认读取 batch.queue_size（concurrency 的4倍）
+            
+        Yields:
+            {"key", "conv_id", "advice", "ok", "error", "elapsed"}；ok 为False时 advice 为调用失败的提示文本，
+            分析过程抛出异常时 error 为异常信息（否则为None）
+        """
+        concurrency, queue_size = self._batch_options(concurrency, queue_size)
+        items = self._batch_items(statuses)
+        
+        def run(key, status):
+            started = time.perf_counter()
+            try:
+                conv_id, advice = self.auto_advise(status)
+            except Exception as e:
+                return self._batch_result(key, started, None, f"调用LLM失败: {str(e)}", str(e))
+            return self._batch_result(key, started, conv_id, advice)
+        
+        with ThreadPoolExecutor(concurrency, thread_name_prefix="advise-batch") as executor:
+            futures = {executor.submit(run, key, status) for key, status in islice(items, concurrency + queue_size)}
+            try:
+                while futures:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    # 先补充任务再交出结果，调用方处理结果时线程池不空闲
+                    futures |= {executor.submit(run, key, status) for key, status in islice(items, len(done))}
+                    for future in done:
+                        yield future.result()
+            finally:
+                # 调用方提前结束迭代时取消尚未开始的任务
+                for future in futures:
+                    future.cancel()
+    
+    async def advise_batch_async(self, statuses: Union[Mapping, Iterable[Dict[str, Any]], AsyncIterator[Dict[str, Any]]],
+                                 concurrency: int = None, queue_size: int = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        advise_batch() 的异步版本，用 async for 迭代，全部请求在当前事件循环中执行
+        
+        statuses 由一个生产者协程读入长度为 queue_size 的任务队列，concurrency 个工作协程
+        调用 auto_advise_async() 并把结果放入同样有界的结果队列：工作协程跟不上时生产者暂停读取，
+        调用方取结果慢时工作协程暂停。提前结束迭代（break / aclose()）时取消全部协程。
+        
+        Args:
+            statuses: {主机名: 状态} 字典、状态的可迭代对象或异步可迭代对象（以序号为键）
+            concurrency: 同时执行的分析数
+            queue_size: 任务队列和结果队列的长度
+            
+        Yields:
+            与 advise_batch() 相同的结果字典
+        """
+        concurrency, queue_size = self._batch_options(concurrency, queue_size)
+        pending = asyncio.Queue(queue_size)
+        results = asyncio.Queue(queue_size)
+        
+        async def stop_workers():
+            for _ in range(concurrency):
+                await pending.put(None)
+        
+        async def produce():
+            try:
+                if hasattr(statuses, "__aiter__"):
+                    index = 0
+                    async for status in statuses:
+                        await pending.put((index, status))
+                        index += 1
+                else:
+                    for item in self._batch_items(statuses):
+                        await pending.put(item)
+            except Exception:
+                # 读取 statuses 出错时让工作协程处理完已排队的任务后结束，异常在 await producer 时抛出
+                await stop_workers()
+                raise
+            await stop_workers()
+        
+        async def work():
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                key, status = item
+                started = time.perf_counter()
+                try:
+                    conv_id, advice = await self.auto_advise_async(status)
+                    result = self._batch_result(key, started, conv_id, advice)
+                except Exception as e:
+                    result = self._batch_result(key, started, None, f"调用LLM失败: {str(e)}", str(e))
+                await results.put(result)
+            await results.put(None)
+        
+        producer = asyncio.create_task(produce())
+        workers = [asyncio.create_task(work()) for _ in range(concurrency)]
+        try:
+            running = concurrency
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                else:
+                    yield result
+            # 读取 statuses 出错时在这里抛出
+            await producer
+        finally:
+            for task in [producer] + workers:
+                task.cancel()
+            await asyncio.gather(producer, *workers, return_exceptions=True)
+    
     def continue_conversation(self, conv_id: str, user_input: str) -> str:
         """
         继续现有对话（user_advise的别名）
@@ -181,6 +1009,12 @@ CPU使用率: {status.get('cpu', 0)}%
             AI的回复
         """
         return self.user_advise(conv_id, user_input)
+    
+    def close(self):
+        """关闭LLM客户端的连接，写出建议缓存中尚未落盘的修改"""
+        self.llm_pool.close()
+        if self.advice_cache is not None:
+            self.advice_cache.close()
 
 
 # 提供便捷的函数接口
@@ -207,6 +1041,20 @@ def auto_advise(status: Dict[str, Any]) -> tuple[str, str]:
     return get_advisor().auto_advise(status)
 
 
+def advise_batch(statuses: Union[Mapping, Iterable[Dict[str, Any]]], concurrency: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    为多个系统状态并发生成优化建议（便捷函数）
+    
+    Args:
+        statuses: {主机名: 状态} 字典或状态的可迭代对象
+        concurrency: 同时执行的分析数，默认读取配置 batch.concurrency
+        
+    Yields:
+        {"key", "conv_id", "advice", "ok", "error", "elapsed"}，按完成顺序
+    """
+    return get_advisor().advise_batch(statuses, concurrency)
+
+
 def user_advise(conv_id: str, text: str) -> str:
     """
     处理用户与AI的对话
@@ -219,3 +1067,30 @@ def user_advise(conv_id: str, text: str) -> str:
         AI的回复
     """
     return get_advisor().user_advise(conv_id, text)
+
+
+def auto_advise_stream(status: Dict[str, Any]) -> AdviceStream:
+    """
+    根据系统状态流式生成优化建议
+    
+    Args:
+        status: 系统状态字典
+        
+    Returns:
+        AdviceStream，迭代得到建议的文本片段，结束后 conv_id 为对话ID
+    """
+    return get_advisor().auto_advise_stream(status)
+
+
+def user_advise_stream(conv_id: str, text: str) -> AdviceStream:
+    """
+    流式处理用户与AI的对话
+    
+    Args:
+        conv_id: 对话ID
+        text: 用户输入的文本
+        
+    Returns:
+        AdviceStream，迭代得到回复的文本片段
+    """
+    return get_advisor().user_advise_stream(conv_id, text)
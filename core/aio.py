@@ -0,0 +1,142 @@
+"""
+asyncio接口模块
+提供 get_status、get_top_processes、check_alerts、auto_advise、user_advise 的协程版本
+以及 auto_advise_stream、user_advise_stream、advise_batch 的异步迭代器版本，
+一个事件循环即可同时服务大量会话，不需要为每个请求占用一个线程。
+"""
+import asyncio
+from typing import Dict, Any, List, AsyncIterator
+
+from . import system_monitor
+from .advisor import get_advisor, AsyncAdviceStream
+
+
+async def get_status(fresh: bool = False) -> Dict[str, Any]:
+    """
+    获取系统状态信息（协程版本）
+
+    默认直接返回后台采样器的最新快照；采样器尚无快照时在事件循环中等待一次采样。
+
+    Args:
+        fresh: 为True时以当前时刻为基准等待1秒再刷新全部采集器，等待期间不阻塞事件循环
+
+    Returns:
+        与 system_monitor.get_status() 相同结构的字典
+    """
+    sampler = system_monitor.get_sampler()
+    if fresh:
+        return dict(await sampler.fresh_sample_async())
+
+    if not sampler.running:
+        sampler.start()
+
+    status = sampler.latest()
+    if status is None:
+        status = await sampler.sample_async()
+    return dict(status)
+
+
+async def get_top_processes(limit: int = 5, sort_by: str = "cpu") -> List[Dict[str, Any]]:
+    """
+    获取占用资源最多的进程（协程版本）
+
+    遍历进程表是同步的系统调用，放到事件循环的默认线程池中执行。
+
+    Args:
+        limit: 返回的进程数量
+        sort_by: 排序依据，"cpu"、"rss"、"io" 或 "fds"
+
+    Returns:
+        进程信息列表
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, system_monitor.get_top_processes, limit, sort_by)
+
+
+async def check_alerts(status: Dict[str, Any], thresholds: Dict[str, float] = None) -> List[str]:
+    """
+    检查是否有需要告警的指标（协程版本，纯计算，不会让出事件循环）
+
+    Args:
+        status: 系统状态字典
+        thresholds: 告警阈值字典
+
+    Returns:
+        告警信息列表
+    """
+    return system_monitor.check_alerts(status, thresholds)
+
+
+async def auto_advise(status: Dict[str, Any]) -> tuple[str, str]:
+    """
+    根据系统状态自动生成优化建议（协程版本）
+
+    Args:
+        status: 系统状态字典
+
+    Returns:
+        (conv_id, advice) - 对话ID和建议内容
+    """
+    return await get_advisor().auto_advise_async(status)
+
+
+def advise_batch(statuses, concurrency: int = None, queue_size: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    为多个系统状态并发生成优化建议（异步迭代器版本），按完成顺序返回
+
+        async for result in aio.advise_batch({host: aggregator.latest(host) for host in aggregator.hosts()}):
+            print(result["key"], result["advice"])
+
+    Args:
+        statuses: {主机名: 状态} 字典、状态的可迭代对象或异步可迭代对象
+        concurrency: 同时执行的分析数，默认读取配置 batch.concurrency
+        queue_size: 任务队列和结果队列的长度，默认读取配置 batch.queue_size
+
+    Returns:
+        异步迭代器，每个结果为 {"key", "conv_id", "advice", "ok", "elapsed"}
+    """
+    return get_advisor().advise_batch_async(statuses, concurrency, queue_size)
+
+
+async def user_advise(conv_id: str, text: str) -> str:
+    """
+    处理用户与AI的对话（协程版本）
+
+    Args:
+        conv_id: 对话ID
+        text: 用户输入的文本
+
+    Returns:
+        AI的回复
+    """
+    return await get_advisor().user_advise_async(conv_id, text)
+
+
+def auto_advise_stream(status: Dict[str, Any]) -> AsyncAdviceStream:
+    """
+    根据系统状态流式生成优化建议（异步迭代器版本）
+
+        async for chunk in aio.auto_advise_stream(status):
+            print(chunk, end="", flush=True)
+
+    Args:
+        status: 系统状态字典
+
+    Returns:
+        AsyncAdviceStream，结束或 aclose() 后回复已写入历史，conv_id 为对话ID
+    """
+    return get_advisor().auto_advise_stream_async(status)
+
+
+def user_advise_stream(conv_id: str, text: str) -> AsyncAdviceStream:
+    """
+    流式处理用户与AI的对话（异步迭代器版本）
+
+    Args:
+        conv_id: 对话ID
+        text: 用户输入的文本
+
+    Returns:
+        AsyncAdviceStream
+    """
+    return get_advisor().user_advise_stream_async(conv_id, text)
@@ -0,0 +1,386 @@
+"""
+告警规则引擎模块
+在 check_alerts 的阈值基础上提供有状态的告警：进入/退出阈值（迟滞）、持续时长条件、变化率条件，
+并对触发/恢复事件去重。批量接口可一次性对整段历史数据做向量化评估。
+"""
+import math
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时逐点评估
+    np = None
+
+from .system_monitor import ALERT_LABELS, format_alert
+
+
+class AlertRule:
+    """告警规则"""
+
+    def __init__(self, name: str, metric: str, threshold: float, clear_threshold: float = None,
+                 duration: float = 0.0, signal: str = "value", rate_window: float = 60.0,
+                 message: str = None):
+        """
+        初始化告警规则
+
+        Args:
+            name: 规则名称（同一引擎内唯一）
+            metric: 指标名，使用展开后的键路径，如 "cpu"、"details.memory.used"
+            threshold: 进入阈值，信号 > threshold 时进入告警状态
+            clear_threshold: 退出阈值，信号 <= clear_threshold 时退出告警状态；默认等于threshold（无迟滞）
+            duration: 持续时长（秒），处于告警状态满这么久才触发
+            signal: "value" 按指标值判断，"rate" 按指标每秒变化率判断
+            rate_window: 计算变化率的时间窗口（秒）
+            message: 告警文本，默认与 check_alerts 格式一致
+        """
+        if signal not in ("value", "rate"):
+            raise ValueError(f"不支持的信号类型: {signal}")
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.clear_threshold = threshold if clear_threshold is None else clear_threshold
+        if self.clear_threshold > threshold:
+            raise ValueError("退出阈值不能高于进入阈值")
+        self.duration = duration
+        self.signal = signal
+        self.rate_window = rate_window
+        self.message = message
+
+    def format(self, value: float) -> str:
+        """生成告警文本"""
+        if self.message:
+            return self.message.format(value=value, metric=self.metric, threshold=self.threshold)
+        if self.signal == "value" and self.metric in ALERT_LABELS:
+            return format_alert(self.metric, value)
+        return f"⚠️ {self.name}: {self.metric} = {round(value, 2)}"
+
+
+class AlertEvent:
+    """告警事件：规则开始触发（firing）或恢复（resolved）"""
+
+    def __init__(self, rule: str, host: str, state: str, timestamp: float, value: float, message: str):
+        self.rule = rule
+        self.host = host
+        self.state = state
+        self.timestamp = timestamp
+        self.value = value
+        self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "rule": self.rule,
+            "host": self.host,
+            "state": self.state,
+            "timestamp": self.timestamp,
+            "value": self.value,
+            "message": self.message
+        }
+
+    def __repr__(self) -> str:
+        return f"AlertEvent({self.rule!r}, {self.host!r}, {self.state!r}, {self.timestamp}, {self.value})"
+
+
+class _RuleState:
+    """单条规则在单台主机上的状态"""
+
+    def __init__(self):
+        self.active = False       # 是否处于迟滞后的告警区间
+        self.since = None         # 进入告警区间的时间
+        self.firing = False       # 是否已触发（满足持续时长）
+        self.last_time = None     # 最后一次评估的时间
+        self.history = deque()    # 变化率规则的 (timestamp, value) 窗口
+
+
+def _lookup(status: Dict[str, Any], metric: str) -> Optional[float]:
+    """按键路径读取指标值"""
+    value = status
+    for key in metric.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+class AlertEngine:
+    """有状态的告警规则引擎"""
+
+    def __init__(self, rules: Sequence[AlertRule] = None):
+        """
+        初始化规则引擎
+
+        Args:
+            rules: 规则列表
+        """
+        self.rules: Dict[str, AlertRule] = {}
+        self._states: Dict[Tuple[str, str], _RuleState] = {}
+        for rule in rules or []:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: AlertRule):
+        """添加规则（同名规则会被替换并重置状态）"""
+        self.rules[rule.name] = rule
+        for key in [key for key in self._states if key[0] == rule.name]:
+            del self._states[key]
+
+    def remove_rule(self, name: str) -> bool:
+        """删除规则"""
+        if self.rules.pop(name, None) is None:
+            return False
+        for key in [key for key in self._states if key[0] == name]:
+            del self._states[key]
+        return True
+
+    def reset(self):
+        """清空所有规则状态"""
+        self._states.clear()
+
+    def _state(self, rule: AlertRule, host: str) -> _RuleState:
+        key = (rule.name, host)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _RuleState()
+        return state
+
+    def active_alerts(self, host: str = None) -> List[Dict[str, Any]]:
+        """
+        获取当前处于触发状态的告警
+
+        Args:
+            host: 只返回指定主机的告警
+
+        Returns:
+            [{"rule", "host", "since"}]
+        """
+        return [
+            {"rule": name, "host": state_host, "since": state.since}
+            for (name, state_host), state in self._states.items()
+            if state.firing and (host is None or state_host == host)
+        ]
+
+    # ------------------------------------------------------------------
+    # 逐点评估
+    # ------------------------------------------------------------------
+
+    def _signal(self, rule: AlertRule, state: _RuleState, timestamp: float, value: float) -> float:
+        """计算规则的判断信号（值或变化率）"""
+        if rule.signal == "value":
+            return value
+        history = state.history
+        history.append((timestamp, value))
+        while len(history) > 1 and history[1][0] <= timestamp - rule.rate_window:
+            history.popleft()
+        first_time, first_value = history[0]
+        if timestamp <= first_time:
+            return math.nan
+        return (value - first_value) / (timestamp - first_time)
+
+    def _step(self, rule: AlertRule, state: _RuleState, host: str, timestamp: float,
+              value: float) -> Optional[AlertEvent]:
+        """用一个采样点推进规则状态，状态变化时返回事件"""
+        signal = self._signal(rule, state, timestamp, value)
+        state.last_time = timestamp
+        if signal != signal:
+            return None
+
+        if signal > rule.threshold:
+            if not state.active:
+                state.active = True
+                state.since = timestamp
+        elif signal <= rule.clear_threshold:
+            state.active = False
+
+        firing = state.active and timestamp - state.since >= rule.duration
+        if firing == state.firing:
+            return None
+        state.firing = firing
+        if firing:
+            return AlertEvent(rule.name, host, "firing", timestamp, signal, rule.format(signal))
+        state.since = None
+        return AlertEvent(rule.name, host, "resolved", timestamp, signal, rule.format(signal))
+
+    def evaluate(self, status: Dict[str, Any], timestamp: float = None, host: str = "localhost") -> List[AlertEvent]:
+        """
+        用一次系统状态推进所有规则
+
+        Args:
+            status: 系统状态字典（来自get_status()）
+            timestamp: 采样时间，默认为当前时间
+            host: 主机名
+
+        Returns:
+            本次产生的事件列表（已去重，持续触发的告警不会重复产生事件）
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        events = []
+        for rule in self.rules.values():
+            value = _lookup(status, rule.metric)
+            if value is None:
+                continue
+            event = self._step(rule, self._state(rule, host), host, timestamp, value)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def evaluate_hosts(self, statuses: Dict[str, Dict[str, Any]], timestamp: float = None) -> List[AlertEvent]:
+        """
+        同时评估多台主机
+
+        Args:
+            statuses: {主机名: 系统状态字典}
+            timestamp: 采样时间，默认为当前时间
+
+        Returns:
+            事件列表
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        events = []
+        for host, status in statuses.items():
+            events.extend(self.evaluate(status, timestamp, host))
+        return events
+
+    # ------------------------------------------------------------------
+    # 批量评估
+    # ------------------------------------------------------------------
+
+    def evaluate_batch(self, timestamps: Sequence[float], values: Dict[str, Sequence[float]],
+                       host: str = "localhost") -> List[AlertEvent]:
+        """
+        按时间顺序批量评估一段采样数据，结果与逐点调用 evaluate() 相同
+
+        Args:
+            timestamps: 单调递增的采样时间
+            values: {指标名: 与timestamps等长的取值序列}，缺失值用NaN表示
+            host: 主机名
+
+        Returns:
+            按时间排序的事件列表
+        """
+        events = []
+        for rule in self.rules.values():
+            if rule.metric not in values:
+                continue
+            events.extend(self._evaluate_rule_batch(rule, host, timestamps, values[rule.metric]))
+        events.sort(key=lambda event: event.timestamp)
+        return events
+
+    def replay(self, store, seconds: float = None, host: str = "localhost") -> List[AlertEvent]:
+        """
+        对时间序列存储中的历史数据批量评估所有规则
+
+        Args:
+            store: MetricStore实例
+            seconds: 只评估最近这么多秒的数据，默认为全部
+            host: 主机名
+
+        Returns:
+            按时间排序的事件列表
+        """
+        events = []
+        for rule in self.rules.values():
+            timestamps, values = store.series(rule.metric, seconds)
+            if timestamps:
+                events.extend(self._evaluate_rule_batch(rule, host, timestamps, values))
+        events.sort(key=lambda event: event.timestamp)
+        return events
+
+    def _evaluate_rule_batch(self, rule: AlertRule, host: str, timestamps: Sequence[float],
+                             values: Sequence[float]) -> List[AlertEvent]:
+        """对单条规则批量评估，numpy可用时向量化计算"""
+        state = self._state(rule, host)
+        if np is None or rule.signal == "rate" and state.history:
+            # 变化率规则跨批次衔接需要逐点窗口，直接逐点评估
+            events = []
+            for timestamp, value in zip(timestamps, values):
+                if value != value:
+                    continue
+                event = self._step(rule, state, host, timestamp, float(value))
+                if event is not None:
+                    events.append(event)
+            return events
+
+        t = np.asarray(timestamps, dtype=float)
+        v = np.asarray(values, dtype=float)
+        keep = ~np.isnan(v)
+        t, v = t[keep], v[keep]
+        n = len(t)
+        if n == 0:
+            return []
+        index = np.arange(n)
+
+        if rule.signal == "value":
+            signal = v
+        else:
+            # 每个点的窗口起点：最后一个时间 <= t - window 的点，不足窗口时取第一个点
+            start = np.searchsorted(t, t - rule.rate_window, side="right") - 1
+            start = np.clip(start, 0, None)
+            elapsed = t - t[start]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                signal = np.where(elapsed > 0, (v - v[start]) / elapsed, np.nan)
+
+        # 迟滞：超过进入阈值记1，低于退出阈值记0，其余沿用前一个状态
+        marks = np.full(n, -1)
+        marks[signal <= rule.clear_threshold] = 0
+        marks[signal > rule.threshold] = 1
+        last_mark = np.maximum.accumulate(np.where(marks >= 0, index, -1))
+        active = np.where(last_mark >= 0, marks[np.clip(last_mark, 0, None)], int(state.active)).astype(bool)
+
+        # 每段告警区间的起始时间
+        previous_active = np.concatenate(([state.active], active[:-1]))
+        run_start = np.maximum.accumulate(np.where(active & ~previous_active, index, -1))
+        since = np.where(run_start >= 0, t[np.clip(run_start, 0, None)],
+                         state.since if state.since is not None else np.nan)
+        firing = active & (t - since >= rule.duration)
+
+        previous_firing = np.concatenate(([state.firing], firing[:-1]))
+        changes = np.nonzero(firing != previous_firing)[0]
+        events = [
+            AlertEvent(rule.name, host, "firing" if firing[i] else "resolved", float(t[i]),
+                       float(signal[i]), rule.format(float(signal[i])))
+            for i in changes
+        ]
+
+        # 保存批次末尾的状态，使后续的逐点/批量评估可以衔接
+        state.active = bool(active[-1])
+        state.firing = bool(firing[-1])
+        state.since = float(since[-1]) if state.active else None
+        state.last_time = float(t[-1])
+        if rule.signal == "rate":
+            window_start = np.searchsorted(t, t[-1] - rule.rate_window, side="right") - 1
+            state.history = deque(zip(t[max(window_start, 0):].tolist(), v[max(window_start, 0):].tolist()))
+        return events
+
+
+def default_rules(config: Dict[str, Any] = None, hysteresis: float = 5.0, duration: float = 0.0) -> List[AlertRule]:
+    """
+    根据配置文件中的 monitoring.*_warning_threshold 生成默认规则
+
+    Args:
+        config: 配置字典，默认读取 config/settings.json
+        hysteresis: 退出阈值比进入阈值低多少（百分点）
+        duration: 持续时长（秒）
+
+    Returns:
+        CPU、内存、磁盘三条规则
+    """
+    if config is None:
+        from .utils import load_config
+        config = load_config()
+    monitoring = config.get("monitoring", {})
+    defaults = {"cpu": 80, "memory": 85, "disk": 90}
+    return [
+        AlertRule(
+            name=metric,
+            metric=metric,
+            threshold=monitoring.get(f"{metric}_warning_threshold", default),
+            clear_threshold=monitoring.get(f"{metric}_warning_threshold", default) - hysteresis,
+            duration=duration
+        )
+        for metric, default in defaults.items()
+    ]
@@ -0,0 +1,276 @@
+"""
+采集器注册表模块
+每类指标注册为一个采集器并声明自己的刷新间隔，一次快照只运行到期的采集器。
+到期的采集器在有界线程池中并行执行，各自有超时时间，超时的采集器沿用上一次的值并标记为过期。
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, List, Optional
+
+
+class _DaemonPool:
+    """由守护线程组成的有界线程池；卡死的采集函数不会阻止进程退出"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._tasks = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[[], Any]) -> Future:
+        """提交任务，返回 concurrent.futures.Future"""
+        future = Future()
+        self._tasks.put((future, func))
+        with self._lock:
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, name=f"collector-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _worker(self):
+        while True:
+            future, func = self._tasks.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class Collector:
+    """单个指标采集器"""
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: float = 0.0, static: bool = False,
+                 timeout: float = None):
+        """
+        初始化采集器
+
+        Args:
+            name: 采集器名称
+            func: 无参数的采集函数，返回该类指标的值
+            interval: 刷新间隔（秒），0表示每次快照都刷新
+            static: 是否为静态数据（只在注册时采集一次）
+            timeout: 单次采集的超时时间（秒），None表示使用注册表的默认值
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.static = static
+        self.timeout = timeout
+        self.value = None
+        self.error = None
+        self.stale = False
+        self.last_run = None
+        self._future = None
+
+    def due(self, now: float) -> bool:
+        """判断采集器是否到期"""
+        if self.last_run is None:
+            return True
+        if self.static:
+            return False
+        return now - self.last_run >= self.interval
+
+    @property
+    def busy(self) -> bool:
+        """上一次提交的采集是否仍在执行"""
+        return self._future is not None and not self._future.done()
+
+    def run(self, now: float = None) -> Any:
+        """
+        在当前线程同步执行一次采集，失败时保留上一次的值
+
+        Returns:
+            最新的值
+        """
+        if now is None:
+            now = time.monotonic()
+        self.last_run = now
+        try:
+            self._set(self.func(), None)
+        except Exception as e:
+            self._set(None, e)
+        return self.value
+
+    def _set(self, value: Any, error: Optional[Exception]):
+        """记录一次采集结果；失败时沿用上一次的值并标记为过期"""
+        if error is None:
+            self.value = value
+            self.error = None
+            self.stale = False
+        else:
+            self.error = error
+            self.stale = True
+
+    def _complete(self, future: Future):
+        """线程池中的采集完成后回写结果（超时后才完成的采集也会在这里更新）"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        self._set(None if error else future.result(), error)
+
+
+class CollectorRegistry:
+    """采集器注册表"""
+
+    def __init__(self, max_workers: int = 8, timeout: float = 2.0):
+        """
+        初始化注册表
+
+        Args:
+            max_workers: 并行执行采集器的最大线程数
+            timeout: 采集器的默认超时时间（秒）
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._collectors: Dict[str, Collector] = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._collectors
+
+    def names(self) -> List[str]:
+        """获取已注册的采集器名称"""
+        return list(self._collectors)
+
+    def get(self, name: str) -> Optional[Collector]:
+        """获取指定的采集器"""
+        return self._collectors.get(name)
+
+    def register(self, name: str, func: Callable[[], Any], interval: float = 0.0,
+                 static: bool = False, timeout: float = None) -> Collector:
+        """
+        注册采集器，同名采集器会被替换
+
+        Args:
+            name: 采集器名称
+            func: 无参数的采集函数
+            interval: 刷新间隔（秒）
+            static: 是否为静态数据；静态数据在注册时立即采集一次，之后不再刷新
+            timeout: 单次采集的超时时间（秒），None表示使用注册表的默认值
+
+        Returns:
+            注册的采集器
+        """
+        collector = Collector(name, func, interval, static, timeout)
+        if static:
+            collector.run()
+        with self._lock:
+            self._collectors[name] = collector
+        return collector
+
+    def unregister(self, name: str) -> bool:
+        """
+        注销采集器
+
+        Returns:
+            是否成功
+        """
+        with self._lock:
+            return self._collectors.pop(name, None) is not None
+
+    def set_interval(self, name: str, interval: float) -> bool:
+        """
+        修改采集器的刷新间隔
+
+        Returns:
+            是否成功
+        """
+        collector = self._collectors.get(name)
+        if collector is None:
+            return False
+        collector.interval = interval
+        return True
+
+    def _get_pool(self) -> _DaemonPool:
+        """延迟创建线程池"""
+        if self._pool is None:
+            self._pool = _DaemonPool(self.max_workers)
+        return self._pool
+
+    def submit(self, force: bool = False, now: float = None) -> List[tuple]:
+        """
+        把到期的采集器提交到线程池
+
+        Args:
+            force: 是否忽略刷新间隔，提交全部非静态采集器
+            now: 单调时钟时间，默认为 time.monotonic()
+
+        Returns:
+            待等待的 (截止时间, 采集器, future) 列表
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            collectors = list(self._collectors.values())
+
+        pending = []
+        for collector in collectors:
+            if not ((force and not collector.static) or collector.due(now)):
+                continue
+            if collector.busy:
+                # 上一次采集仍未返回（如挂死的网络文件系统），继续使用旧值
+                collector.stale = True
+                continue
+            collector.last_run = now
+            future = self._get_pool().submit(collector.func)
+            collector._future = future
+            future.add_done_callback(collector._complete)
+            timeout = self.timeout if collector.timeout is None else collector.timeout
+            pending.append((now + timeout, collector, future))
+        return pending
+
+    def wait(self, pending: List[tuple]):
+        """等待已提交的采集器，每个最多等到各自的截止时间"""
+        for deadline, collector, future in sorted(pending, key=lambda item: item[0]):
+            try:
+                future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                collector.stale = True
+                continue
+            except Exception:
+                pass
+            # 回调可能尚未执行，这里直接回写结果
+            collector._complete(future)
+
+    async def wait_async(self, pending: List[tuple]):
+        """wait() 的协程版本，等待期间不阻塞事件循环"""
+        async def wait_one(deadline, collector, future):
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                       max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                collector.stale = True
+                return
+            except Exception:
+                pass
+            collector._complete(future)
+
+        await asyncio.gather(*(wait_one(*item) for item in pending))
+
+    def snapshot(self) -> Dict[str, Collector]:
+        """获取 {采集器名称: 采集器} 的副本"""
+        with self._lock:
+            return dict(self._collectors)
+
+    def collect(self, force: bool = False, now: float = None) -> Dict[str, Collector]:
+        """
+        并行运行所有到期的采集器，耗时取决于最慢的采集器，且不超过其超时时间
+
+        超时或失败的采集器保留上一次的值并标记 stale；上一次提交仍在执行的采集器不会重复提交。
+
+        Args:
+            force: 是否忽略刷新间隔，运行全部非静态采集器
+            now: 单调时钟时间，默认为 time.monotonic()
+
+        Returns:
+            {采集器名称: 采集器}，可从中读取最新的 value / error / stale
+        """
+        self.wait(self.submit(force, now))
+        return self.snapshot()
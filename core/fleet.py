@@ -0,0 +1,390 @@
+"""
+集群监控模块
+各主机上的轻量代理把 get_status() 的快照编码为紧凑的二进制帧，通过TCP或Unix套接字推送给
+一个asyncio汇总服务；汇总服务保存每台主机的最新状态和最近一段时间的窗口数据，并回答集群级查询。
+
+帧格式（网络字节序）:
+    uint32 长度 | uint8 版本 | uint8 主机名长度 | float64 时间戳 | 5 x float32 指标 | uint32 进程数 | 主机名(UTF-8)
+"""
+import asyncio
+import heapq
+import math
+import socket
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, Any, List, Optional, Tuple, Union, Callable
+
+from .system_monitor import get_status
+
+
+PROTOCOL_VERSION = 1
+
+# 帧中携带的指标，顺序即编码顺序
+FIELDS = ("cpu", "memory", "disk", "network_sent_rate", "network_recv_rate")
+
+_LENGTH = struct.Struct("!I")
+_HEADER = struct.Struct("!BBd5fI")
+
+# TCP地址 (host, port) 或 Unix套接字路径
+Address = Union[Tuple[str, int], str]
+
+
+def encode_snapshot(host: str, status: Dict[str, Any], timestamp: float = None) -> bytes:
+    """
+    将系统状态编码为带长度前缀的二进制帧
+
+    Args:
+        host: 主机名（最长255字节）
+        status: 系统状态字典（来自get_status()）
+        timestamp: 采样时间，默认为当前时间
+
+    Returns:
+        可直接写入套接字的帧
+    """
+    name = host.encode("utf-8")[:255]
+    payload = _HEADER.pack(
+        PROTOCOL_VERSION,
+        len(name),
+        time.time() if timestamp is None else timestamp,
+        *[float(status.get(field, 0) or 0) for field in FIELDS],
+        int(status.get("details", {}).get("process_count", 0) or 0)
+    ) + name
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_snapshot(payload: bytes) -> Dict[str, Any]:
+    """
+    解码一帧（不含长度前缀）
+
+    Returns:
+        {"host", "timestamp", "cpu", "memory", "disk", "network_sent_rate", "network_recv_rate", "process_count"}
+
+    Raises:
+        ValueError: 帧格式或版本不正确
+    """
+    if len(payload) < _HEADER.size:
+        raise ValueError("帧长度不足")
+    version, name_length, timestamp, *values, process_count = _HEADER.unpack_from(payload)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"不支持的协议版本: {version}")
+    if len(payload) != _HEADER.size + name_length:
+        raise ValueError("帧长度与主机名长度不符")
+    # float32传输，保留两位小数即可去掉精度噪声
+    snapshot = {field: round(value, 2) for field, value in zip(FIELDS, values)}
+    snapshot["host"] = payload[_HEADER.size:].decode("utf-8", errors="replace")
+    snapshot["timestamp"] = timestamp
+    snapshot["process_count"] = process_count
+    return snapshot
+
+
+def _connect(address: Address, timeout: float) -> socket.socket:
+    """连接汇总服务"""
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class FleetAgent:
+    """推送代理：在后台线程中按固定间隔把本机快照推送给汇总服务，断线自动重连"""
+
+    def __init__(self, address: Address, host: str = None, interval: float = 1.0,
+                 status_func: Callable[[], Dict[str, Any]] = None, timeout: float = 5.0):
+        """
+        初始化代理
+
+        Args:
+            address: 汇总服务地址，(host, port) 或 Unix套接字路径
+            host: 上报的主机名，默认为本机主机名
+            interval: 推送间隔（秒）
+            status_func: 获取状态的函数，默认为非阻塞的 get_status
+            timeout: 连接和发送的超时时间（秒）
+        """
+        self.address = address
+        self.host = host or socket.gethostname()
+        self.interval = interval
+        self.status_func = status_func or get_status
+        self.timeout = timeout
+        self.sent = 0
+        self._sock = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def send_once(self) -> bool:
+        """
+        立即推送一次快照
+
+        Returns:
+            是否成功
+        """
+        frame = encode_snapshot(self.host, self.status_func())
+        try:
+            if self._sock is None:
+                self._sock = _connect(self.address, self.timeout)
+            self._sock.sendall(frame)
+        except OSError:
+            self.close()
+            return False
+        self.sent += 1
+        return True
+
+    def close(self):
+        """关闭连接"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def start(self):
+        """启动后台推送线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="fleet-agent", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """停止推送并关闭连接"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self.close()
+
+    def _run(self):
+        backoff = self.interval
+        while not self._stop_event.is_set():
+            if self.send_once():
+                backoff = self.interval
+            else:
+                # 连接失败时指数退避，最长60秒
+                backoff = min(backoff * 2, 60.0)
+            self._stop_event.wait(backoff)
+
+
+async def run_async_agent(address: Address, host: str, interval: float = 1.0,
+                          status_func: Callable[[], Dict[str, Any]] = None, count: int = None):
+    """
+    协程版推送代理，适合在一个事件循环中模拟大量主机（如本机回环测试）
+
+    Args:
+        address: 汇总服务地址
+        host: 上报的主机名
+        interval: 推送间隔（秒）
+        status_func: 获取状态的函数，默认为非阻塞的 get_status
+        count: 推送次数，None表示一直推送
+    """
+    status_func = status_func or get_status
+    if isinstance(address, str):
+        _, writer = await asyncio.open_unix_connection(address)
+    else:
+        _, writer = await asyncio.open_connection(*address)
+    try:
+        sent = 0
+        while count is None or sent < count:
+            writer.write(encode_snapshot(host, status_func()))
+            await writer.drain()
+            sent += 1
+            await asyncio.sleep(interval)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+class _HostWindow:
+    """单台主机的最新状态与固定容量的指标窗口"""
+
+    __slots__ = ("latest", "received", "timestamps", "columns", "count")
+
+    def __init__(self, capacity: int):
+        self.latest = None
+        # 汇总服务收到最新快照时的单调时钟时间；判断离线不使用代理自己的时间戳，主机之间的时钟偏差不影响结果
+        self.received = 0.0
+        self.timestamps = array('d', [math.nan]) * capacity
+        self.columns = {field: array('d', [math.nan]) * capacity for field in FIELDS}
+        self.count = 0
+
+    def add(self, snapshot: Dict[str, Any]):
+        slot = self.count % len(self.timestamps)
+        self.timestamps[slot] = snapshot["timestamp"]
+        for field, column in self.columns.items():
+            column[slot] = snapshot[field]
+        self.count += 1
+        self.latest = snapshot
+        self.received = time.monotonic()
+
+    def values(self, field: str, since: float) -> List[float]:
+        column = self.columns[field]
+        return [value for timestamp, value in zip(self.timestamps, column) if timestamp >= since]
+
+
+class FleetAggregator:
+    """asyncio汇总服务：接收各主机推送的快照并提供集群级查询"""
+
+    def __init__(self, window: int = 300, stale_after: float = 5.0, backlog: int = 4096):
+        """
+        初始化汇总服务
+
+        Args:
+            window: 每台主机保留的采样数
+            stale_after: 超过这么多秒未收到快照的主机视为离线（按汇总服务的接收时间计算）
+            backlog: 监听队列长度，大量代理同时连接时需要足够大
+        """
+        self.window = window
+        self.stale_after = stale_after
+        self.backlog = backlog
+        self.frames = 0
+        self.errors = 0
+        self._hosts: Dict[str, _HostWindow] = {}
+        self._servers = []
+        self._writers = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: str = None) -> Address:
+        """
+        开始监听
+
+        Args:
+            host: TCP监听地址
+            port: TCP端口，0表示随机分配
+            path: 指定时改为监听Unix套接字
+
+        Returns:
+            实际监听的地址
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle, path=path, backlog=self.backlog)
+            address = path
+        else:
+            server = await asyncio.start_server(self._handle, host, port, backlog=self.backlog)
+            address = server.sockets[0].getsockname()[:2]
+        self._servers.append(server)
+        return address
+
+    async def stop(self):
+        """停止所有监听并断开已连接的代理"""
+        for server in self._servers:
+            server.close()
+        for writer in list(self._writers):
+            writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个代理连接"""
+        self._writers.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(_LENGTH.size)
+                (length,) = _LENGTH.unpack(header)
+                if length > 4096:
+                    self.errors += 1
+                    break
+                payload = await reader.readexactly(length)
+                try:
+                    self.ingest(decode_snapshot(payload))
+                except ValueError:
+                    self.errors += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def ingest(self, snapshot: Dict[str, Any]):
+        """写入一条已解码的快照"""
+        state = self._hosts.get(snapshot["host"])
+        if state is None:
+            state = self._hosts[snapshot["host"]] = _HostWindow(self.window)
+        state.add(snapshot)
+        self.frames += 1
+
+    def hosts(self, include_stale: bool = True) -> List[str]:
+        """获取已知主机列表"""
+        if include_stale:
+            return list(self._hosts)
+        cutoff = time.monotonic() - self.stale_after
+        return [host for host, state in self._hosts.items() if state.received >= cutoff]
+
+    def latest(self, host: str) -> Optional[Dict[str, Any]]:
+        """获取主机的最新快照"""
+        state = self._hosts.get(host)
+        return dict(state.latest) if state else None
+
+    def host_stats(self, host: str, metric: str = "cpu", seconds: float = 60.0) -> Optional[Dict[str, float]]:
+        """
+        主机在时间窗口内的统计
+
+        Returns:
+            {"count", "min", "max", "mean"}，没有数据时返回None
+        """
+        state = self._hosts.get(host)
+        if state is None:
+            return None
+        values = state.values(metric, state.latest["timestamp"] - seconds)
+        if not values:
+            return None
+        return {
+            "count": len(values),
+            "min": min(values),
+            "max": max(values),
+            "mean": math.fsum(values) / len(values)
+        }
+
+    def top_hosts(self, metric: str = "cpu", n: int = 10, seconds: float = None) -> List[Tuple[str, float]]:
+        """
+        按指标取前N台主机
+
+        Args:
+            metric: 指标名（见 FIELDS）
+            n: 数量
+            seconds: 为None时按最新值排序，否则按窗口内均值排序
+
+        Returns:
+            [(主机名, 值)]，从大到小
+        """
+        if metric not in FIELDS:
+            raise ValueError(f"不支持的指标: {metric}")
+        if seconds is None:
+            items = ((host, state.latest[metric]) for host, state in self._hosts.items())
+        else:
+            items = (
+                (host, stats["mean"])
+                for host in self._hosts
+                for stats in [self.host_stats(host, metric, seconds)]
+                if stats is not None
+            )
+        return heapq.nlargest(n, items, key=lambda item: item[1])
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        集群概况
+
+        Returns:
+            主机数、在线主机数以及各指标的最新均值/最大值
+        """
+        cutoff = time.monotonic() - self.stale_after
+        online = [state.latest for state in self._hosts.values() if state.received >= cutoff]
+        result = {"hosts": len(self._hosts), "online": len(online), "frames": self.frames}
+        for field in FIELDS:
+            values = [snapshot[field] for snapshot in online]
+            result[field] = {
+                "mean": math.fsum(values) / len(values) if values else 0.0,
+                "max": max(values) if values else 0.0
+            }
+        return result
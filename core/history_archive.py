@@ -0,0 +1,212 @@
+"""
+历史记录归档模块
+超出保留策略的对话从热存储移到压缩的只追加归档段中：
+- segment-000001.jsonl.gz ...: 每个对话是一个独立的gzip成员（可以直接用 zcat 查看），写满后换下一个段
+- index.jsonl: 只追加的索引，每行记录一个对话的头部以及所在段的偏移和长度，删除时追加一条删除记录
+
+索引常驻内存（只有头部），按ID读取对话时只解压对应的一个gzip成员。
+"""
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+
+from .history_index import header_of
+from .history_store import FileLock, atomic_write, _fsync_directory, _stat_key
+
+
+class HistoryArchive:
+    """压缩归档，按对话ID延迟加载"""
+
+    INDEX_NAME = "index.jsonl"
+    SEGMENT_FORMAT = "segment-{:06d}.jsonl.gz"
+
+    def __init__(self, directory: str, segment_bytes: int = 16 << 20, compresslevel: int = 6):
+        """
+        初始化归档（第一次写入时才创建目录）
+
+        Args:
+            directory: 归档目录
+            segment_bytes: 单个段文件的大小上限，超过后写入新段
+            compresslevel: gzip压缩级别
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compresslevel = compresslevel
+        self.index_path = os.path.join(directory, self.INDEX_NAME)
+        self._lock = threading.RLock()
+        self._file_lock = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._index_key = None
+        self._index_offset = 0
+        self._segment = 1
+
+    def _get_file_lock(self) -> FileLock:
+        if self._file_lock is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file_lock = FileLock(os.path.join(self.directory, "archive.lock"))
+        return self._file_lock
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, self.SEGMENT_FORMAT.format(segment))
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry.get("deleted"):
+            self._entries.pop(entry["id"], None)
+        else:
+            self._entries[entry["id"]] = entry
+            self._segment = max(self._segment, entry["segment"])
+
+    def _refresh(self):
+        """读取其他进程追加的索引行；索引被截短（清空）时重新加载（调用方持有 _lock）"""
+        key = _stat_key(self.index_path)
+        if key == self._index_key:
+            return
+        if key is None or key[1] < self._index_offset or (self._index_key and key[0] != self._index_key[0]):
+            self._entries = {}
+            self._index_offset = 0
+            self._segment = 1
+        if key is not None:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+            # 只处理完整的行，写到一半的末行留到下次
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self._index_offset += end
+        self._index_key = key
+
+    def __contains__(self, conv_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return conv_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
+
+    def list_headers(self) -> List[Dict[str, Any]]:
+        """按归档顺序获取全部已归档对话的头部（含 archived_at），不解压数据"""
+        with self._lock:
+            self._refresh()
+            return [
+                {key: entry[key] for key in ("id", "title", "created_at", "updated_at", "message_count", "archived_at")}
+                for entry in self._entries.values()
+            ]
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取已归档的对话
+
+        Returns:
+            对话字典，不在归档中时返回None
+        """
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(conv_id)
+        if entry is None:
+            return None
+        with open(self._segment_path(entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            data = f.read(entry["length"])
+        return json.loads(gzip.decompress(data))
+
+    def add_many(self, conversations: Iterable[Dict[str, Any]]) -> int:
+        """
+        归档一批对话：先写入段文件并fsync，再追加索引，崩溃时最多在段末留下未被索引引用的数据
+
+        Returns:
+            归档的对话数
+        """
+        archived_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._get_file_lock():
+            self._refresh()
+            entries = []
+            segment_path = self._segment_path(self._segment)
+            f = open(segment_path, "ab")
+            try:
+                for conv in conversations:
+                    if f.tell() >= self.segment_bytes:
+                        os.fsync(f.fileno())
+                        f.close()
+                        self._segment += 1
+                        segment_path = self._segment_path(self._segment)
+                        f = open(segment_path, "ab")
+                    line = json.dumps(conv, ensure_ascii=False, separators=(',', ':')).encode("utf-8") + b"\n"
+                    member = gzip.compress(line, self.compresslevel)
+                    entry = header_of(conv)
+                    entry.update(segment=self._segment, offset=f.tell(), length=len(member), archived_at=archived_at)
+                    f.write(member)
+                    entries.append(entry)
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+            if not entries:
+                return 0
+            self._append_index(entries)
+            _fsync_directory(segment_path)
+            return len(entries)
+
+    def add(self, conversation: Dict[str, Any]):
+        """归档一个对话"""
+        self.add_many([conversation])
+
+    def remove(self, conv_id: str) -> bool:
+        """
+        从归档中删除对话（追加一条删除记录，段中的数据不再被引用）
+
+        Returns:
+            对话是否在归档中
+        """
+        with self._lock, self._get_file_lock():
+            self._refresh()
+            if conv_id not in self._entries:
+                return False
+            self._append_index([{"id": conv_id, "deleted": True}])
+            return True
+
+    def _append_index(self, entries: List[Dict[str, Any]]):
+        """追加索引行并更新内存状态（调用方持有两把锁）"""
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        if self._index_key is not None and self._index_key[1] > self._index_offset:
+            # 截掉崩溃的写入留下的不完整末行
+            os.truncate(self.index_path, self._index_offset)
+        with open(self.index_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in entries:
+            self._apply(entry)
+        self._index_offset += len(data)
+        self._index_key = _stat_key(self.index_path)
+
+    def clear(self):
+        """删除全部归档（先原子替换为空索引，再删除段文件）"""
+        if not os.path.isdir(self.directory):
+            return
+        with self._lock, self._get_file_lock():
+            atomic_write(self.index_path, lambda f: None, binary=True)
+            for name in os.listdir(self.directory):
+                if name.startswith("segment-"):
+                    os.unlink(os.path.join(self.directory, name))
+            self._entries = {}
+            self._index_offset = 0
+            self._segment = 1
+            self._index_key = _stat_key(self.index_path)
+
+    def size_bytes(self) -> int:
+        """归档占用的磁盘空间"""
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+
+    def close(self):
+        with self._lock:
+            if self._file_lock is not None:
+                self._file_lock.close()
+                self._file_lock = None
@@ -0,0 +1,188 @@
+"""
+对话头部索引模块
+只保存对话的 id/title/created_at/updated_at/message_count，按创建时间和更新时间各维护一个有序列表，
+分页、排序和时间范围过滤都通过二分查找完成，不需要读取消息内容。
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+
+SORT_KEYS = ("created_at", "updated_at")
+
+# 时间范围参数可以是与存储格式相同的字符串或 datetime
+TimeBound = Union[str, datetime, None]
+
+
+def normalize_time(value: TimeBound) -> Optional[str]:
+    """把时间范围参数转换为存储使用的 "%Y-%m-%d %H:%M:%S" 字符串"""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def encode_cursor(timestamp: str, conv_id: str) -> str:
+    """把排序键编码为分页游标"""
+    return f"{timestamp}|{conv_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    解析分页游标
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    timestamp, sep, conv_id = cursor.rpartition("|")
+    if not sep:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return timestamp, conv_id
+
+
+def header_of(conv: Dict[str, Any]) -> Dict[str, Any]:
+    """从完整对话中提取头部信息"""
+    return {
+        "id": conv.get("id", ""),
+        "title": conv.get("title", "未命名对话"),
+        "created_at": conv.get("created_at", ""),
+        "updated_at": conv.get("updated_at", ""),
+        "message_count": len(conv.get("messages", []))
+    }
+
+
+class HeaderIndex:
+    """对话头部索引，排序键为 (时间戳, 对话ID)"""
+
+    def __init__(self, headers: List[Dict[str, Any]] = None):
+        self._headers: Dict[str, Dict[str, Any]] = {}
+        self._sorted: Dict[str, List[Tuple[str, str]]] = {key: [] for key in SORT_KEYS}
+        if headers:
+            self.rebuild(headers)
+
+    def __len__(self) -> int:
+        return len(self._headers)
+
+    def __contains__(self, conv_id: str) -> bool:
+        return conv_id in self._headers
+
+    def rebuild(self, headers: List[Dict[str, Any]]):
+        """用一组头部重建索引（一次排序，适合加载时使用）"""
+        self._headers = {header["id"]: header for header in headers}
+        for key in SORT_KEYS:
+            self._sorted[key] = sorted((header[key], conv_id) for conv_id, header in self._headers.items())
+
+    def clear(self):
+        """清空索引"""
+        self._headers.clear()
+        for key in SORT_KEYS:
+            self._sorted[key].clear()
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        """获取头部的副本"""
+        header = self._headers.get(conv_id)
+        return None if header is None else dict(header)
+
+    def put(self, header: Dict[str, Any]):
+        """插入或替换一个头部"""
+        self.remove(header["id"])
+        self._headers[header["id"]] = header
+        for key in SORT_KEYS:
+            insort(self._sorted[key], (header[key], header["id"]))
+
+    def update(self, conv_id: str, **fields) -> bool:
+        """
+        更新头部字段，时间戳变化时调整有序列表中的位置
+
+        Returns:
+            对话是否存在
+        """
+        header = self._headers.get(conv_id)
+        if header is None:
+            return False
+        for key in SORT_KEYS:
+            if key in fields and fields[key] != header[key]:
+                self._discard(key, header[key], conv_id)
+                insort(self._sorted[key], (fields[key], conv_id))
+        header.update(fields)
+        return True
+
+    def remove(self, conv_id: str) -> bool:
+        """
+        删除头部
+
+        Returns:
+            对话是否存在
+        """
+        header = self._headers.pop(conv_id, None)
+        if header is None:
+            return False
+        for key in SORT_KEYS:
+            self._discard(key, header[key], conv_id)
+        return True
+
+    def _discard(self, key: str, timestamp: str, conv_id: str):
+        keys = self._sorted[key]
+        pos = bisect_left(keys, (timestamp, conv_id))
+        if pos < len(keys) and keys[pos] == (timestamp, conv_id):
+            del keys[pos]
+
+    def query(self, limit: int = 20, cursor: str = None, sort_by: str = "updated_at", descending: bool = True,
+              created_after: TimeBound = None, created_before: TimeBound = None,
+              updated_after: TimeBound = None, updated_before: TimeBound = None
+              ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        分页查询头部
+
+        排序字段上的时间范围和游标通过二分查找确定扫描区间，另一个字段上的范围逐条过滤。
+        时间范围为左闭右开：after <= t < before。
+
+        Args:
+            limit: 每页数量
+            cursor: 上一页返回的游标，None表示第一页
+            sort_by: 排序字段，"updated_at" 或 "created_at"
+            descending: 是否从新到旧
+            created_after / created_before: 创建时间范围
+            updated_after / updated_before: 更新时间范围
+
+        Returns:
+            (头部列表, 下一页游标)，没有更多数据时游标为None
+
+        Raises:
+            ValueError: 排序字段或游标无效
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort_by}")
+        if limit <= 0:
+            return [], None
+        ranges = {
+            "created_at": (normalize_time(created_after), normalize_time(created_before)),
+            "updated_at": (normalize_time(updated_after), normalize_time(updated_before))
+        }
+
+        keys = self._sorted[sort_by]
+        start, end = ranges[sort_by]
+        lo = 0 if start is None else bisect_left(keys, (start,))
+        hi = len(keys) if end is None else bisect_left(keys, (end,))
+        if cursor is not None:
+            position = decode_cursor(cursor)
+            if descending:
+                hi = min(hi, bisect_left(keys, position))
+            else:
+                lo = max(lo, bisect_right(keys, position))
+
+        other = "created_at" if sort_by == "updated_at" else "updated_at"
+        other_start, other_end = ranges[other]
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+
+        items = []
+        for pos in positions:
+            header = self._headers[keys[pos][1]]
+            value = header[other]
+            if (other_start is not None and value < other_start) or (other_end is not None and value >= other_end):
+                continue
+            if len(items) == limit:
+                # 还有下一条符合条件的数据，返回游标
+                last = items[-1]
+                return items, encode_cursor(last[sort_by], last["id"])
+            items.append(dict(header))
+        return items, None
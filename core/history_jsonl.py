@@ -0,0 +1,206 @@
+"""
+历史记录JSONL导入导出模块
+流式读写，每次只在内存中保留一行，适合备份、迁移和分析很大的历史记录：
+
+    {"type": "meta", "format": "history-jsonl", "version": 1, "exported_at": "..."}
+    {"type": "conversation", "id": "...", "title": "...", "created_at": "...", "updated_at": "..."}
+    {"type": "message", "conv_id": "...", "role": "user", "content": "...", "timestamp": "..."}
+    ...
+
+消息行紧跟在所属对话行之后。导入时也接受每行一个完整对话（含 messages）的格式，
+例如归档段文件解压后的内容。文件名以 .gz / .bz2 / .xz 结尾时自动压缩/解压。
+
+命令行：
+
+    python -m core.history_jsonl export ./backup/history.jsonl.gz
+    python -m core.history_jsonl import ./backup/history.jsonl.gz
+"""
+import argparse
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+from datetime import datetime
+from typing import Dict, Any, Iterator, Iterable, Tuple, Callable
+
+from .history_store import atomic_write
+
+
+FORMAT_NAME = "history-jsonl"
+FORMAT_VERSION = 1
+
+# 压缩格式 -> (扩展名, 在二进制文件对象上打开压缩流的函数)
+_COMPRESSORS = {
+    "gzip": (".gz", lambda fileobj, mode: gzip.GzipFile(fileobj=fileobj, mode=mode)),
+    "bz2": (".bz2", bz2.BZ2File),
+    "xz": (".xz", lzma.LZMAFile),
+}
+
+
+def detect_compression(path: str, compression: str = "auto") -> str:
+    """
+    确定压缩格式
+
+    Args:
+        path: 文件路径
+        compression: "auto"（按扩展名判断）、"none"、"gzip"、"bz2" 或 "xz"
+
+    Returns:
+        压缩格式名称，不压缩时为 "none"
+
+    Raises:
+        ValueError: 不支持的压缩格式
+    """
+    if compression == "auto":
+        for name, (suffix, _) in _COMPRESSORS.items():
+            if path.endswith(suffix):
+                return name
+        return "none"
+    if compression != "none" and compression not in _COMPRESSORS:
+        raise ValueError(f"不支持的压缩格式: {compression}")
+    return compression
+
+
+def _wrap(fileobj, compression: str, mode: str):
+    """在二进制文件对象上包装解压/压缩层"""
+    if compression == "none":
+        return fileobj
+    return _COMPRESSORS[compression][1](fileobj, mode)
+
+
+def write_jsonl(path: str, records: Iterable[Dict[str, Any]], compression: str = "auto") -> int:
+    """
+    流式写入JSONL文件（临时文件 + 原子替换，写入中途失败不会留下不完整的文件）
+
+    Args:
+        path: 目标路径
+        records: 记录迭代器
+        compression: 压缩格式，见 detect_compression()
+
+    Returns:
+        写入的行数
+    """
+    compression = detect_compression(path, compression)
+    count = 0
+
+    def write(f):
+        nonlocal count
+        stream = _wrap(f, compression, "wb")
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="\n")
+        for record in records:
+            text.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            text.write("\n")
+            count += 1
+        text.flush()
+        text.detach()
+        if stream is not f:
+            stream.close()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    atomic_write(path, write, binary=True)
+    return count
+
+
+def read_jsonl(path: str, compression: str = "auto") -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取JSONL文件
+
+    Raises:
+        ValueError: 某一行不是合法的JSON对象（附带行号）
+    """
+    compression = detect_compression(path, compression)
+    with open(path, "rb") as f:
+        stream = _wrap(f, compression, "rb")
+        for number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} 第 {number} 行格式不正确: {e}")
+            if not isinstance(record, dict):
+                raise ValueError(f"{path} 第 {number} 行不是JSON对象")
+            yield record
+
+
+def export_records(headers: Iterable[Dict[str, Any]],
+                   messages: Callable[[str], Iterable[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """
+    把对话头部和消息转换为导出格式的记录
+
+    Args:
+        headers: 对话头部迭代器
+        messages: 根据对话ID返回消息迭代器的函数
+
+    Returns:
+        记录迭代器，第一条为 meta 记录
+    """
+    yield {"type": "meta", "format": FORMAT_NAME, "version": FORMAT_VERSION,
+           "exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    for header in headers:
+        yield {"type": "conversation", "id": header["id"], "title": header.get("title", "未命名对话"),
+               "created_at": header.get("created_at", ""), "updated_at": header.get("updated_at", "")}
+        for message in messages(header["id"]):
+            record = {"type": "message", "conv_id": header["id"]}
+            record.update(message)
+            yield record
+
+
+def parse_records(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    把导入的记录转换为 ("conversation", 头部) 和 ("message", 消息) 事件
+
+    Raises:
+        ValueError: 版本不支持，或消息出现在对话之前/不属于当前对话
+    """
+    current = None
+    for record in records:
+        kind = record.get("type")
+        if kind == "meta":
+            if record.get("version", FORMAT_VERSION) > FORMAT_VERSION:
+                raise ValueError(f"不支持的导出格式版本: {record.get('version')}")
+        elif kind == "conversation" or (kind is None and "messages" in record):
+            header = {key: record[key] for key in ("id", "title", "created_at", "updated_at") if key in record}
+            if "id" not in header:
+                raise ValueError("对话记录缺少 id")
+            current = header["id"]
+            yield "conversation", header
+            # 每行一个完整对话的格式
+            for message in record.get("messages", ()):
+                yield "message", message
+        elif kind == "message":
+            if record.get("conv_id", current) != current or current is None:
+                raise ValueError(f"消息不属于当前对话: {record.get('conv_id')}")
+            message = {key: value for key, value in record.items() if key not in ("type", "conv_id")}
+            yield "message", message
+
+
+def main():
+    from .history_manager import get_manager
+
+    parser = argparse.ArgumentParser(description="以JSONL格式流式导出/导入对话历史")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="JSONL文件路径，.gz/.bz2/.xz 结尾时自动压缩")
+    parser.add_argument("--compression", default="auto", choices=["auto", "none", "gzip", "bz2", "xz"])
+    parser.add_argument("--include-archived", action="store_true", help="导出时包含已归档的对话")
+    parser.add_argument("--replace", action="store_true", help="导入时替换ID相同的已有对话（默认跳过）")
+    args = parser.parse_args()
+
+    manager = get_manager()
+    try:
+        if args.action == "export":
+            result = manager.export_jsonl(args.path, args.compression, include_archived=args.include_archived)
+            print(f"已导出 {result['conversations']} 个对话、{result['messages']} 条消息到 {args.path}")
+        else:
+            result = manager.import_jsonl(args.path, args.compression, skip_existing=not args.replace)
+            print(f"已导入 {result['conversations']} 个对话、{result['messages']} 条消息，"
+                  f"跳过 {result['skipped']} 个已有对话")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,47 +2,267 @@
 历史记录管理模块
 负责对话历史的存储、读取和管理
 """
-import json
+import atexit
 import os
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from .utils import generate_conversation_id, format_timestamp, truncate_text, ensure_data_directory
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
+from datetime import datetime, timedelta
+from .utils import generate_conversation_id, format_timestamp, truncate_text, load_config
+from .history_store import HistoryStore, create_store
+from .history_index import TimeBound
+from .history_search import SearchIndex, make_snippet, tokenize
+from .history_archive import HistoryArchive
+from .history_jsonl import write_jsonl, read_jsonl, export_records, parse_records
 
 
 class HistoryManager:
     """历史记录管理器"""
     
-    def __init__(self, history_path: str = "./data/history.json"):
+    def __init__(self, history_path: str = "./data/history.json", storage: str = "journal",
+                 flush_delay: float = 0.0, max_conversations: int = None, max_age_days: float = None,
+                 max_bytes: int = None, archive_path: str = None, serializer: str = "json"):
         """
         初始化历史管理器
         
         Args:
             history_path: 历史记录文件路径
+            storage: 存储后端，"journal"（快照+追加日志，默认）、"json"（每次重写整个文件）
+                     或 "sqlite"（此时 history_path 为数据库文件路径）
+            flush_delay: 写后合并的最长延迟（秒）；大于0时一段时间内的写入合并为一次落盘，
+                         进程退出时自动落盘。0表示每次写入立即落盘
+            max_conversations: 保留策略，热存储中最多保留的对话数，None表示不限制
+            max_age_days: 保留策略，超过该天数未更新的对话移入归档，None表示不限制
+            max_bytes: 保留策略，热存储文件大小上限（字节），None表示不限制
+            archive_path: 归档目录，默认为 history_path 去掉扩展名后加 "_archive"
+            serializer: json/journal 后端的文件格式，"json"（紧凑JSON，默认）、"json-pretty"、"orjson"、
+                        "msgspec" 或 "binary"；读取时按文件内容自动识别，切换后下一次写入生效
         """
         self.history_path = history_path
-        ensure_data_directory(history_path)
-        self._ensure_history_file()
+        self.store: HistoryStore = create_store(history_path, storage, flush_delay, serializer)
+        self.max_conversations = max_conversations
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.archive = HistoryArchive(archive_path or os.path.splitext(history_path)[0] + "_archive")
+        # 全文检索索引在第一次搜索时建立，之后随写入增量更新
+        self._search_index: Optional[SearchIndex] = None
+        self._search_lock = threading.Lock()
     
-    def _ensure_history_file(self):
-        """确保历史记录文件存在"""
-        if not os.path.exists(self.history_path):
-            self._save_data({"conversations": []})
+    def batch(self):
+        """
+        合并上下文中的写入，退出时一次落盘
+        
+        示例:
+            with manager.batch():
+                manager.add_message(conv_id, "user", question)
+                manager.add_message(conv_id, "assistant", answer)
+        """
+        return self.store.batch()
     
-    def _load_data(self) -> Dict[str, Any]:
-        """加载历史数据"""
-        try:
-            with open(self.history_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {"conversations": []}
+    def flush(self):
+        """立即落盘尚未写出的修改"""
+        self.store.flush()
     
-    def _save_data(self, data: Dict[str, Any]):
-        """保存历史数据"""
-        try:
-            with open(self.history_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"保存历史记录失败: {e}")
+    def close(self):
+        """落盘并关闭存储后端，保存检索索引"""
+        self.save_search_index()
+        self.store.close()
+        self.archive.close()
+    
+    def enforce_retention(self, protect: Iterable[str] = ()) -> int:
+        """
+        执行保留策略：把超龄、超出数量上限的对话以及超出大小上限时最旧的对话移入归档
+        
+        按更新时间从旧到新淘汰。
+        
+        Args:
+            protect: 不淘汰的对话ID（例如刚创建的对话）
+            
+        Returns:
+            归档的对话数
+        """
+        protect = set(protect)
+        evict = []
+        
+        if self.max_age_days is not None:
+            cutoff = datetime.now() - timedelta(days=self.max_age_days)
+            cursor = None
+            while True:
+                headers, cursor = self.store.query_headers(limit=500, cursor=cursor, sort_by="updated_at",
+                                                           descending=False, updated_before=cutoff)
+                evict.extend(h["id"] for h in headers if h["id"] not in protect)
+                if cursor is None:
+                    break
+        
+        if self.max_conversations is not None:
+            # 先用维护中的计数判断，超出上限时才按更新时间从旧到新分页取出需要淘汰的对话
+            excess = self.store.count() - len(evict) - self.max_conversations
+            if excess > 0:
+                chosen = set(evict) | protect
+                cursor = None
+                while excess > 0:
+                    headers, cursor = self.store.query_headers(limit=excess + len(chosen), cursor=cursor,
+                                                               sort_by="updated_at", descending=False)
+                    for header in headers:
+                        if excess > 0 and header["id"] not in chosen:
+                            evict.append(header["id"])
+                            excess -= 1
+                    if cursor is None:
+                        break
+        
+        archived = self.archive_conversations(evict)
+        
+        if self.max_bytes is not None:
+            archived += self._enforce_max_bytes(protect)
+        return archived
+    
+    def _enforce_max_bytes(self, protect: set) -> int:
+        """
+        热存储超出大小上限时分批归档最旧的对话，直到低于上限
+        
+        每条消息占用的空间按“当前文件大小 / 总消息数”估算，只读取头部，不加载消息内容。
+        """
+        archived = 0
+        size = self.store.size_bytes()
+        if size > self.max_bytes:
+            # 先回收日志、WAL和已删除对话占用的空间，再按实际大小判断是否需要归档
+            self.store.compact()
+            size = self.store.size_bytes()
+        while size > self.max_bytes:
+            headers = sorted(self.store.list_headers(), key=lambda h: (h["updated_at"], h["id"]))
+            per_message = size / max(sum(max(h["message_count"], 1) for h in headers), 1)
+            batch = []
+            freed = 0.0
+            for header in headers:
+                if header["id"] in protect:
+                    continue
+                batch.append(header["id"])
+                freed += max(header["message_count"], 1) * per_message
+                if freed >= size - self.max_bytes:
+                    break
+            if not batch:
+                break
+            archived += self.archive_conversations(batch)
+            self.store.compact()
+            size = self.store.size_bytes()
+        return archived
+    
+    def archive_conversations(self, conv_ids: Iterable[str]) -> int:
+        """
+        把对话从热存储移入归档（先写归档，再从热存储删除）
+        
+        Args:
+            conv_ids: 对话ID列表
+            
+        Returns:
+            归档的对话数
+        """
+        conversations = [conv for conv in map(self.store.get, conv_ids) if conv is not None]
+        if not conversations:
+            return 0
+        self.archive.add_many(conversations)
+        with self.batch():
+            for conv in conversations:
+                self.store.delete(conv["id"])
+                if self._search_index is not None:
+                    self._search_index.remove_conversation(conv["id"])
+        return len(conversations)
+    
+    def restore_conversation(self, conv_id: str) -> bool:
+        """
+        把已归档的对话移回热存储
+        
+        Args:
+            conv_id: 对话ID
+            
+        Returns:
+            是否成功
+        """
+        if self.store.message_count(conv_id) is not None:
+            return True
+        conversation = self.archive.get(conv_id)
+        if conversation is None:
+            return False
+        self.store.create(conversation)
+        self.archive.remove(conv_id)
+        if self._search_index is not None:
+            for position, message in enumerate(conversation.get("messages", [])):
+                self._search_index.add(conv_id, position, message.get("content", ""))
+        return True
+    
+    def list_archived(self) -> List[Dict[str, Any]]:
+        """
+        获取已归档的对话头部（最近更新的在前）
+        
+        Returns:
+            [{"id", "title", "created_at", "updated_at", "message_count", "archived_at"}, ...]
+        """
+        return sorted(self.archive.list_headers(), key=lambda h: (h["updated_at"], h["id"]), reverse=True)
+    
+    def _get_search_index(self) -> SearchIndex:
+        """延迟加载检索索引（文件为 history_path + ".search"），并补齐索引文件之后的写入"""
+        with self._search_lock:
+            if self._search_index is None:
+                index = SearchIndex(self.history_path + ".search")
+                index.load()
+                index.sync(self.store)
+                if index.dirty:
+                    index.save()
+                self._search_index = index
+                atexit.register(self.save_search_index)
+            return self._search_index
+    
+    def save_search_index(self):
+        """把检索索引中尚未保存的修改写入磁盘"""
+        index = self._search_index
+        if index is not None and index.dirty:
+            try:
+                index.save()
+            except Exception as e:
+                print(f"保存检索索引失败: {e}")
+    
+    def search(self, query: str, limit: int = 10, refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        全文检索历史消息
+        
+        中文按相邻两字切分、英文按单词切分，返回包含全部查询词的消息，按BM25得分排序。
+        
+        Args:
+            query: 查询文本
+            limit: 返回数量
+            refresh: 是否先与存储对齐（其他进程写入的消息只有对齐后才能搜到）
+            
+        Returns:
+            命中列表
+            [
+                {"conv_id": "...", "title": "...", "message_index": 3, "role": "assistant",
+                 "timestamp": "...", "score": 7.2, "snippet": "...内存泄漏通常..."},
+                ...
+            ]
+        """
+        index = self._get_search_index()
+        if refresh:
+            index.sync(self.store)
+        
+        terms = list(dict.fromkeys(tokenize(query)))
+        conversations = {}
+        results = []
+        for conv_id, position, score in index.query(query, limit):
+            if conv_id not in conversations:
+                conversations[conv_id] = self.store.get(conv_id)
+            conv = conversations[conv_id]
+            if conv is None or position >= len(conv.get("messages", [])):
+                continue
+            message = conv["messages"][position]
+            results.append({
+                "conv_id": conv_id,
+                "title": conv.get("title", "未命名对话"),
+                "message_index": position,
+                "role": message.get("role", ""),
+                "timestamp": message.get("timestamp", ""),
+                "score": round(score, 4),
+                "snippet": make_snippet(message.get("content", ""), terms)
+            })
+        return results
     
     def get_history_list(self) -> List[Dict[str, str]]:
         """
@@ -55,22 +275,204 @@ class HistoryManager:
                 ...
             ]
         """
-        data = self._load_data()
-        conversations = data.get("conversations", [])
-        
-        # 返回简化的列表信息
+        # 只读取对话头部，不加载消息
         result = []
-        for conv in conversations:
+        for header in self.store.list_headers():
             result.append({
-                "id": conv.get("id", ""),
-                "title": conv.get("title", "未命名对话"),
-                "timestamp": conv.get("created_at", "")
+                "id": header["id"],
+                "title": header["title"],
+                "timestamp": header["created_at"]
             })
         
         # 按时间倒序排列（最新的在前面）
         result.reverse()
         return result
     
+    def list_conversations(self, limit: int = 20, cursor: str = None, sort_by: str = "updated_at",
+                           descending: bool = True, created_after: TimeBound = None, created_before: TimeBound = None,
+                           updated_after: TimeBound = None, updated_before: TimeBound = None
+                           ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        分页获取对话头部，不读取消息内容
+        
+        Args:
+            limit: 每页数量
+            cursor: 上一页返回的游标，None表示第一页
+            sort_by: 排序字段，"updated_at"（默认）或 "created_at"
+            descending: 是否从新到旧
+            created_after / created_before: 创建时间范围（左闭右开，字符串或datetime）
+            updated_after / updated_before: 更新时间范围（左闭右开，字符串或datetime）
+            
+        Returns:
+            (对话头部列表, 下一页游标)，没有更多数据时游标为None
+            [
+                {"id": "...", "title": "...", "created_at": "...", "updated_at": "...", "message_count": 2},
+                ...
+            ]
+        """
+        return self.store.query_headers(
+            limit=limit, cursor=cursor, sort_by=sort_by, descending=descending,
+            created_after=created_after, created_before=created_before,
+            updated_after=updated_after, updated_before=updated_before
+        )
+    
+    def iter_conversations(self, include_archived: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        按创建顺序逐个生成完整对话，每次只在内存中保留一个对话
+        
+        Args:
+            include_archived: 是否在热存储之后继续生成已归档的对话
+            
+        Returns:
+            对话字典的生成器
+        """
+        yield from self.store.iter_conversations()
+        if include_archived:
+            for header in self.archive.list_headers():
+                conv = self.archive.get(header["id"])
+                if conv is not None:
+                    yield conv
+    
+    def iter_messages(self, conv_id: str = None, include_archived: bool = False) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """
+        逐条生成消息
+        
+        Args:
+            conv_id: 对话ID，None表示按对话的创建顺序遍历全部消息
+            include_archived: conv_id 为None时是否包含已归档的对话
+            
+        Returns:
+            (对话ID, 消息) 的生成器
+        """
+        if conv_id is not None:
+            if self.store.message_count(conv_id) is not None:
+                for message in self.store.iter_messages(conv_id):
+                    yield conv_id, message
+            else:
+                conv = self.archive.get(conv_id)
+                for message in (conv or {}).get("messages", []):
+                    yield conv_id, message
+            return
+        for header in self.store.iter_headers():
+            for message in self.store.iter_messages(header["id"]):
+                yield header["id"], message
+        if include_archived:
+            for header in self.archive.list_headers():
+                for message in (self.archive.get(header["id"]) or {}).get("messages", []):
+                    yield header["id"], message
+    
+    def export_jsonl(self, path: str, compression: str = "auto", include_archived: bool = False) -> Dict[str, int]:
+        """
+        流式导出为JSONL文件（格式见 core.history_jsonl）
+        
+        Args:
+            path: 目标路径，以 .gz / .bz2 / .xz 结尾时自动压缩
+            compression: "auto"、"none"、"gzip"、"bz2" 或 "xz"
+            include_archived: 是否包含已归档的对话
+            
+        Returns:
+            {"conversations": 对话数, "messages": 消息数}
+        """
+        result = {"conversations": 0, "messages": 0}
+        archived = {}
+        
+        def headers():
+            for header in self.store.iter_headers():
+                result["conversations"] += 1
+                yield header
+            if include_archived:
+                for header in self.archive.list_headers():
+                    archived[header["id"]] = True
+                    result["conversations"] += 1
+                    yield header
+        
+        def messages(conv_id):
+            if conv_id in archived:
+                source = (self.archive.get(conv_id) or {}).get("messages", [])
+            else:
+                source = self.store.iter_messages(conv_id)
+            for message in source:
+                result["messages"] += 1
+                yield message
+        
+        write_jsonl(path, export_records(headers(), messages), compression)
+        return result
+    
+    def import_jsonl(self, path: str, compression: str = "auto", skip_existing: bool = True,
+                     batch_messages: int = 1000) -> Dict[str, int]:
+        """
+        流式导入JSONL文件，按批写入存储，内存占用与文件大小无关
+        
+        Args:
+            path: JSONL文件路径
+            compression: "auto"、"none"、"gzip"、"bz2" 或 "xz"
+            skip_existing: 是否跳过ID已存在（热存储或归档中）的对话；False时替换
+            batch_messages: 每批写入的最大消息数
+            
+        Returns:
+            {"conversations": 导入的对话数, "messages": 导入的消息数, "skipped": 跳过的对话数}
+            
+        Raises:
+            ValueError: 文件格式不正确
+        """
+        result = {"conversations": 0, "messages": 0, "skipped": 0}
+        pending: List[Dict[str, Any]] = []
+        pending_messages = 0
+        current = None      # 正在导入的对话；None表示跳过当前对话的消息
+        created = False     # 当前对话是否已随上一批写入，之后的消息直接追加
+        
+        def write_pending():
+            nonlocal pending, pending_messages, current, created
+            if pending:
+                self.store.bulk_create(pending)
+            pending, pending_messages = [], 0
+            if current is not None:
+                # 当前对话已随这一批写入，之后的消息直接追加
+                current, created = dict(current, messages=[]), True
+        
+        def finish():
+            # 追加消息会把 updated_at 改为消息时间，导入完成后恢复原值
+            if current is not None and created:
+                self.store.set_title(current["id"], current["title"], current["updated_at"])
+        
+        with self.batch():
+            for kind, data in parse_records(read_jsonl(path, compression)):
+                if kind == "conversation":
+                    finish()
+                    current, created = None, False
+                    conv_id = data["id"]
+                    if self.store.message_count(conv_id) is not None or conv_id in self.archive:
+                        if skip_existing:
+                            result["skipped"] += 1
+                            continue
+                        self.store.delete(conv_id)
+                        self.archive.remove(conv_id)
+                    current = {
+                        "id": conv_id,
+                        "title": data.get("title", "未命名对话"),
+                        "created_at": data.get("created_at", ""),
+                        "updated_at": data.get("updated_at", data.get("created_at", "")),
+                        "messages": []
+                    }
+                    pending.append(current)
+                    result["conversations"] += 1
+                elif current is not None:
+                    result["messages"] += 1
+                    if created:
+                        self.store.append_message(current["id"], data)
+                        continue
+                    current["messages"].append(data)
+                    pending_messages += 1
+                if pending_messages >= batch_messages or len(pending) >= batch_messages:
+                    write_pending()
+            write_pending()
+            finish()
+        
+        if self._search_index is not None:
+            self._search_index.sync(self.store)
+        self.enforce_retention()
+        return result
+    
     def create_conversation(self, title: str = None, initial_message: Dict[str, str] = None) -> str:
         """
         创建新对话
@@ -101,9 +503,17 @@ class HistoryManager:
             conversation["messages"].append(initial_message)
         
         # 保存到历史记录
-        data = self._load_data()
-        data["conversations"].append(conversation)
-        self._save_data(data)
+        self.store.create(conversation)
+        
+        if self._search_index is not None:
+            for position, message in enumerate(conversation["messages"]):
+                self._search_index.add(conv_id, position, message.get("content", ""))
+        
+        # 新对话使热存储增长，此时执行保留策略
+        try:
+            self.enforce_retention(protect=[conv_id])
+        except Exception as e:
+            print(f"归档历史记录失败: {e}")
         
         return conv_id
     
@@ -117,11 +527,23 @@ class HistoryManager:
         Returns:
             对话信息字典，如果不存在返回None
         """
-        data = self._load_data()
-        for conv in data["conversations"]:
-            if conv["id"] == conv_id:
-                return conv
-        return None
+        conversation = self.store.get(conv_id)
+        if conversation is None:
+            # 不在热存储中时从归档按需读取
+            conversation = self.archive.get(conv_id)
+        return conversation
+    
+    def has_conversation(self, conv_id: str) -> bool:
+        """
+        对话是否存在（热存储或归档中），不读取消息
+        
+        Args:
+            conv_id: 对话ID
+            
+        Returns:
+            是否存在
+        """
+        return self.store.message_count(conv_id) is not None or conv_id in self.archive
     
     def switch_conversation(self, conv_id: str) -> Optional[List[Dict[str, str]]]:
         """
@@ -155,26 +577,29 @@ class HistoryManager:
         Returns:
             是否成功
         """
-        data = self._load_data()
-        
-        for conv in data["conversations"]:
-            if conv["id"] == conv_id:
-                message = {
-                    "role": role,
-                    "content": content,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                conv["messages"].append(message)
-                conv["updated_at"] = message["timestamp"]
-                
-                # 如果是第一条用户消息，用它来更新标题
-                if role == "user" and len(conv["messages"]) == 1:
-                    conv["title"] = truncate_text(content, 30)
-                
-                self._save_data(data)
-                return True
-        
-        return False
+        count = self.store.message_count(conv_id)
+        if count is None:
+            # 继续已归档的对话时先移回热存储
+            if not self.restore_conversation(conv_id):
+                return False
+            count = self.store.message_count(conv_id)
+        
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        
+        # 如果是第一条用户消息，用它来更新标题
+        title = None
+        if role == "user" and count == 0:
+            title = truncate_text(content, 30)
+        
+        if not self.store.append_message(conv_id, message, title):
+            return False
+        if self._search_index is not None:
+            self._search_index.add(conv_id, count, content)
+        return True
     
     def delete_conversation(self, conv_id: str) -> bool:
         """
@@ -186,16 +611,11 @@ class HistoryManager:
         Returns:
             是否成功
         """
-        data = self._load_data()
-        conversations = data["conversations"]
-        
-        original_length = len(conversations)
-        data["conversations"] = [c for c in conversations if c["id"] != conv_id]
-        
-        if len(data["conversations"]) < original_length:
-            self._save_data(data)
-            return True
-        return False
+        if not self.store.delete(conv_id):
+            return self.archive.remove(conv_id)
+        if self._search_index is not None:
+            self._search_index.remove_conversation(conv_id)
+        return True
     
     def clear_all_history(self) -> bool:
         """
@@ -205,7 +625,10 @@ class HistoryManager:
             是否成功
         """
         try:
-            self._save_data({"conversations": []})
+            self.store.clear()
+            self.archive.clear()
+            if self._search_index is not None:
+                self._search_index.clear()
             return True
         except Exception as e:
             print(f"清空历史记录失败: {e}")
@@ -222,26 +645,43 @@ class HistoryManager:
         Returns:
             是否成功
         """
-        data = self._load_data()
-        
-        for conv in data["conversations"]:
-            if conv["id"] == conv_id:
-                conv["title"] = new_title
-                conv["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self._save_data(data)
-                return True
-        
-        return False
+        return self.store.set_title(conv_id, new_title, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
 
 # 提供便捷的函数接口
 _default_manager = None
 
-def get_manager(history_path: str = "./data/history.json") -> HistoryManager:
-    """获取默认的历史管理器实例"""
+def get_manager(history_path: str = None, storage: str = None,
+                config_path: str = "./config/settings.json") -> HistoryManager:
+    """
+    获取默认的历史管理器实例
+    
+    Args:
+        history_path: 历史记录路径，默认读取配置 data.history_path（sqlite后端为 data.sqlite_path）
+        storage: 存储后端，默认读取配置 data.storage，未配置时为 "journal"
+        config_path: 配置文件路径
+    
+    写后合并的延迟读取配置 data.flush_delay（秒），未配置时为0。
+    保留策略读取配置 data.max_conversations、data.max_age_days、data.max_bytes，归档目录读取 data.archive_path，
+    文件格式读取 data.serializer（未配置时为 "json"）。
+    """
     global _default_manager
     if _default_manager is None:
-        _default_manager = HistoryManager(history_path)
+        data_config = load_config(config_path).get("data", {})
+        storage = storage or data_config.get("storage", "journal")
+        if history_path is None:
+            if storage == "sqlite":
+                history_path = data_config.get("sqlite_path", "./data/history.db")
+            else:
+                history_path = data_config.get("history_path", "./data/history.json")
+        _default_manager = HistoryManager(
+            history_path, storage, data_config.get("flush_delay", 0.0),
+            max_conversations=data_config.get("max_conversations"),
+            max_age_days=data_config.get("max_age_days"),
+            max_bytes=data_config.get("max_bytes"),
+            archive_path=data_config.get("archive_path"),
+            serializer=data_config.get("serializer", "json")
+        )
     return _default_manager
 
 
@@ -250,6 +690,16 @@ def get_history_list() -> List[Dict[str, str]]:
     return get_manager().get_history_list()
 
 
+def search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """全文检索历史消息（参数见 HistoryManager.search）"""
+    return get_manager().search(query, limit)
+
+
+def list_conversations(limit: int = 20, cursor: str = None, **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """分页获取对话头部（参数见 HistoryManager.list_conversations）"""
+    return get_manager().list_conversations(limit, cursor, **filters)
+
+
 def switch_conversation(conv_id: str) -> Optional[List[Dict[str, str]]]:
     """切换到指定对话"""
     return get_manager().switch_conversation(conv_id)
@@ -0,0 +1,71 @@
+"""
+历史记录迁移工具
+在不同存储后端之间一次性复制全部对话，例如把 history.json（含日志）迁移到SQLite：
+
+    python -m core.history_migrate --from ./data/history.json --to ./data/history.db
+
+迁移完成后在配置文件中设置 data.storage 为 "sqlite"。
+"""
+import argparse
+import os
+from typing import Dict
+
+from .history_store import create_store
+
+
+def migrate_history(src_path: str, dst_path: str, src_storage: str = "journal",
+                    dst_storage: str = "sqlite") -> Dict[str, int]:
+    """
+    把源存储中的全部对话复制到目标存储
+
+    Args:
+        src_path: 源路径
+        dst_path: 目标路径
+        src_storage: 源存储后端（journal 兼容只有 history.json 的旧格式）
+        dst_storage: 目标存储后端
+
+    Returns:
+        {"conversations": 对话数, "messages": 消息数}
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+        ValueError: 目标已有对话（避免重复迁移）
+    """
+    if not os.path.exists(src_path):
+        raise FileNotFoundError(src_path)
+
+    src = create_store(src_path, src_storage)
+    dst = create_store(dst_path, dst_storage)
+    try:
+        if dst.list_headers():
+            raise ValueError(f"目标存储已有对话: {dst_path}")
+        result = {"conversations": 0, "messages": 0}
+
+        def counted():
+            # 逐个读取源对话，不把整个历史载入内存
+            for conv in src.iter_conversations():
+                result["conversations"] += 1
+                result["messages"] += len(conv.get("messages", []))
+                yield conv
+
+        dst.bulk_create(counted())
+        return result
+    finally:
+        src.close()
+        dst.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在存储后端之间迁移对话历史")
+    parser.add_argument("--from", dest="src", default="./data/history.json", help="源路径")
+    parser.add_argument("--to", dest="dst", default="./data/history.db", help="目标路径")
+    parser.add_argument("--from-storage", default="journal", choices=["journal", "json", "sqlite"])
+    parser.add_argument("--to-storage", default="sqlite", choices=["journal", "json", "sqlite"])
+    args = parser.parse_args()
+
+    result = migrate_history(args.src, args.dst, args.from_storage, args.to_storage)
+    print(f"已迁移 {result['conversations']} 个对话、{result['messages']} 条消息: {args.src} -> {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
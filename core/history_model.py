@@ -0,0 +1,190 @@
+"""
+对话历史的紧凑内存模型
+json/journal 后端在内存中保存全部对话。每条消息原本是一个含三个字符串键的字典，
+再加上重复的角色字符串和19字符的时间字符串，每条消息的额外开销有数百字节。这里改为：
+- Message / Conversation 使用 __slots__，没有每个实例的 __dict__
+- 角色字符串驻留（sys.intern），所有消息共享同一个对象
+- 时间戳保存为整数秒（按 "%Y-%m-%d %H:%M:%S" 本地时间字符串直接换算，不做时区转换，与字符串一一对应）
+
+对外接口仍然是原来的字典结构，由 to_dict() 在返回时按需生成，每次返回的都是新的字典。
+"""
+import sys
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Union, Iterator
+
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 不能无损换算为整数的时间戳（空字符串、其他格式）保留原字符串
+Timestamp = Union[int, str]
+
+
+def encode_time(value: Any) -> Timestamp:
+    """
+    把 "%Y-%m-%d %H:%M:%S" 字符串换算为整数秒
+
+    Returns:
+        整数秒；格式不符或换算后不能还原为同一字符串时返回原值
+    """
+    if isinstance(value, str) and len(value) == 19:
+        return _parse_seconds(value)
+    return value
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _parse_seconds(value: str) -> Timestamp:
+    second = value[17:19]
+    if value[16] != ":" or not (second.isascii() and second.isdigit()) or second > "59":
+        return value
+    minute = _parse_minute(value[:16])
+    return value if minute is None else minute + int(second)
+
+
+@lru_cache(maxsize=65536)
+def _parse_minute(value: str) -> Optional[int]:
+    # 逐字段校验后直接换算，比 strptime 快一个数量级；同一分钟内的消息命中缓存
+    if value[4] != "-" or value[7] != "-" or value[10] != " " or value[13] != ":":
+        return None
+    digits = value[0:4] + value[5:7] + value[8:10] + value[11:13] + value[14:16]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    hour, minute = int(value[11:13]), int(value[14:16])
+    if hour > 23 or minute > 59:
+        return None
+    try:
+        days = date(int(value[0:4]), int(value[5:7]), int(value[8:10])).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return None
+    return days * 86400 + hour * 3600 + minute * 60
+
+
+@lru_cache(maxsize=8192)
+def _format_seconds(seconds: int) -> str:
+    days, rest = divmod(seconds, 86400)
+    day = date.fromordinal(days + _EPOCH_ORDINAL)
+    hour, rest = divmod(rest, 3600)
+    minute, second = divmod(rest, 60)
+    return f"{day.year:04d}-{day.month:02d}-{day.day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+
+
+def decode_time(value: Timestamp) -> Any:
+    """把 encode_time() 的结果还原为字符串"""
+    return _format_seconds(value) if isinstance(value, int) else value
+
+
+def intern_role(role: Any) -> Any:
+    """驻留角色字符串"""
+    return sys.intern(role) if type(role) is str else role
+
+
+class Message:
+    """单条消息"""
+
+    __slots__ = ("role", "content", "timestamp", "extra")
+
+    def __init__(self, role: str, content: str, timestamp: Timestamp, extra: Optional[Dict[str, Any]] = None):
+        self.role = intern_role(role)
+        self.content = content
+        self.timestamp = encode_time(timestamp)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Message":
+        """从原有的字典格式创建，未知字段保存在 extra 中"""
+        # 加载历史时每条消息都经过这里，跳过 __init__ 直接填充字段
+        message = cls.__new__(cls)
+        message.role = intern_role(data.get("role"))
+        message.content = data.get("content")
+        timestamp = data.get("timestamp")
+        message.timestamp = _parse_seconds(timestamp) if type(timestamp) is str and len(timestamp) == 19 else timestamp
+        message.extra = None
+        if len(data) > 3:
+            message.extra = {key: value for key, value in data.items()
+                             if key not in ("role", "content", "timestamp")} or None
+        return message
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为原有的字典格式"""
+        data = {"role": self.role, "content": self.content, "timestamp": decode_time(self.timestamp)}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Conversation:
+    """单个对话；消息对象创建后不再修改，对话的复制只需复制消息列表"""
+
+    __slots__ = ("id", "title", "created_at", "updated_at", "messages", "extra")
+
+    def __init__(self, conv_id: str, title: str, created_at: Timestamp, updated_at: Timestamp,
+                 messages: List[Message] = None, extra: Optional[Dict[str, Any]] = None):
+        self.id = conv_id
+        self.title = title
+        self.created_at = encode_time(created_at)
+        self.updated_at = encode_time(updated_at)
+        self.messages = messages if messages is not None else []
+        self.extra = extra or None
+
+    _FIELDS = ("id", "title", "created_at", "updated_at", "messages")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Conversation":
+        """从原有的字典格式创建，未知字段保存在 extra 中"""
+        extra = {key: value for key, value in data.items() if key not in cls._FIELDS} if len(data) > 5 else None
+        return cls(
+            data.get("id", ""),
+            data.get("title", "未命名对话"),
+            data.get("created_at", ""),
+            data.get("updated_at", ""),
+            [Message.from_dict(message) for message in data.get("messages", [])],
+            extra
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为原有的字典格式（新的字典，修改它不影响模型）"""
+        data = self.header_dict()
+        data["messages"] = [message.to_dict() for message in self.messages]
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def header_dict(self) -> Dict[str, Any]:
+        """id/title/created_at/updated_at 四个字段"""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "created_at": decode_time(self.created_at),
+            "updated_at": decode_time(self.updated_at)
+        }
+
+    def header(self) -> Dict[str, Any]:
+        """头部信息，与 history_index.header_of() 的结果相同"""
+        header = self.header_dict()
+        header["message_count"] = len(self.messages)
+        return header
+
+    def iter_message_dicts(self) -> Iterator[Dict[str, Any]]:
+        """逐条生成字典格式的消息"""
+        for message in self.messages:
+            yield message.to_dict()
+
+    def copy(self) -> "Conversation":
+        """浅复制：消息对象共享，消息列表和对话字段独立"""
+        return Conversation(self.id, self.title, self.created_at, self.updated_at, list(self.messages),
+                            dict(self.extra) if self.extra else None)
+
+
+def to_legacy(obj: Any) -> Any:
+    """json.dump 的 default 参数：序列化时逐个把模型对象转换为字典，不需要先生成完整的字典列表"""
+    if isinstance(obj, Conversation):
+        data = obj.header_dict()
+        data["messages"] = obj.messages
+        if obj.extra:
+            data.update(obj.extra)
+        return data
+    if isinstance(obj, Message):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
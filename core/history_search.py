@@ -0,0 +1,429 @@
+"""
+历史记录全文检索模块
+以消息为文档建立倒排索引：中日韩文字按二元组（bigram）切分，其他文字按单词切分；
+查询时从最短的倒排表开始求交集，用BM25排序并返回带摘要的结果。
+索引随 add_message / delete_conversation 增量更新，并以紧凑的二进制格式保存到磁盘。
+"""
+import gc
+import heapq
+import json
+import math
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+from .history_store import HistoryStore, atomic_write
+
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W{_CJK}]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+# 倒排表中的文档ID使用32位无符号整数
+_U32 = "I" if array("I").itemsize == 4 else "L"
+
+# 版本2起 vacuum() 清理过的文档在对话列中记为 _VACUUMED，旧版本的文件会被重新建立
+_MAGIC = b"HSIX2\n"
+
+# 已从倒排表中清理的文档的对话槽位
+_VACUUMED = 0xFFFFFFFF
+
+# BM25参数
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """
+    切分文本：中日韩文字输出相邻两字的二元组（单独一个字时输出该字），其他文字输出小写单词
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词项迭代器
+    """
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _is_cjk(run[0]):
+            if len(run) == 1:
+                yield run
+            else:
+                for i in range(len(run) - 1):
+                    yield run[i:i + 2]
+        else:
+            yield run
+
+
+def _is_cjk(char: str) -> bool:
+    return _CJK_RE.match(char) is not None
+
+
+def _contains(docs: array, doc_id: int) -> bool:
+    """在有序的文档ID数组中二分查找"""
+    pos = bisect_left(docs, doc_id)
+    return pos < len(docs) and docs[pos] == doc_id
+
+
+def make_snippet(content: str, terms: List[str], width: int = 80) -> str:
+    """
+    截取包含最早出现的查询词的片段
+
+    Args:
+        content: 消息内容
+        terms: 查询词项
+        width: 片段长度（字符）
+
+    Returns:
+        单行摘要，两端被截断时加省略号
+    """
+    lowered = content.lower()
+    positions = [pos for pos in (lowered.find(term) for term in terms) if pos >= 0]
+    first = min(positions) if positions else 0
+    start = max(0, first - width // 3)
+    end = min(len(content), start + width)
+    snippet = " ".join(content[start:end].split())
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(content) else "")
+
+
+class SearchIndex:
+    """消息级倒排索引"""
+
+    def __init__(self, path: str = None):
+        """
+        初始化索引
+
+        Args:
+            path: 索引文件路径，None表示只保存在内存中
+        """
+        self.path = path
+        self.dirty = False
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # 词项 -> (文档ID数组, 词频数组)，文档ID按写入顺序递增
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._conv_ids: List[str] = []
+        self._conv_slots: Dict[str, int] = {}
+        self._conv_docs: Dict[str, List[int]] = {}
+        self._doc_conv = array(_U32)
+        self._doc_pos = array(_U32)
+        self._doc_len = array(_U32)
+        self._deleted = set()
+        self._vacuumed = 0
+        self._total_len = 0
+        self._norm_cache: Tuple[Optional[float], List[float]] = (None, [])
+
+    @property
+    def document_count(self) -> int:
+        """未删除的消息数（不含已标记删除和已清理的文档）"""
+        return len(self._doc_len) - self._vacuumed - len(self._deleted)
+
+    def indexed_count(self, conv_id: str) -> int:
+        """对话中已建立索引的消息数"""
+        return len(self._conv_docs.get(conv_id, ()))
+
+    # ---- 增量更新 ----
+
+    def add(self, conv_id: str, position: int, content: str):
+        """
+        为一条消息建立索引
+
+        Args:
+            conv_id: 对话ID
+            position: 消息在对话中的位置
+            content: 消息内容
+        """
+        counts: Dict[str, int] = {}
+        for term in tokenize(content):
+            counts[term] = counts.get(term, 0) + 1
+
+        with self._lock:
+            slot = self._conv_slots.get(conv_id)
+            if slot is None:
+                slot = self._conv_slots[conv_id] = len(self._conv_ids)
+                self._conv_ids.append(conv_id)
+            doc_id = len(self._doc_len)
+            self._doc_conv.append(slot)
+            self._doc_pos.append(position)
+            length = sum(counts.values())
+            self._doc_len.append(length)
+            self._total_len += length
+            self._conv_docs.setdefault(conv_id, []).append(doc_id)
+            for term, tf in counts.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = (array(_U32), array("H"))
+                posting[0].append(doc_id)
+                posting[1].append(min(tf, 65535))
+            self.dirty = True
+
+    def remove_conversation(self, conv_id: str) -> bool:
+        """
+        删除对话的全部消息（标记删除，累计到一定比例后清理倒排表）
+
+        Returns:
+            对话是否在索引中
+        """
+        with self._lock:
+            docs = self._conv_docs.pop(conv_id, None)
+            if docs is None:
+                return False
+            for doc_id in docs:
+                self._deleted.add(doc_id)
+                self._total_len -= self._doc_len[doc_id]
+            self.dirty = True
+            if len(self._deleted) > max(1000, self.document_count // 5):
+                self.vacuum()
+            return True
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._reset()
+            self.dirty = True
+
+    def vacuum(self):
+        """从倒排表中移除已删除的文档（文档ID保持不变，对话列记为 _VACUUMED）"""
+        with self._lock:
+            if not self._deleted:
+                return
+            deleted = self._deleted
+            for term in list(self._postings):
+                docs, tfs = self._postings[term]
+                keep = [i for i, doc_id in enumerate(docs) if doc_id not in deleted]
+                if not keep:
+                    del self._postings[term]
+                elif len(keep) < len(docs):
+                    self._postings[term] = (array(_U32, (docs[i] for i in keep)), array("H", (tfs[i] for i in keep)))
+            for doc_id in deleted:
+                self._doc_conv[doc_id] = _VACUUMED
+            self._vacuumed += len(deleted)
+            self._deleted = set()
+            self.dirty = True
+
+    def sync(self, store: HistoryStore) -> int:
+        """
+        与存储对齐：为新增的消息建立索引，移除已不存在的对话
+
+        只比较对话头部中的消息数，只有发生变化的对话才会读取消息内容。
+
+        Returns:
+            新建立索引的消息数
+        """
+        headers = {header["id"]: header for header in store.list_headers()}
+        added = 0
+        with self._lock:
+            for conv_id in [c for c in self._conv_docs if c not in headers]:
+                self.remove_conversation(conv_id)
+            for conv_id, header in headers.items():
+                indexed = self.indexed_count(conv_id)
+                if header["message_count"] == indexed:
+                    continue
+                conv = store.get(conv_id)
+                if conv is None:
+                    continue
+                messages = conv.get("messages", [])
+                if len(messages) < indexed:
+                    # 对话被替换过，重新建立索引
+                    self.remove_conversation(conv_id)
+                    indexed = 0
+                for position in range(indexed, len(messages)):
+                    self.add(conv_id, position, messages[position].get("content", ""))
+                    added += 1
+        return added
+
+    # ---- 查询 ----
+
+    def _expand(self, term: str) -> List[str]:
+        """单个中日韩字在索引中只出现在二元组里，展开为包含该字的全部词项"""
+        if len(term) == 1 and _is_cjk(term):
+            return [t for t in self._postings if term in t]
+        return [term] if term in self._postings else []
+
+    def _norms(self, avg_len: float) -> List[float]:
+        """各文档的BM25长度归一化因子；平均长度变化不超过5%时沿用缓存，只为新增的文档补算"""
+        cached_avg, norms = self._norm_cache
+        if cached_avg is None or abs(avg_len - cached_avg) > 0.05 * cached_avg:
+            cached_avg, norms = avg_len, []
+            self._norm_cache = (cached_avg, norms)
+        if len(norms) < len(self._doc_len):
+            base, scale = _K1 * (1 - _B), _K1 * _B / cached_avg
+            norms.extend(base + scale * length for length in self._doc_len[len(norms):])
+        return norms
+
+    def query(self, text: str, limit: int = 10) -> List[Tuple[str, int, float]]:
+        """
+        查询包含全部词项的消息
+
+        先从文档最少的查询词开始求交集（倒排表按文档ID有序，用二分查找判断包含），
+        只对最终的候选文档计算BM25得分。
+
+        Args:
+            text: 查询文本
+            limit: 返回数量
+
+        Returns:
+            [(对话ID, 消息位置, 得分)]，按得分从高到低
+        """
+        with self._lock:
+            query_terms = list(dict.fromkeys(tokenize(text)))
+            documents = self.document_count
+            if not query_terms or documents <= 0 or limit <= 0:
+                return []
+
+            groups = [self._expand(term) for term in query_terms]
+            if not all(groups):
+                return []
+            groups.sort(key=lambda terms: sum(len(self._postings[t][0]) for t in terms))
+
+            candidates = self._members(groups[0])
+            for terms in groups[1:]:
+                if not candidates:
+                    return []
+                if len(terms) == 1:
+                    docs = self._postings[terms[0]][0]
+                    candidates = [doc_id for doc_id in candidates if _contains(docs, doc_id)]
+                else:
+                    members = set(self._members(terms))
+                    candidates = [doc_id for doc_id in candidates if doc_id in members]
+            if self._deleted:
+                candidates = [doc_id for doc_id in candidates if doc_id not in self._deleted]
+            if not candidates:
+                return []
+
+            norms = self._norms(max(self._total_len / documents, 1.0))
+            scores = dict.fromkeys(candidates, 0.0)
+            for terms in groups:
+                for term in terms:
+                    docs, tfs = self._postings[term]
+                    # 倒排表中还包含标记删除、尚未清理的文档，文档频率不超过未删除的消息数
+                    df = min(len(docs), documents)
+                    idf = math.log(1 + (documents - df + 0.5) / (df + 0.5)) * (_K1 + 1)
+                    if len(scores) * 16 < len(docs):
+                        for doc_id in scores:
+                            pos = bisect_left(docs, doc_id)
+                            if pos < len(docs) and docs[pos] == doc_id:
+                                tf = tfs[pos]
+                                scores[doc_id] += idf * tf / (tf + norms[doc_id])
+                    else:
+                        for doc_id, tf in zip(docs, tfs):
+                            if doc_id in scores:
+                                scores[doc_id] += idf * tf / (tf + norms[doc_id])
+
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(self._conv_ids[self._doc_conv[doc_id]], self._doc_pos[doc_id], score) for doc_id, score in ranked]
+
+    def _members(self, terms: List[str]):
+        """一组词项的文档ID（有序）"""
+        if len(terms) == 1:
+            return self._postings[terms[0]][0]
+        return sorted(set().union(*(self._postings[term][0] for term in terms)))
+
+    # ---- 持久化 ----
+
+    def save(self, path: str = None):
+        """
+        写入索引文件（原子替换）
+
+        格式: 魔数 | uint32 头部长度 | JSON头部 | 各文档的对话/位置/长度 | 连接在一起的倒排表
+        """
+        path = path or self.path
+        if path is None:
+            return
+        with self._lock:
+            terms = list(self._postings)
+            header = json.dumps({
+                "byteorder": sys.byteorder,
+                "conversations": self._conv_ids,
+                "documents": len(self._doc_len),
+                "terms": terms,
+                "counts": [len(self._postings[t][0]) for t in terms],
+                "deleted": sorted(self._deleted),
+                "total_len": self._total_len
+            }, ensure_ascii=False).encode("utf-8")
+            docs, tfs = array(_U32), array("H")
+            for term in terms:
+                docs.extend(self._postings[term][0])
+                tfs.extend(self._postings[term][1])
+
+            def write(f):
+                f.write(_MAGIC)
+                f.write(len(header).to_bytes(4, "little"))
+                f.write(header)
+                for column in (self._doc_conv, self._doc_pos, self._doc_len, docs, tfs):
+                    f.write(column.tobytes())
+
+            atomic_write(path, write, binary=True)
+            self.dirty = False
+
+    def load(self, path: str = None) -> bool:
+        """
+        读取索引文件
+
+        Returns:
+            是否成功；文件不存在或格式不正确时返回False，索引保持为空
+        """
+        path = path or self.path
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except (OSError, TypeError):
+            return False
+        try:
+            if not content.startswith(_MAGIC):
+                raise ValueError("索引文件格式不正确")
+            offset = len(_MAGIC)
+            header_len = int.from_bytes(content[offset:offset + 4], "little")
+            offset += 4
+            header = json.loads(content[offset:offset + header_len].decode("utf-8"))
+            offset += header_len
+
+            def read(typecode: str, count: int) -> array:
+                nonlocal offset
+                column = array(typecode)
+                size = column.itemsize * count
+                column.frombytes(content[offset:offset + size])
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                offset += size
+                return column
+
+            with self._lock:
+                self._reset()
+                documents = header["documents"]
+                self._doc_conv = read(_U32, documents)
+                self._doc_pos = read(_U32, documents)
+                self._doc_len = read(_U32, documents)
+                total = sum(header["counts"])
+                docs, tfs = read(_U32, total), read("H", total)
+                # 一次创建数十万个小数组时循环垃圾回收会反复扫描，期间暂停
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    start = 0
+                    for term, count in zip(header["terms"], header["counts"]):
+                        self._postings[term] = (docs[start:start + count], tfs[start:start + count])
+                        start += count
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+                self._conv_ids = header["conversations"]
+                self._conv_slots = {conv_id: slot for slot, conv_id in enumerate(self._conv_ids)}
+                self._deleted = set(header["deleted"])
+                self._total_len = header["total_len"]
+                for doc_id, slot in enumerate(self._doc_conv):
+                    if slot == _VACUUMED:
+                        self._vacuumed += 1
+                    elif doc_id not in self._deleted:
+                        self._conv_docs.setdefault(self._conv_ids[slot], []).append(doc_id)
+                self.dirty = False
+            return True
+        except (ValueError, KeyError, IndexError) as e:
+            print(f"读取检索索引失败，将重新建立: {e}")
+            with self._lock:
+                self._reset()
+            return False
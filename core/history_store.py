@@ -0,0 +1,1086 @@
+"""
+历史记录存储模块
+HistoryManager 的持久化后端：
+- JsonHistoryStore: 原有格式，每次落盘原子替换整个 history.json
+- JournalHistoryStore: 快照 + 追加日志，追加一条消息只写一行日志，后台定期压缩
+- SqliteHistoryStore: SQLite（WAL模式），适合历史记录很大的场景
+"""
+import atexit
+import gc
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Union, Iterable, Iterator, Tuple, Callable
+
+from .utils import ensure_data_directory
+from .history_index import HeaderIndex, header_of, normalize_time, encode_cursor, decode_cursor, SORT_KEYS
+from .history_model import Conversation, Message, encode_time, decode_time
+from .serializers import Serializer, SchemaError, get_serializer, load_document
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _load_history_document(raw: bytes, serializer: Serializer) -> Dict[str, Any]:
+    """解析历史记录文件，空文件（例如创建后尚未写入）视为没有对话"""
+    if not raw.strip():
+        return {"conversations": []}
+    return load_document(raw, serializer, encoded_times=True)
+
+
+def _backup_corrupt(path: str, error: Exception):
+    """把无法解析的历史记录文件改名为 .corrupt-<时间> 备份，避免之后的写入覆盖掉"""
+    backup = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        os.replace(path, backup)
+        print(f"历史记录文件损坏，已备份到 {backup}: {error}")
+    except OSError:
+        pass
+
+
+def _stat_key(path: Union[str, int]) -> Optional[tuple]:
+    """文件的 (inode, 大小, mtime)，用于判断文件是否被修改或替换；文件不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _file_size(path: str) -> int:
+    """文件大小，文件不存在时为0"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _copy_conversation(conv: Dict[str, Any]) -> Dict[str, Any]:
+    """复制对话（消息写入后不再修改，只需复制消息列表）"""
+    conv = dict(conv)
+    conv["messages"] = list(conv.get("messages", []))
+    return conv
+
+
+def _fsync_directory(path: str):
+    """fsync文件所在目录，使 os.replace 之后的目录项落盘（不支持的平台上忽略）"""
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_tmp(path: str, write: Callable[[Any], None], binary: bool = False) -> str:
+    """在目标文件旁写入临时文件并fsync，返回临时文件路径"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb' if binary else 'w', **({} if binary else {"encoding": "utf-8"})) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def atomic_write(path: str, write: Callable[[Any], None], binary: bool = False):
+    """
+    原子写入文件：先写临时文件并fsync，再用 os.replace 替换，读者只会看到旧文件或完整的新文件
+
+    Args:
+        path: 目标文件路径
+        write: 接收文件对象的写入函数
+        binary: 是否以二进制模式写入
+    """
+    os.replace(_write_tmp(path, write, binary), path)
+    _fsync_directory(path)
+
+
+class FileLock:
+    """
+    基于 fcntl.flock 的跨进程排他锁，可重入
+
+    计数不是线程安全的，调用方需要同时持有进程内的锁；不支持fcntl的平台上只依赖进程内的锁。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class _ConversationState:
+    """
+    按ID索引的对话及其头部索引；JSON和日志两种后端都通过 apply() 修改状态
+
+    对话以 history_model 中的紧凑对象保存，get() 等读取接口返回新生成的字典。
+    """
+
+    def __init__(self):
+        self.conversations: Dict[str, Conversation] = {}
+        self.headers = HeaderIndex()
+
+    def load(self, conversations: List[Dict[str, Any]]):
+        """用完整的对话列表重建状态"""
+        # 一次创建大量对象时循环垃圾回收会反复扫描，期间暂停
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.conversations = {conv["id"]: Conversation.from_dict(conv) for conv in conversations}
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.headers.rebuild([conv.header() for conv in self.conversations.values()])
+
+    def apply(self, record: Dict[str, Any]):
+        """应用一条操作记录（与日志行格式相同）"""
+        op = record["op"]
+        if op == "create":
+            conv = Conversation.from_dict(record["conversation"])
+            self.conversations[conv.id] = conv
+            self.headers.put(conv.header())
+        elif op == "message":
+            conv = self.conversations.get(record["id"])
+            if conv is not None:
+                message = Message.from_dict(record["message"])
+                conv.messages.append(message)
+                conv.updated_at = message.timestamp
+                if record.get("title") is not None:
+                    conv.title = record["title"]
+                self.headers.update(conv.id, title=conv.title, updated_at=decode_time(conv.updated_at),
+                                    message_count=len(conv.messages))
+        elif op == "title":
+            conv = self.conversations.get(record["id"])
+            if conv is not None:
+                conv.title = record["title"]
+                conv.updated_at = encode_time(record["updated_at"])
+                self.headers.update(conv.id, title=conv.title, updated_at=record["updated_at"])
+        elif op == "delete":
+            self.conversations.pop(record["id"], None)
+            self.headers.remove(record["id"])
+        elif op == "clear":
+            self.conversations.clear()
+            self.headers.clear()
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        conv = self.conversations.get(conv_id)
+        return None if conv is None else conv.to_dict()
+
+    def message_count(self, conv_id: str) -> Optional[int]:
+        conv = self.conversations.get(conv_id)
+        return None if conv is None else len(conv.messages)
+
+    def messages(self, conv_id: str) -> List[Message]:
+        """消息对象列表的副本（消息对象本身不会被修改）"""
+        conv = self.conversations.get(conv_id)
+        return [] if conv is None else list(conv.messages)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """全部对话的字典格式"""
+        return [conv.to_dict() for conv in self.conversations.values()]
+
+    def headers_list(self) -> List[Dict[str, Any]]:
+        """按创建顺序的全部头部"""
+        return [conv.header() for conv in self.conversations.values()]
+
+    def snapshot(self) -> List[Conversation]:
+        """对话的浅复制，可以在锁外交给序列化器编码"""
+        return [conv.copy() for conv in self.conversations.values()]
+
+
+class HistoryStore:
+    """
+    存储后端接口，对话按创建顺序保存
+
+    写入落盘的时机由 flush_delay 和 batch() 控制：默认每次写入立即落盘；
+    flush_delay > 0 时为写后合并模式，一段时间内的写入合并为一次落盘，最多延迟 flush_delay 秒，
+    进程退出时自动落盘；batch() 上下文中的写入在退出上下文时一次落盘。
+    """
+
+    _lock = None
+    flush_delay = 0.0
+    _dirty = False
+    _batch_depth = 0
+    _flush_timer = None
+
+    def _init_write_behind(self, flush_delay: float):
+        """初始化写后合并（子类在创建 _lock 之后调用）"""
+        self.flush_delay = flush_delay
+        if flush_delay > 0:
+            atexit.register(self.flush)
+
+    @contextmanager
+    def batch(self):
+        """合并上下文中的写入，退出时一次落盘（例如一轮对话的用户消息和回复）"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._schedule_flush()
+
+    def _written(self):
+        """记录一次尚未落盘的写入（调用方持有锁）"""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.flush_delay <= 0:
+            self._flush_locked()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """立即落盘所有尚未落盘的写入"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._dirty:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        """落盘的实际步骤（调用方持有锁），子类覆盖"""
+        self._dirty = False
+
+
+    def list_conversations(self) -> List[Dict[str, Any]]:
+        """按创建顺序获取全部对话"""
+        raise NotImplementedError
+
+    def list_headers(self) -> List[Dict[str, Any]]:
+        """按创建顺序获取全部对话的 id/title/created_at/updated_at/message_count，不含消息"""
+        return [header_of(conv) for conv in self.list_conversations()]
+
+    def query_headers(self, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """分页查询对话头部，参数与返回值见 HeaderIndex.query()"""
+        return HeaderIndex(self.list_headers()).query(**kwargs)
+
+    def iter_headers(self) -> Iterator[Dict[str, Any]]:
+        """按创建顺序逐个生成对话头部"""
+        return iter(self.list_headers())
+
+    def iter_conversations(self) -> Iterator[Dict[str, Any]]:
+        """按创建顺序逐个生成对话（副本），每次只读取一个对话"""
+        for header in self.iter_headers():
+            conv = self.get(header["id"])
+            if conv is not None:
+                yield conv
+
+    def iter_messages(self, conv_id: str) -> Iterator[Dict[str, str]]:
+        """逐条生成对话中的消息，对话不存在时不生成任何内容"""
+        conv = self.get(conv_id)
+        if conv is not None:
+            yield from conv.get("messages", [])
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        """获取对话的副本，不存在时返回None"""
+        raise NotImplementedError
+
+    def message_count(self, conv_id: str) -> Optional[int]:
+        """获取对话的消息数，不存在时返回None"""
+        conv = self.get(conv_id)
+        return None if conv is None else len(conv.get("messages", []))
+
+    def count(self) -> int:
+        """对话总数（子类用维护中的索引回答，不读取头部列表）"""
+        return len(self.list_headers())
+
+    def create(self, conversation: Dict[str, Any]):
+        """保存新对话"""
+        raise NotImplementedError
+
+    def bulk_create(self, conversations: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量保存对话（用于迁移），后端可以覆盖为一次性写入
+
+        Returns:
+            保存的对话数
+        """
+        count = 0
+        for conversation in conversations:
+            self.create(conversation)
+            count += 1
+        return count
+
+    def append_message(self, conv_id: str, message: Dict[str, str], title: str = None) -> bool:
+        """追加消息并把 updated_at 设为消息时间，title 不为None时同时更新标题"""
+        raise NotImplementedError
+
+    def set_title(self, conv_id: str, title: str, updated_at: str) -> bool:
+        """更新对话标题"""
+        raise NotImplementedError
+
+    def delete(self, conv_id: str) -> bool:
+        """删除对话"""
+        raise NotImplementedError
+
+    def clear(self):
+        """清空全部对话"""
+        raise NotImplementedError
+
+    def size_bytes(self) -> int:
+        """存储文件在磁盘上占用的字节数"""
+        raise NotImplementedError
+
+    def compact(self):
+        """回收已删除对话占用的磁盘空间，默认不需要额外操作"""
+
+    def close(self):
+        """落盘并释放资源"""
+        self.flush()
+
+
+class JsonHistoryStore(HistoryStore):
+    """
+    整文件JSON存储：每次落盘都完整重写 history.json
+
+    解析结果和按ID的索引缓存在内存中，文件的 inode/大小/mtime 不变时读取不访问磁盘。
+    写入持有 history.json.lock 上的 fcntl 锁完成“读取-修改-原子替换”，多个进程不会互相覆盖；
+    写后合并模式下尚未落盘的修改以操作记录保存，落盘时若文件已被其他进程修改，会在新内容上重新应用。
+    """
+
+    def __init__(self, history_path: str, flush_delay: float = 0.0, serializer: Serializer = None):
+        """
+        初始化存储
+
+        Args:
+            history_path: 历史记录文件路径
+            flush_delay: 写后合并的最长延迟（秒），0表示每次写入立即落盘
+            serializer: 写入文件使用的序列化器，默认为紧凑JSON；读取时按文件内容自动识别格式
+        """
+        self.history_path = history_path
+        self.serializer = serializer or get_serializer()
+        ensure_data_directory(history_path)
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(history_path + ".lock")
+        self._state = _ConversationState()
+        self._extra: Dict[str, Any] = {}
+        self._cache_key = None
+        self._pending: List[Dict[str, Any]] = []
+        self._init_write_behind(flush_delay)
+        with self._lock, self._file_lock:
+            if not os.path.exists(self.history_path):
+                self._save()
+
+    def _load_data(self):
+        """文件变化时重新解析（调用方持有锁）；尚未落盘的修改会重新应用到新内容上"""
+        key = _stat_key(self.history_path)
+        if key is not None and key == self._cache_key:
+            return
+        try:
+            with open(self.history_path, 'rb') as f:
+                data = _load_history_document(f.read(), self.serializer)
+        except FileNotFoundError:
+            data = {"conversations": []}
+        except SchemaError as e:
+            # 原子替换下不会出现写了一半的文件，损坏的文件保留备份，避免下一次写入覆盖掉
+            _backup_corrupt(self.history_path, e)
+            data = {"conversations": []}
+            key = None
+
+        self._extra = {k: v for k, v in data.items() if k != "conversations"}
+        self._state.load(data.get("conversations", []))
+        for record in self._pending:
+            self._state.apply(record)
+        self._cache_key = key
+
+    def _save(self):
+        """原子写入整个文件（调用方持有锁和文件锁）"""
+        data = dict(self._extra)
+        data["conversations"] = list(self._state.conversations.values())
+        atomic_write(self.history_path, lambda f: self.serializer.dump(data, f), binary=True)
+        self._cache_key = _stat_key(self.history_path)
+
+    @contextmanager
+    def _writing(self):
+        """写操作的上下文：持有进程内锁和文件锁，并先同步其他进程的修改"""
+        with self._lock, self._file_lock:
+            self._load_data()
+            yield
+
+    def _write(self, record: Dict[str, Any]):
+        """应用一条修改并安排落盘（调用方处于 _writing() 中）"""
+        self._state.apply(record)
+        self._pending.append(record)
+        self._written()
+
+    def _flush_locked(self):
+        try:
+            with self._file_lock:
+                self._load_data()
+                self._save()
+            self._pending.clear()
+            self._dirty = False
+        except Exception as e:
+            self._cache_key = None
+            print(f"保存历史记录失败: {e}")
+
+    def list_conversations(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._load_data()
+            return self._state.to_dicts()
+
+    def list_headers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._load_data()
+            return self._state.headers_list()
+
+    def query_headers(self, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        with self._lock:
+            self._load_data()
+            return self._state.headers.query(**kwargs)
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._load_data()
+            return self._state.get(conv_id)
+
+    def iter_messages(self, conv_id: str) -> Iterator[Dict[str, str]]:
+        with self._lock:
+            self._load_data()
+            messages = self._state.messages(conv_id)
+        for message in messages:
+            yield message.to_dict()
+
+    def message_count(self, conv_id: str) -> Optional[int]:
+        with self._lock:
+            self._load_data()
+            return self._state.message_count(conv_id)
+
+    def count(self) -> int:
+        with self._lock:
+            self._load_data()
+            return len(self._state.headers)
+
+    def create(self, conversation: Dict[str, Any]):
+        with self._writing():
+            self._write({"op": "create", "conversation": _copy_conversation(conversation)})
+
+    def bulk_create(self, conversations: Iterable[Dict[str, Any]]) -> int:
+        with self.batch():
+            return super().bulk_create(conversations)
+
+    def append_message(self, conv_id: str, message: Dict[str, str], title: str = None) -> bool:
+        with self._writing():
+            if conv_id not in self._state.conversations:
+                return False
+            self._write({"op": "message", "id": conv_id, "message": message, "title": title})
+            return True
+
+    def set_title(self, conv_id: str, title: str, updated_at: str) -> bool:
+        with self._writing():
+            if conv_id not in self._state.conversations:
+                return False
+            self._write({"op": "title", "id": conv_id, "title": title, "updated_at": updated_at})
+            return True
+
+    def delete(self, conv_id: str) -> bool:
+        with self._writing():
+            if conv_id not in self._state.conversations:
+                return False
+            self._write({"op": "delete", "id": conv_id})
+            return True
+
+    def clear(self):
+        with self._writing():
+            self._write({"op": "clear"})
+
+    def size_bytes(self) -> int:
+        self.flush()
+        return _file_size(self.history_path)
+
+    def close(self):
+        """落盘尚未写出的修改并释放锁文件"""
+        self.flush()
+        if self.flush_delay > 0:
+            atexit.unregister(self.flush)
+        self._file_lock.close()
+
+
+class JournalHistoryStore(HistoryStore):
+    """
+    快照 + 追加日志存储
+
+    history.json 是快照（与原格式兼容，额外记录 journal_seq），history.json.journal 是JSONL日志，
+    每行一条带递增序号的操作。启动时加载快照并重放序号大于 journal_seq 的日志；
+    日志超过 compact_bytes 后在后台线程中写出新快照（临时文件 + os.replace）并截掉已合入的日志。
+    已有的 history.json 直接作为初始快照使用，无需迁移。
+
+    内存中保存按ID索引的完整状态，读取时只比较两个文件的 inode/大小/mtime：
+    日志变长时只重放新增的部分，快照或日志被替换（其他进程压缩）时重新加载。
+    写入持有 history.json.lock 上的 fcntl 排他锁，多个进程共享同一路径时日志序号保持连续。
+
+    日志行立即写入（其他进程马上可见），fsync 按 flush_delay / batch() 合并。
+    """
+
+    def __init__(self, history_path: str, compact_bytes: int = 1 << 20, fsync: bool = True,
+                 flush_delay: float = 0.0, serializer: Serializer = None):
+        """
+        初始化存储
+
+        Args:
+            history_path: 快照文件路径，日志文件为其后加 .journal
+            compact_bytes: 日志超过该大小时触发后台压缩
+            fsync: 追加后是否fsync日志
+            flush_delay: 合并fsync的最长延迟（秒），0表示每次追加后立即fsync
+            serializer: 写入快照使用的序列化器（日志行始终是JSON），读取时按文件内容自动识别格式
+        """
+        self.history_path = history_path
+        self.serializer = serializer or get_serializer()
+        self.journal_path = history_path + ".journal"
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        ensure_data_directory(history_path)
+
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(history_path + ".lock")
+        self._state = _ConversationState()
+        self._seq = 0
+        self._snapshot_key = None
+        self._journal_fd = None
+        self._journal_ino = None
+        self._journal_size = 0
+        self._compacting = None
+        self._compact_lock = threading.Lock()
+        self._init_write_behind(flush_delay)
+
+        with self._lock, self._file_lock:
+            self._load()
+            if self._snapshot_key is None:
+                self._replace_snapshot(self._write_snapshot_tmp(self._snapshot_data(), self._seq))
+
+    # ---- 加载与重放 ----
+
+    def _load(self):
+        """加载快照并重放日志（调用方持有锁）"""
+        try:
+            with open(self.history_path, 'rb') as f:
+                self._snapshot_key = _stat_key(f.fileno())
+                data = _load_history_document(f.read(), self.serializer)
+        except FileNotFoundError:
+            self._snapshot_key = None
+            data = {"conversations": []}
+        except SchemaError as e:
+            # 快照只通过原子替换写入，损坏说明是外部写入的问题：保留备份，从空记录开始并照常重放日志
+            _backup_corrupt(self.history_path, e)
+            self._snapshot_key = None
+            data = {"conversations": []}
+
+        self._state.load(data.get("conversations", []))
+        self._seq = data.get("journal_seq", 0)
+
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+        self._journal_fd = os.open(self.journal_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._journal_ino = os.fstat(self._journal_fd).st_ino
+        self._journal_size = 0
+        self._replay_tail()
+
+    def _replay_tail(self):
+        """
+        重放日志中尚未读取的完整行（调用方持有锁）
+
+        只消费以换行结尾的行：其他进程正在写入的行或崩溃留下的不完整末行会留到下次再读，
+        写入前持有文件锁时再截掉。
+        """
+        content = os.pread(self._journal_fd, os.fstat(self._journal_fd).st_size - self._journal_size,
+                           self._journal_size)
+        end = content.rfind(b"\n") + 1
+        for line in content[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("seq", 0) <= self._seq:
+                continue
+            self._state.apply(record)
+            self._seq = record["seq"]
+        self._journal_size += end
+
+    def _refresh(self):
+        """检查文件是否被其他进程修改，必要时增量重放或重新加载（调用方持有锁）"""
+        if _stat_key(self.history_path) != self._snapshot_key:
+            self._load()
+            return
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            self._load()
+            return
+        if st.st_ino != self._journal_ino or st.st_size < self._journal_size:
+            self._load()
+        elif st.st_size > self._journal_size:
+            self._replay_tail()
+
+    # ---- 写入 ----
+
+    @contextmanager
+    def _writing(self):
+        """写操作的上下文：持有进程内锁和文件锁，并先同步其他进程的修改"""
+        with self._lock, self._file_lock:
+            self._refresh()
+            yield
+
+    def _append(self, op: str, **fields):
+        """写入一条日志并应用到内存状态（调用方处于 _writing() 中）"""
+        if os.fstat(self._journal_fd).st_size != self._journal_size:
+            # 持有文件锁时仍有未消费的字节，只可能是崩溃留下的不完整末行
+            os.ftruncate(self._journal_fd, self._journal_size)
+        record = {"seq": self._seq + 1, "op": op, **fields}
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode("utf-8")
+        os.write(self._journal_fd, line)
+        self._seq += 1
+        self._journal_size += len(line)
+        self._state.apply(record)
+        if self.fsync:
+            self._written()
+        if self._journal_size >= self.compact_bytes and self._compacting is None:
+            self._compacting = threading.Thread(target=self.compact, name="history-compact", daemon=True)
+            self._compacting.start()
+
+    def _flush_locked(self):
+        if self._journal_fd is not None:
+            os.fsync(self._journal_fd)
+        self._dirty = False
+
+    def _snapshot_data(self) -> Dict[str, Any]:
+        """当前状态的快照数据（调用方持有锁）"""
+        return {"conversations": self._state.snapshot()}
+
+    def _write_snapshot_tmp(self, data: Dict[str, Any], seq: int) -> str:
+        """把快照写入临时文件并fsync，返回临时文件路径"""
+        data["journal_seq"] = seq
+        return _write_tmp(self.history_path, lambda f: self.serializer.dump(data, f), binary=True)
+
+    def _replace_snapshot(self, tmp_path: str):
+        """原子替换快照（调用方持有锁）"""
+        os.replace(tmp_path, self.history_path)
+        _fsync_directory(self.history_path)
+        self._snapshot_key = _stat_key(self.history_path)
+
+    def compact(self):
+        """
+        压缩：写出新快照，再从日志中去掉已合入快照的部分
+
+        序列化在锁外进行，压缩期间的追加不受影响；若在两步之间崩溃，
+        重放时会按 journal_seq 跳过已合入的日志。
+        """
+        with self._compact_lock:
+            try:
+                self._compact()
+            except Exception as e:
+                print(f"压缩历史记录失败: {e}")
+            finally:
+                if self._compacting is threading.current_thread():
+                    self._compacting = None
+
+    def _compact(self):
+        """压缩的实际步骤（调用方持有 _compact_lock）"""
+        with self._writing():
+            data = self._snapshot_data()
+            seq = self._seq
+            offset = self._journal_size
+            snapshot_key = self._snapshot_key
+            journal_ino = self._journal_ino
+        tmp_path = self._write_snapshot_tmp(data, seq)
+
+        with self._lock, self._file_lock:
+            journal_key = _stat_key(self.journal_path)
+            if _stat_key(self.history_path) != snapshot_key or journal_key is None or journal_key[0] != journal_ino:
+                # 期间其他进程已完成压缩，放弃这次的快照
+                os.unlink(tmp_path)
+                return
+            self._replace_snapshot(tmp_path)
+
+            # 保留压缩期间新写入的日志（包括其他进程写入、本进程尚未读取的部分）
+            self._replay_tail()
+            tail = os.pread(self._journal_fd, self._journal_size - offset, offset)
+            atomic_write(self.journal_path, lambda f: f.write(tail), binary=True)
+            os.close(self._journal_fd)
+            self._journal_fd = os.open(self.journal_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            self._journal_ino = os.fstat(self._journal_fd).st_ino
+            self._journal_size = len(tail)
+
+    # ---- HistoryStore 接口 ----
+
+    def list_conversations(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._state.to_dicts()
+
+    def list_headers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._state.headers_list()
+
+    def query_headers(self, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        with self._lock:
+            self._refresh()
+            return self._state.headers.query(**kwargs)
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._state.get(conv_id)
+
+    def iter_messages(self, conv_id: str) -> Iterator[Dict[str, str]]:
+        with self._lock:
+            self._refresh()
+            messages = self._state.messages(conv_id)
+        for message in messages:
+            yield message.to_dict()
+
+    def message_count(self, conv_id: str) -> Optional[int]:
+        with self._lock:
+            self._refresh()
+            return self._state.message_count(conv_id)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._state.headers)
+
+    def create(self, conversation: Dict[str, Any]):
+        with self._writing():
+            self._append("create", conversation=_copy_conversation(conversation))
+
+    def bulk_create(self, conversations: Iterable[Dict[str, Any]]) -> int:
+        with self.batch():
+            return super().bulk_create(conversations)
+
+    def append_message(self, conv_id: str, message: Dict[str, str], title: str = None) -> bool:
+        with self._writing():
+            if conv_id not in self._state.conversations:
+                return False
+            self._append("message", id=conv_id, message=message, title=title)
+            return True
+
+    def set_title(self, conv_id: str, title: str, updated_at: str) -> bool:
+        with self._writing():
+            if conv_id not in self._state.conversations:
+                return False
+            self._append("title", id=conv_id, title=title, updated_at=updated_at)
+            return True
+
+    def delete(self, conv_id: str) -> bool:
+        with self._writing():
+            if conv_id not in self._state.conversations:
+                return False
+            self._append("delete", id=conv_id)
+            return True
+
+    def clear(self):
+        with self._writing():
+            self._append("clear")
+
+    def size_bytes(self) -> int:
+        return _file_size(self.history_path) + _file_size(self.journal_path)
+
+    def close(self):
+        """落盘、等待进行中的压缩并关闭文件"""
+        self.flush()
+        if self.flush_delay > 0:
+            atexit.unregister(self.flush)
+        compacting = self._compacting
+        if compacting is not None:
+            compacting.join()
+        with self._lock:
+            if self._journal_fd is not None:
+                os.close(self._journal_fd)
+                self._journal_fd = None
+            self._file_lock.close()
+
+
+class SqliteHistoryStore(HistoryStore):
+    """
+    SQLite存储（WAL模式）
+
+    对话和消息分表保存，消息以 (conv_id, position) 为主键，对话按插入顺序（rowid）排列；
+    所有语句都是固定的参数化SQL，由 sqlite3 的语句缓存复用。WAL模式下读写互不阻塞，
+    多个进程可以共享同一个数据库文件。
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            conv_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT,
+            PRIMARY KEY (conv_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at, id);
+        CREATE INDEX IF NOT EXISTS conversations_created_at ON conversations (created_at, id);
+    """
+
+    def __init__(self, db_path: str, timeout: float = 10.0):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径
+            timeout: 等待其他进程释放写锁的时间（秒）
+        """
+        self.db_path = db_path
+        ensure_data_directory(db_path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：BEGIN IMMEDIATE 立即取得写锁，避免读后升级时的死锁"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _messages(self, conv_id: str) -> List[Dict[str, str]]:
+        rows = self._conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE conv_id = ? ORDER BY position", (conv_id,)
+        )
+        return [{"role": role, "content": content, "timestamp": timestamp} for role, content, timestamp in rows]
+
+    def list_conversations(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, created_at, updated_at FROM conversations ORDER BY rowid"
+            ).fetchall()
+            return [
+                {"id": conv_id, "title": title, "created_at": created_at, "updated_at": updated_at,
+                 "messages": self._messages(conv_id)}
+                for conv_id, title, created_at, updated_at in rows
+            ]
+
+    _HEADER_COLUMNS = ("id", "title", "created_at", "updated_at", "message_count")
+
+    def list_headers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, created_at, updated_at, message_count FROM conversations ORDER BY rowid"
+            ).fetchall()
+        return [dict(zip(self._HEADER_COLUMNS, row)) for row in rows]
+
+    def query_headers(self, limit: int = 20, cursor: str = None, sort_by: str = "updated_at",
+                      descending: bool = True, created_after=None, created_before=None,
+                      updated_after=None, updated_before=None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """分页查询对话头部，由 (时间戳, id) 上的索引完成排序、范围过滤和游标定位"""
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort_by}")
+        if limit <= 0:
+            return [], None
+        conditions, params = [], []
+        for column, start, end in (("created_at", created_after, created_before),
+                                   ("updated_at", updated_after, updated_before)):
+            if start is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(normalize_time(start))
+            if end is not None:
+                conditions.append(f"{column} < ?")
+                params.append(normalize_time(end))
+        if cursor is not None:
+            conditions.append(f"({sort_by}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(decode_cursor(cursor))
+        order = "DESC" if descending else "ASC"
+        sql = (f"SELECT id, title, created_at, updated_at, message_count FROM conversations "
+               f"{'WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+               f"ORDER BY {sort_by} {order}, id {order} LIMIT ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+        items = [dict(zip(self._HEADER_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(items[-1][sort_by], items[-1]["id"])
+        return items, next_cursor
+
+    def iter_headers(self, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """按 rowid 分块读取头部，每块之间释放锁，内存占用与对话总数无关"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, id, title, created_at, updated_at, message_count FROM conversations "
+                    "WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, chunk_size)
+                ).fetchall()
+            for row in rows:
+                yield dict(zip(self._HEADER_COLUMNS, row[1:]))
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][0]
+
+    def iter_messages(self, conv_id: str, chunk_size: int = 500) -> Iterator[Dict[str, str]]:
+        """按 position 分块读取消息，单个对话很大时也不会一次载入"""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT position, role, content, timestamp FROM messages "
+                    "WHERE conv_id = ? AND position > ? ORDER BY position LIMIT ?", (conv_id, last, chunk_size)
+                ).fetchall()
+            for _, role, content, timestamp in rows:
+                yield {"role": role, "content": content, "timestamp": timestamp}
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][0]
+
+    def get(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, title, created_at, updated_at FROM conversations WHERE id = ?", (conv_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            return {"id": row[0], "title": row[1], "created_at": row[2], "updated_at": row[3],
+                    "messages": self._messages(conv_id)}
+
+    def message_count(self, conv_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT message_count FROM conversations WHERE id = ?", (conv_id,)).fetchone()
+            return None if row is None else row[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def _insert(self, conn: sqlite3.Connection, conversation: Dict[str, Any]):
+        messages = conversation.get("messages", [])
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, title, created_at, updated_at, message_count) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (conversation["id"], conversation.get("title", "未命名对话"), conversation.get("created_at", ""),
+             conversation.get("updated_at", conversation.get("created_at", "")), len(messages))
+        )
+        conn.execute("DELETE FROM messages WHERE conv_id = ?", (conversation["id"],))
+        conn.executemany(
+            "INSERT INTO messages (conv_id, position, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [(conversation["id"], position, msg.get("role", "user"), msg.get("content", ""), msg.get("timestamp"))
+             for position, msg in enumerate(messages)]
+        )
+
+    def create(self, conversation: Dict[str, Any]):
+        with self._transaction() as conn:
+            self._insert(conn, conversation)
+
+    def bulk_create(self, conversations: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        with self._transaction() as conn:
+            for conversation in conversations:
+                self._insert(conn, conversation)
+                count += 1
+        return count
+
+    def append_message(self, conv_id: str, message: Dict[str, str], title: str = None) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT message_count FROM conversations WHERE id = ?", (conv_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute(
+                "INSERT INTO messages (conv_id, position, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (conv_id, row[0], message["role"], message["content"], message["timestamp"])
+            )
+            conn.execute(
+                "UPDATE conversations SET message_count = message_count + 1, updated_at = ?, "
+                "title = COALESCE(?, title) WHERE id = ?",
+                (message["timestamp"], title, conv_id)
+            )
+            return True
+
+    def set_title(self, conv_id: str, title: str, updated_at: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE conversations SET title = ?, updated_at = ? WHERE id = ?", (title, updated_at, conv_id)
+            )
+            return cursor.rowcount > 0
+
+    def delete(self, conv_id: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
+            conn.execute("DELETE FROM messages WHERE conv_id = ?", (conv_id,))
+            return cursor.rowcount > 0
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM conversations")
+            conn.execute("DELETE FROM messages")
+
+    def size_bytes(self) -> int:
+        return _file_size(self.db_path) + _file_size(self.db_path + "-wal")
+
+    def compact(self):
+        """VACUUM 重写数据库文件并截断WAL，释放删除对话后留下的空闲页"""
+        with self._lock:
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_store(history_path: str, storage: str = "journal", flush_delay: float = 0.0,
+                 serializer: str = "json") -> HistoryStore:
+    """
+    创建存储后端
+
+    Args:
+        history_path: 历史记录文件路径
+        storage: "journal"（默认）、"json" 或 "sqlite"（此时 history_path 为数据库文件路径）
+        flush_delay: 写后合并的最长延迟（秒），0表示每次写入立即落盘；sqlite后端忽略此参数
+        serializer: json/journal 后端写入文件使用的序列化器，见 serializers.get_serializer()；sqlite后端忽略此参数
+
+    Returns:
+        存储后端实例
+    """
+    if storage == "journal":
+        return JournalHistoryStore(history_path, flush_delay=flush_delay, serializer=get_serializer(serializer))
+    if storage == "json":
+        return JsonHistoryStore(history_path, flush_delay=flush_delay, serializer=get_serializer(serializer))
+    if storage == "sqlite":
+        return SqliteHistoryStore(history_path)
+    raise ValueError(f"不支持的存储后端: {storage}")
@@ -0,0 +1,126 @@
+"""
+LLM客户端连接池模块
+Advisor 持有一个长期存在的 openai 客户端，第一次调用时创建，之后所有请求复用：
+- 同步客户端（openai.OpenAI）线程安全，多个线程共享同一个HTTP连接池
+- 异步客户端（openai.AsyncOpenAI）的连接绑定事件循环，每个事件循环各创建一个
+- 空闲连接保持 keep-alive，后续请求省去TCP+TLS握手和客户端构建的开销
+- 连接数上限、空闲连接数、keep-alive时长、每个请求的超时和重试次数可以通过配置调整
+"""
+import asyncio
+import threading
+from typing import Dict, Any
+
+try:
+    import openai
+except ImportError:  # openai为可选依赖，未安装时调用LLM返回安装提示
+    openai = None
+
+try:
+    import httpx
+except ImportError:  # 新版openai依赖的是 httpx2
+    try:
+        import httpx2 as httpx
+    except ImportError:
+        httpx = None
+
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class LLMClientPool:
+    """按需创建并复用 openai 客户端"""
+
+    def __init__(self, llm_config: Dict[str, Any]):
+        """
+        初始化连接池（不创建连接，第一次调用 get() / get_async() 时才创建客户端）
+
+        Args:
+            llm_config: 配置中的 llm 段，除 api_key / base_url 外读取：
+                max_connections: 最大连接数，默认10
+                max_keepalive_connections: 最多保留的空闲连接数，默认10
+                keepalive_expiry: 空闲连接保留时长（秒），默认60
+                timeout: 每个请求的超时（秒），默认60
+                connect_timeout: 建立连接的超时（秒），默认10
+                max_retries: 连接错误、429和5xx的自动重试次数，默认2
+        """
+        self.api_key = llm_config.get("api_key", "")
+        self.base_url = llm_config.get("base_url", DEFAULT_BASE_URL)
+        self.max_connections = llm_config.get("max_connections", 10)
+        self.max_keepalive_connections = llm_config.get("max_keepalive_connections", 10)
+        self.keepalive_expiry = llm_config.get("keepalive_expiry", 60.0)
+        self.timeout = llm_config.get("timeout", 60.0)
+        self.connect_timeout = llm_config.get("connect_timeout", 10.0)
+        self.max_retries = llm_config.get("max_retries", 2)
+        self._lock = threading.Lock()
+        self._client = None
+        # 事件循环 -> 异步客户端（客户端内部引用事件循环，不能用弱引用字典，事件循环关闭后在下次获取时清理）
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Any] = {}
+
+    def _client_options(self, async_client: bool) -> Dict[str, Any]:
+        """openai 客户端的构造参数"""
+        options = {"api_key": self.api_key, "base_url": self.base_url, "max_retries": self.max_retries}
+        if httpx is None:
+            options["timeout"] = self.timeout
+            return options
+        timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        # DefaultHttpxClient 保留 openai 默认的重定向、代理等设置，只覆盖连接池参数
+        http_client = openai.DefaultAsyncHttpxClient if async_client else openai.DefaultHttpxClient
+        options["timeout"] = timeout
+        options["http_client"] = http_client(timeout=timeout, limits=limits)
+        return options
+
+    def get(self) -> "openai.OpenAI":
+        """
+        获取同步客户端（线程安全，第一次调用时创建）
+
+        Raises:
+            ImportError: 未安装openai库
+        """
+        client = self._client
+        if client is None:
+            if openai is None:
+                raise ImportError("请先安装openai库: pip install openai")
+            with self._lock:
+                if self._client is None:
+                    self._client = openai.OpenAI(**self._client_options(False))
+                client = self._client
+        return client
+
+    def get_async(self) -> "openai.AsyncOpenAI":
+        """
+        获取当前事件循环的异步客户端（第一次在该事件循环中调用时创建）
+
+        Raises:
+            ImportError: 未安装openai库
+            RuntimeError: 不在事件循环中调用
+        """
+        if openai is None:
+            raise ImportError("请先安装openai库: pip install openai")
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                for closed in [other for other in self._async_clients if other.is_closed()]:
+                    del self._async_clients[closed]
+                client = self._async_clients[loop] = openai.AsyncOpenAI(**self._client_options(True))
+        return client
+
+    async def aclose(self):
+        """关闭当前事件循环的异步客户端"""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def close(self):
+        """关闭同步客户端的全部连接（之后调用 get() 会重新创建）；异步客户端在其事件循环中用 aclose() 关闭"""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
@@ -0,0 +1,188 @@
+"""
+进程跟踪模块
+长期持有 psutil.Process 对象，增量维护进程表，按需计算占用资源最多的进程
+"""
+import heapq
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+import psutil
+
+
+# 排序依据 -> 返回结果中对应的键名
+SORT_KEYS = {
+    "cpu": "cpu",
+    "rss": "rss",
+    "io": "io_rate",
+    "fds": "num_fds"
+}
+
+
+class ProcessTracker:
+    """
+    进程跟踪器：在多次调用之间复用进程对象，使CPU使用率有正确的基准
+
+    CPU基准（上一次按CPU排序时的时间和进程CPU时间）由跟踪器自己保存，不使用 psutil 的 cpu_percent()：
+    按其他指标排序时只读取、不更新基准，下一次按CPU排序仍然覆盖距上一次按CPU排序的整个时间段。
+    """
+
+    def __init__(self, warmup: float = 0.1):
+        """
+        初始化进程跟踪器
+
+        Args:
+            warmup: 首次按CPU排序时的预热时间（秒），用于建立CPU使用率基准
+        """
+        self.warmup = warmup
+        self._procs: Dict[int, psutil.Process] = {}
+        self._io_previous: Dict[int, tuple] = {}
+        self._cpu_previous: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._procs)
+
+    def _add(self, pid: int) -> Optional[psutil.Process]:
+        """为新出现的PID建立进程对象并初始化CPU基准"""
+        try:
+            proc = psutil.Process(pid)
+            self._cpu_previous[pid] = (time.monotonic(), self._cpu_time(proc))
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+        self._procs[pid] = proc
+        return proc
+
+    def _drop(self, pid: int):
+        """移除已退出的进程"""
+        self._procs.pop(pid, None)
+        self._io_previous.pop(pid, None)
+        self._cpu_previous.pop(pid, None)
+
+    def refresh(self):
+        """同步进程表：删除已退出的PID，只为新PID创建进程对象"""
+        pids = set(psutil.pids())
+        for pid in [pid for pid in self._procs if pid not in pids]:
+            self._drop(pid)
+        for pid in pids:
+            if pid not in self._procs:
+                self._add(pid)
+
+    @staticmethod
+    def _cpu_time(proc: psutil.Process) -> float:
+        """进程累计的CPU时间（秒）"""
+        times = proc.cpu_times()
+        return times.user + times.system
+
+    def _cpu_percent(self, proc: psutil.Process, now: float, update: bool = True) -> float:
+        """
+        距CPU基准的CPU使用率（与 psutil 的 Process.cpu_percent 一致，多核时可超过100）
+
+        Args:
+            proc: 进程对象
+            now: 单调时钟时间
+            update: 是否把本次读数作为新的基准
+
+        Returns:
+            CPU使用率 (%)；CPU时间倒退（PID被复用）时返回负数
+        """
+        total = self._cpu_time(proc)
+        previous = self._cpu_previous.get(proc.pid)
+        if update:
+            self._cpu_previous[proc.pid] = (now, total)
+        if previous is None or now <= previous[0]:
+            return 0.0
+        if total < previous[1]:
+            return -1.0
+        return round((total - previous[1]) / (now - previous[0]) * 100, 1)
+
+    def _measure(self, proc: psutil.Process, sort_by: str, now: float) -> float:
+        """只读取排序所需的单项指标"""
+        if sort_by == "cpu":
+            return self._cpu_percent(proc, now)
+        if sort_by == "rss":
+            return float(proc.memory_info().rss)
+        if sort_by == "fds":
+            if hasattr(proc, "num_fds"):
+                return float(proc.num_fds())
+            return float(proc.num_handles())
+        if sort_by == "io":
+            io = proc.io_counters()
+            total = io.read_bytes + io.write_bytes
+            previous = self._io_previous.get(proc.pid)
+            self._io_previous[proc.pid] = (now, total)
+            if previous is None or now <= previous[0] or total < previous[1]:
+                return 0.0
+            return (total - previous[1]) / (now - previous[0])
+        raise ValueError(f"不支持的排序依据: {sort_by}")
+
+    def top(self, limit: int = 5, sort_by: str = "cpu") -> List[Dict[str, Any]]:
+        """
+        获取占用资源最多的进程
+
+        Args:
+            limit: 返回的进程数量
+            sort_by: 排序依据，"cpu"、"rss"、"io"（读写字节/秒）或 "fds"（打开的文件描述符数）
+
+        Returns:
+            进程信息列表，每项包含 pid、name、cpu、memory 以及排序指标
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"不支持的排序依据: {sort_by}")
+
+        with self._lock:
+            first_run = not self._procs
+            self.refresh()
+            if first_run and sort_by == "cpu" and self.warmup:
+                time.sleep(self.warmup)
+
+            now = time.monotonic()
+            candidates = []
+            for pid, proc in list(self._procs.items()):
+                try:
+                    value = self._measure(proc, sort_by, now)
+                except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                    self._drop(pid)
+                    continue
+                except psutil.AccessDenied:
+                    continue
+                if value < 0:
+                    # CPU时间倒退说明PID已被复用，重新建立进程对象
+                    self._drop(pid)
+                    self._add(pid)
+                    continue
+                candidates.append((value, pid))
+
+            # 堆选Top-K，避免对全部进程排序
+            result = []
+            for value, pid in heapq.nlargest(limit, candidates):
+                proc = self._procs.get(pid)
+                if proc is None:
+                    continue
+                try:
+                    if not proc.is_running():
+                        self._drop(pid)
+                        continue
+                    info = {
+                        "pid": pid,
+                        "name": proc.name(),
+                        "cpu": value if sort_by == "cpu" else self._cpu_percent(proc, now, update=False),
+                        "memory": proc.memory_percent()
+                    }
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+                if sort_by != "cpu":
+                    info[SORT_KEYS[sort_by]] = round(value, 2)
+                result.append(info)
+            return result
+
+
+# 默认跟踪器实例
+_default_tracker = None
+
+def get_process_tracker() -> ProcessTracker:
+    """获取默认的进程跟踪器实例"""
+    global _default_tracker
+    if _default_tracker is None:
+        _default_tracker = ProcessTracker()
+    return _default_tracker
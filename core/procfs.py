@@ -0,0 +1,185 @@
+"""
+Linux /proc 快速采集模块
+常驻打开 /proc/stat、/proc/meminfo、/proc/net/dev，用 pread 重复读取并只解析用到的字段。
+提供与 psutil 同名同返回类型的 cpu_times() / virtual_memory() / net_io_counters()，
+可直接替换 psutil 作为采样器的数据源；读取或解析失败时自动回退到 psutil。
+"""
+import os
+import sys
+from typing import Any
+
+import psutil
+
+
+_READ_SIZE = 8192
+
+# virtual_memory() 用到的 /proc/meminfo 字段，其余行直接跳过
+_MEMINFO_FIELDS = frozenset((
+    b"MemTotal:", b"MemFree:", b"MemAvailable:", b"Buffers:", b"Cached:",
+    b"SReclaimable:", b"Shmem:", b"MemShared:", b"Active:", b"Inactive:", b"Slab:"
+))
+
+
+class ProcfsCollector:
+    """基于 /proc 的热点指标采集器（仅Linux）"""
+
+    def __init__(self, procfs_path: str = "/proc"):
+        """
+        打开需要的 /proc 文件
+
+        Args:
+            procfs_path: procfs挂载路径
+
+        Raises:
+            OSError: 非Linux系统或 /proc 不可用
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("procfs采集器仅支持Linux")
+        self.procfs_path = procfs_path
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+        # 使用psutil自身的namedtuple类型，保证返回值与psutil完全一致
+        self._scputimes = type(psutil.cpu_times())
+        self._svmem = type(psutil.virtual_memory())
+        self._snetio = type(psutil.net_io_counters())
+        self._fds = {}
+        try:
+            for name in ("stat", "meminfo", "net/dev"):
+                self._fds[name] = os.open(os.path.join(procfs_path, name), os.O_RDONLY)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """关闭常驻的文件描述符"""
+        for fd in self._fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fds = {}
+
+    def __del__(self):
+        self.close()
+
+    def _read(self, name: str, size: int = _READ_SIZE, whole: bool = True) -> bytes:
+        """
+        从文件开头重新读取内容
+
+        Args:
+            name: 文件名（"stat"、"meminfo"、"net/dev"）
+            size: 单次读取的字节数
+            whole: 是否读到文件末尾；为False时只读取前size字节
+        """
+        fd = self._fds[name]
+        data = os.pread(fd, size, 0)
+        if not whole:
+            return data
+        chunks = [data]
+        offset = len(data)
+        while len(data) == size:
+            data = os.pread(fd, size, offset)
+            chunks.append(data)
+            offset += len(data)
+        return b"".join(chunks)
+
+    def cpu_times(self):
+        """系统整体CPU时间，等价于 psutil.cpu_times()"""
+        try:
+            # 只需要第一行的汇总数据，无需读取每个CPU和中断统计
+            line = self._read("stat", 4096, whole=False).split(b"\n", 1)[0]
+            fields = line.split()[1:len(self._scputimes._fields) + 1]
+            return self._scputimes(*[int(x) / self._clock_ticks for x in fields])
+        except (OSError, KeyError, ValueError, TypeError):
+            return psutil.cpu_times()
+
+    def virtual_memory(self):
+        """内存使用情况，等价于 psutil.virtual_memory()"""
+        try:
+            data = self._read("meminfo")
+        except (OSError, KeyError):
+            return psutil.virtual_memory()
+        mems = {}
+        for line in data.splitlines():
+            colon = line.find(b":")
+            key = line[:colon + 1]
+            if key in _MEMINFO_FIELDS:
+                mems[key] = int(line[colon + 1:].split()[0]) * 1024
+
+        total = mems.get(b"MemTotal:", 0)
+        avail = mems.get(b"MemAvailable:", 0)
+        if not total or not avail or b"Buffers:" not in mems or b"Cached:" not in mems:
+            # 老内核或字段缺失时需要估算，交给psutil处理以保持结果一致
+            return psutil.virtual_memory()
+        free = mems[b"MemFree:"]
+        if avail > total:
+            avail = free
+
+        used = total - avail
+        try:
+            percent = round((total - avail) / total * 100, 1)
+        except ZeroDivisionError:
+            percent = 0.0
+        values = {
+            "total": total,
+            "available": avail,
+            "percent": percent,
+            "used": used,
+            "free": free,
+            "active": mems.get(b"Active:", 0),
+            "inactive": mems.get(b"Inactive:", 0),
+            "buffers": mems[b"Buffers:"],
+            "cached": mems[b"Cached:"] + mems.get(b"SReclaimable:", 0),
+            "shared": mems.get(b"Shmem:", mems.get(b"MemShared:", 0)),
+            "slab": mems.get(b"Slab:", 0)
+        }
+        return self._svmem(*[values.get(field, 0) for field in self._svmem._fields])
+
+    def net_io_counters(self, pernic: bool = False):
+        """网络IO计数，等价于 psutil.net_io_counters(pernic=...)"""
+        try:
+            data = self._read("net/dev")
+        except (OSError, KeyError):
+            return psutil.net_io_counters(pernic=pernic)
+        result = {}
+        for line in data.splitlines()[2:]:
+            colon = line.rfind(b":")
+            if colon <= 0:
+                continue
+            fields = line[colon + 1:].split()
+            values = {
+                "bytes_recv": int(fields[0]),
+                "packets_recv": int(fields[1]),
+                "errin": int(fields[2]),
+                "dropin": int(fields[3]),
+                "bytes_sent": int(fields[8]),
+                "packets_sent": int(fields[9]),
+                "errout": int(fields[10]),
+                "dropout": int(fields[11])
+            }
+            name = line[:colon].strip().decode()
+            result[name] = self._snetio(*[values[field] for field in self._snetio._fields])
+        if pernic:
+            return result
+        return self._snetio(*[sum(column) for column in zip(*result.values())])
+
+
+def create_backend(name: str = "auto") -> Any:
+    """
+    创建采样数据源
+
+    Args:
+        name: "auto"（Linux上优先使用procfs，不可用时回退psutil）、"procfs" 或 "psutil"
+
+    Returns:
+        ProcfsCollector实例或psutil模块（两者接口相同）
+    """
+    if name == "psutil":
+        return psutil
+    if name == "procfs":
+        return ProcfsCollector()
+    if name != "auto":
+        raise ValueError(f"未知的采样数据源: {name}")
+    try:
+        return ProcfsCollector()
+    except OSError:
+        return psutil
@@ -0,0 +1,160 @@
+"""
+LLM请求限速模块
+按API的配额限制调用频率：每分钟请求数（rpm）和每分钟token数（tpm）各用一个令牌桶。
+
+令牌桶允许"欠账"：reserve() 立即扣除令牌并返回还需要等待的秒数，调用方等待后再发出请求。
+这样并发的请求按预约顺序依次放行，不需要轮询；同步调用在当前线程中等待，协程用 asyncio.sleep 等待。
+请求前按提示词长度 + max_tokens 预估token数，拿到响应后用实际用量（usage.total_tokens）结算差额。
+请求失败（未拿到响应）时按0结算，退还预估的token。
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+class TokenBucket:
+    """每分钟补充 per_minute 个令牌、最多积累 capacity 个的令牌桶（线程安全）"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        """
+        初始化令牌桶（初始为满）
+
+        Args:
+            per_minute: 每分钟补充的令牌数
+            capacity: 桶容量，即允许的突发量，默认等于 per_minute
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute if capacity is None else capacity
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """按经过的时间补充令牌（调用方持有锁）"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        扣除令牌（余额可以为负）
+
+        Returns:
+            余额回到0还需要等待的秒数，余额足够时为0
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """退还（amount > 0）或补扣（amount < 0）令牌"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """rpm + tpm 两个令牌桶，请求需要同时满足两者"""
+
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None):
+        """
+        初始化限速器
+
+        Args:
+            requests_per_minute: 每分钟最多请求数，None表示不限制
+            tokens_per_minute: 每分钟最多token数（提示词 + 回复），None表示不限制
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited = 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """
+        为一次请求预约配额
+
+        Args:
+            tokens: 预估的token数
+
+        Returns:
+            发出请求前需要等待的秒数
+        """
+        delay = 0.0
+        if self.requests is not None:
+            delay = self.requests.reserve(1)
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if delay > 0:
+            with self._lock:
+                self.waits += 1
+                self.waited += delay
+        return delay
+
+    def acquire(self, tokens: int):
+        """预约配额并在当前线程中等待"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int):
+        """acquire() 的协程版本，等待期间不阻塞事件循环"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """
+        用实际用量结算预估的token数
+
+        Args:
+            estimated: 预约时的token数
+            actual: 响应中的 usage.total_tokens，None表示没有用量信息（不结算）
+        """
+        if self.tokens is not None and actual is not None:
+            self.tokens.adjust(estimated - actual)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        限速统计
+
+        Returns:
+            {"waits": 需要等待的请求数, "waited": 累计等待秒数}
+        """
+        with self._lock:
+            return {"waits": self.waits, "waited": self.waited}
+
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """
+    预估一次 chat.completions 请求消耗的token数
+
+    提示词按每个字符一个token计算（中文文本大致如此，英文偏高，预估偏保守），再加上 max_tokens。
+
+    Args:
+        params: chat.completions.create 的参数
+
+    Returns:
+        预估的token数
+    """
+    prompt = sum(len(message.get("content") or "") for message in params.get("messages", []))
+    return prompt + int(params.get("max_tokens") or 0)
+
+
+def create_rate_limiter(llm_config: Dict[str, Any]) -> Optional[RateLimiter]:
+    """
+    根据配置创建限速器
+
+    Args:
+        llm_config: 配置中的 llm 段，读取 requests_per_minute / tokens_per_minute
+
+    Returns:
+        限速器，两项都未配置时返回None
+    """
+    rpm = llm_config.get("requests_per_minute")
+    tpm = llm_config.get("tokens_per_minute")
+    if not rpm and not tpm:
+        return None
+    return RateLimiter(rpm, tpm)
@@ -0,0 +1,379 @@
+"""
+历史记录序列化模块
+json / journal 后端的快照文件通过这里的序列化器读写：
+- "json":        紧凑JSON（默认，无缩进）
+- "json-pretty": 缩进2格的JSON（原来的格式，便于人工查看）
+- "orjson":      orjson（可选依赖），输出与 "json" 相同的紧凑JSON
+- "msgspec":     msgspec（可选依赖），按声明的结构解码并校验；结构之外的字段不会保留
+- "binary":      按历史记录结构分列保存的二进制格式（仅标准库），时间戳为整数，字符串集中存放
+
+读取时按文件内容自动识别二进制格式或JSON，切换序列化器不需要迁移已有文件。
+所有序列化器解码后都会校验结构，不符合时抛出 SchemaError。
+"""
+import json
+import sys
+from array import array
+from itertools import accumulate
+from typing import Dict, Any, List, Optional, TypedDict
+
+from .history_model import Conversation, Message, to_legacy, encode_time, decode_time
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec为可选依赖
+    msgspec = None
+
+
+class SchemaError(ValueError):
+    """历史记录的结构不正确"""
+
+
+def validate_document(data: Any, encoded_times: bool = False) -> Dict[str, Any]:
+    """
+    校验历史记录文档的结构
+
+    必需字段：对话的 id（字符串）、消息的 role 和 content（字符串）；conversations / messages 存在时必须是列表，
+    title 存在时必须是字符串，created_at / updated_at / timestamp 存在时必须是字符串或null。其他字段原样保留。
+
+    Args:
+        data: 解码得到的文档
+        encoded_times: 是否允许时间戳为 encode_time() 得到的整数
+
+    Returns:
+        原文档
+
+    Raises:
+        SchemaError: 结构不正确（附带出错位置）
+    """
+    if not isinstance(data, dict):
+        raise SchemaError("文档不是JSON对象")
+    time_types = (str, int) if encoded_times else (str,)
+    conversations = data.get("conversations", [])
+    if not isinstance(conversations, list):
+        raise SchemaError("conversations 不是列表")
+    for i, conv in enumerate(conversations):
+        if not isinstance(conv, dict) or type(conv.get("id")) is not str:
+            raise SchemaError(f"conversations[{i}] 缺少字符串类型的 id")
+        if "title" in conv and type(conv["title"]) is not str:
+            raise SchemaError(f"conversations[{i}].title 不是字符串")
+        for key in ("created_at", "updated_at"):
+            if conv.get(key) is not None and type(conv[key]) not in time_types:
+                raise SchemaError(f"conversations[{i}].{key} 不是字符串")
+        messages = conv.get("messages", [])
+        if type(messages) is not list:
+            raise SchemaError(f"conversations[{i}].messages 不是列表")
+        for k, message in enumerate(messages):
+            if (type(message) is not dict or type(message.get("role")) is not str
+                    or type(message.get("content")) is not str
+                    or (message.get("timestamp") is not None and type(message["timestamp"]) not in time_types)):
+                raise SchemaError(f"conversations[{i}].messages[{k}] 结构不正确")
+    return data
+
+
+class Serializer:
+    """序列化器接口：文档是 {"conversations": [...], 其他字段...}，对话可以是字典或 Conversation 对象"""
+
+    name = ""
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        """编码为字节串"""
+        raise NotImplementedError
+
+    def loads(self, raw: bytes, encoded_times: bool = False) -> Dict[str, Any]:
+        """
+        解码并校验
+
+        Args:
+            raw: 编码后的字节串
+            encoded_times: 为True时允许把时间戳保留为 encode_time() 的整数结果（由格式决定），
+                           供直接构建紧凑模型，省去格式化再解析的开销
+
+        Raises:
+            SchemaError: 内容无法解析或结构不正确
+        """
+        raise NotImplementedError
+
+    def dump(self, data: Dict[str, Any], f):
+        """写入二进制文件对象"""
+        f.write(self.dumps(data))
+
+
+class JsonSerializer(Serializer):
+    """标准库JSON"""
+
+    def __init__(self, indent: Optional[int] = None):
+        self.indent = indent
+        self.name = "json" if indent is None else "json-pretty"
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        separators = (',', ':') if self.indent is None else None
+        return json.dumps(data, ensure_ascii=False, indent=self.indent, separators=separators,
+                          default=to_legacy).encode("utf-8")
+
+    def loads(self, raw: bytes, encoded_times: bool = False) -> Dict[str, Any]:
+        try:
+            data = json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise SchemaError(f"JSON格式不正确: {e}")
+        return validate_document(data)
+
+
+class OrjsonSerializer(Serializer):
+    """orjson：编码和解码都在C扩展中完成，输出紧凑JSON"""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("序列化器 orjson 需要安装 orjson: pip install orjson")
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return orjson.dumps(data, default=to_legacy)
+
+    def loads(self, raw: bytes, encoded_times: bool = False) -> Dict[str, Any]:
+        try:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            raise SchemaError(f"JSON格式不正确: {e}")
+        return validate_document(data)
+
+
+class _MessageRequired(TypedDict):
+    role: str
+    content: str
+
+
+class _MessageSchema(_MessageRequired, total=False):
+    timestamp: Optional[str]
+
+
+class _ConversationRequired(TypedDict):
+    id: str
+
+
+class _ConversationSchema(_ConversationRequired, total=False):
+    title: str
+    created_at: Optional[str]
+    updated_at: Optional[str]
+    messages: List[_MessageSchema]
+
+
+class _DocumentSchema(TypedDict, total=False):
+    conversations: List[_ConversationSchema]
+    journal_seq: int
+
+
+class MsgspecSerializer(Serializer):
+    """msgspec：按声明的结构解码，类型校验在C扩展中完成；结构之外的字段会被丢弃"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        if msgspec is None:
+            raise ImportError("序列化器 msgspec 需要安装 msgspec: pip install msgspec")
+        self._encoder = msgspec.json.Encoder(enc_hook=to_legacy)
+        self._decoder = msgspec.json.Decoder(_DocumentSchema)
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return self._encoder.encode(data)
+
+    def loads(self, raw: bytes, encoded_times: bool = False) -> Dict[str, Any]:
+        try:
+            return self._decoder.decode(raw)
+        except (msgspec.DecodeError, msgspec.ValidationError) as e:
+            raise SchemaError(f"结构校验失败: {e}")
+
+
+class BinarySerializer(Serializer):
+    """
+    分列保存的二进制格式（仅标准库）
+
+    格式: 魔数 | uint32 头部长度 | JSON头部 | 各列数组 | UTF-8字符串块
+    - 头部: 顶层的其他字段、角色表、对话数、消息数、字节序
+    - 列: 每个对话的消息数和创建/更新时间、每条消息的角色编号和时间戳、每个字符串的长度
+    - 字符串块: 按固定顺序连接的 对话id、标题、对话额外字段(JSON)，以及 消息内容、消息额外字段(JSON)
+    可以换算为整数的时间戳按 int64 保存，其他时间戳记为 _RAW 并以字符串形式放在额外字段中。
+    """
+
+    name = "binary"
+    MAGIC = b"HSBIN1\n"
+    _RAW = -(1 << 63)
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        conversations = data.get("conversations", [])
+        roles: Dict[Any, int] = {}
+        counts, created, updated = array("I"), array("q"), array("q")
+        role_ids, times = array("H"), array("q")
+        strings: List[str] = []
+
+        for conv in conversations:
+            if not isinstance(conv, Conversation):
+                conv = Conversation.from_dict(validate_document({"conversations": [conv]})["conversations"][0])
+            conv_extra = dict(conv.extra) if conv.extra else {}
+            for column, value, key in ((created, conv.created_at, "created_at"), (updated, conv.updated_at, "updated_at")):
+                if type(value) is int:
+                    column.append(value)
+                else:
+                    column.append(self._RAW)
+                    conv_extra[key] = value
+            counts.append(len(conv.messages))
+            strings.append(conv.id)
+            strings.append(conv.title)
+            strings.append(json.dumps(conv_extra, ensure_ascii=False) if conv_extra else "")
+            for message in conv.messages:
+                role_id = roles.get(message.role)
+                if role_id is None:
+                    role_id = roles[message.role] = len(roles)
+                role_ids.append(role_id)
+                extra = message.extra
+                if type(message.timestamp) is int:
+                    times.append(message.timestamp)
+                else:
+                    times.append(self._RAW)
+                    extra = dict(extra or {}, timestamp=message.timestamp)
+                strings.append(message.content)
+                strings.append(json.dumps(extra, ensure_ascii=False) if extra else "")
+
+        lengths = array("I", map(len, strings))
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "extra": {key: value for key, value in data.items() if key != "conversations"},
+            "roles": list(roles),
+            "conversations": len(counts),
+            "messages": len(times)
+        }, ensure_ascii=False).encode("utf-8")
+        blob = "".join(strings).encode("utf-8", "surrogatepass")
+        return b"".join([
+            self.MAGIC, len(header).to_bytes(4, "little"), header,
+            counts.tobytes(), created.tobytes(), updated.tobytes(),
+            role_ids.tobytes(), times.tobytes(), lengths.tobytes(), blob
+        ])
+
+    def loads(self, raw: bytes, encoded_times: bool = False) -> Dict[str, Any]:
+        try:
+            return self._decode(raw, encoded_times)
+        except SchemaError:
+            raise
+        except (ValueError, KeyError, IndexError, TypeError, OverflowError) as e:
+            raise SchemaError(f"二进制历史记录格式不正确: {e}")
+
+    def _decode(self, raw: bytes, encoded_times: bool) -> Dict[str, Any]:
+        if not raw.startswith(self.MAGIC):
+            raise SchemaError("不是二进制历史记录文件")
+        offset = len(self.MAGIC)
+        header_len = int.from_bytes(raw[offset:offset + 4], "little")
+        offset += 4
+        header = json.loads(raw[offset:offset + header_len])
+        offset += header_len
+        n_convs, n_messages = header["conversations"], header["messages"]
+
+        def read(typecode: str, count: int) -> array:
+            nonlocal offset
+            column = array(typecode)
+            size = column.itemsize * count
+            if offset + size > len(raw):
+                raise SchemaError("二进制历史记录被截断")
+            column.frombytes(raw[offset:offset + size])
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            offset += size
+            return column
+
+        counts, created, updated = read("I", n_convs), read("q", n_convs), read("q", n_convs)
+        role_ids, times = read("H", n_messages), read("q", n_messages)
+        lengths = read("I", 3 * n_convs + 2 * n_messages)
+        if sum(counts) != n_messages:
+            raise SchemaError("消息数与对话的消息计数不一致")
+        text = raw[offset:].decode("utf-8", "surrogatepass")
+        ends = list(accumulate(lengths))
+        if (ends[-1] if ends else 0) != len(text):
+            raise SchemaError("字符串块长度不一致")
+        strings = iter([text[start:end] for start, end in zip([0] + ends, ends)])
+        roles = header["roles"]
+        roles = [roles[role_id] for role_id in role_ids]
+        raw_time = self._RAW
+        decode = (lambda value: value) if encoded_times else decode_time
+
+        conversations = []
+        message_index = 0
+        for c in range(n_convs):
+            conv = {"id": next(strings), "title": next(strings)}
+            if created[c] != raw_time:
+                conv["created_at"] = decode(created[c])
+            if updated[c] != raw_time:
+                conv["updated_at"] = decode(updated[c])
+            conv_extra = next(strings)
+            if conv_extra:
+                conv.update(json.loads(conv_extra))
+            messages = []
+            start, message_index = message_index, message_index + counts[c]
+            for i in range(start, message_index):
+                message = {"role": roles[i], "content": next(strings)}
+                timestamp = times[i]
+                if timestamp != raw_time:
+                    message["timestamp"] = decode(timestamp)
+                extra = next(strings)
+                if extra:
+                    message.update(json.loads(extra))
+                messages.append(message)
+            conv["messages"] = messages
+            conversations.append(conv)
+
+        data = dict(header["extra"])
+        data["conversations"] = conversations
+        return validate_document(data, encoded_times)
+
+
+SERIALIZERS = ("json", "json-pretty", "orjson", "msgspec", "binary")
+
+
+def get_serializer(name: str = "json") -> Serializer:
+    """
+    创建序列化器
+
+    Args:
+        name: "json"（默认）、"json-pretty"、"orjson"、"msgspec" 或 "binary"
+
+    Returns:
+        序列化器；可选依赖未安装时打印提示并使用 "json"
+
+    Raises:
+        ValueError: 不支持的序列化器
+    """
+    if name == "json":
+        return JsonSerializer()
+    if name == "json-pretty":
+        return JsonSerializer(indent=2)
+    if name == "binary":
+        return BinarySerializer()
+    if name in ("orjson", "msgspec"):
+        try:
+            return OrjsonSerializer() if name == "orjson" else MsgspecSerializer()
+        except ImportError as e:
+            print(f"{e}，改用标准库JSON")
+            return JsonSerializer()
+    raise ValueError(f"不支持的序列化器: {name}")
+
+
+def load_document(raw: bytes, serializer: Serializer = None, encoded_times: bool = False) -> Dict[str, Any]:
+    """
+    按内容识别格式并解码：二进制魔数开头时使用 BinarySerializer，否则按JSON解析
+
+    Args:
+        raw: 文件内容
+        serializer: 当前配置的序列化器，内容为JSON时优先使用它解码（例如 orjson）
+        encoded_times: 见 Serializer.loads()
+
+    Raises:
+        SchemaError: 内容无法解析或结构不正确
+    """
+    if raw.startswith(BinarySerializer.MAGIC):
+        return BinarySerializer().loads(raw, encoded_times)
+    if serializer is None or isinstance(serializer, BinarySerializer):
+        serializer = JsonSerializer()
+    return serializer.loads(raw, encoded_times)
@@ -2,16 +2,350 @@
 系统监控模块
 负责获取系统性能数据（CPU、内存、磁盘、网络等）
 """
+import asyncio
 import psutil
 import platform
-from typing import Dict, Any, List
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+from .timeseries import MetricStore
+from .process_tracker import get_process_tracker
+from .procfs import create_backend
+from .collectors import Collector, CollectorRegistry
 
 
-def get_status() -> Dict[str, Any]:
+def _cpu_busy_percent(t1, t2) -> float:
+    """
+    根据两次 cpu_times() 计算CPU使用率（与 psutil.cpu_percent 的算法一致）
+    
+    Args:
+        t1: 上一次的CPU时间
+        t2: 本次的CPU时间
+        
+    Returns:
+        CPU使用率 (%)
+    """
+    deltas = {field: max(0.0, getattr(t2, field) - getattr(t1, field)) for field in t2._fields}
+    total = sum(deltas.values())
+    # Linux上guest时间已计入user/nice，需要扣除
+    total -= deltas.get("guest", 0) + deltas.get("guest_nice", 0)
+    busy = total - deltas.get("idle", 0) - deltas.get("iowait", 0)
+    if total <= 0:
+        return 0.0
+    return round(busy / total * 100, 1)
+
+
+_NET_FIELDS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv",
+               "errin", "errout", "dropin", "dropout")
+_DISK_FIELDS = ("read_count", "write_count", "read_bytes", "write_bytes")
+
+
+def _counter_delta(previous: int, current: int) -> Optional[int]:
+    """
+    计算累计计数器的增量，处理32位回绕和计数器重置
+    
+    Args:
+        previous: 上一次的计数
+        current: 本次的计数
+        
+    Returns:
+        增量；计数器被重置（如网卡重新插拔）时返回None
+    """
+    if current >= previous:
+        return current - previous
+    # 上一次的值接近32位上限，视为回绕；否则视为计数器重置
+    if 2 ** 31 <= previous < 2 ** 32:
+        return current + 2 ** 32 - previous
+    return None
+
+
+class RateTracker:
+    """保存上一次的累计计数器，把网络/磁盘计数换算为每秒速率"""
+    
+    def __init__(self):
+        self._previous = {}
+        self._lock = threading.Lock()
+    
+    def update(self, group: str, counters: Dict[str, Any], fields: tuple,
+               now: float = None) -> Dict[str, Dict[str, float]]:
+        """
+        记录一组设备的累计计数器并计算速率
+        
+        Args:
+            group: 计数器分组名（如 "net"、"disk"）
+            counters: {设备名: psutil计数器namedtuple}
+            fields: 需要计算速率的字段
+            now: 单调时钟时间，默认为 time.monotonic()
+            
+        Returns:
+            {设备名: {字段: 每秒速率}}，首次出现或计数器被重置的设备不包含在内
+        """
+        if now is None:
+            now = time.monotonic()
+        rates = {}
+        with self._lock:
+            previous = self._previous.get(group, {})
+            current = {}
+            for name, counter in counters.items():
+                values = tuple(getattr(counter, field, 0) for field in fields)
+                current[name] = (now, values)
+                if name not in previous:
+                    continue
+                last_time, last_values = previous[name]
+                elapsed = now - last_time
+                if elapsed <= 0:
+                    continue
+                deltas = [_counter_delta(a, b) for a, b in zip(last_values, values)]
+                if any(delta is None for delta in deltas):
+                    continue
+                rates[name] = {field: round(delta / elapsed, 2) for field, delta in zip(fields, deltas)}
+            # 只保留本次出现的设备，拔出的网卡/磁盘自动清除
+            self._previous[group] = current
+        return rates
+
+
+# 内置采集器的默认刷新间隔（秒），0表示每次采样都刷新
+DEFAULT_INTERVALS = {
+    "cpu": 0,
+    "memory": 0,
+    "io": 0,
+    "disk": 5,
+    "processes": 10
+}
+
+# 采样线程启动后第一次采样前的等待（秒）：足够得到有意义的CPU使用率，又不让第一次 get_status() 等满一个间隔
+WARMUP_INTERVAL = 0.1
+
+# 内置采集器名称；自定义采集器的结果放在 details[名称] 下
+_BUILTIN_COLLECTORS = ("system", "cpu_count", "cpu", "memory", "disk", "io", "processes")
+
+# 容易被挂死的采集器（如 disk_usage 遇到失效的挂载点）在尚无任何结果时使用的占位值
+_PLACEHOLDER_VALUES = {
+    "disk": namedtuple("sdiskusage", "total used free percent")(0, 0, 0, 0.0),
+    "processes": 0
+}
+
+
+def _collect_system_info() -> Dict[str, str]:
+    """采集静态的系统信息"""
+    return {
+        "platform": platform.system(),
+        "platform_version": platform.version(),
+        "architecture": platform.machine(),
+        "processor": platform.processor()
+    }
+
+
+def _collect_cpu_count() -> Dict[str, int]:
+    """采集静态的CPU核心数"""
+    return {
+        "count_physical": psutil.cpu_count(logical=False),
+        "count_logical": psutil.cpu_count(logical=True)
+    }
+
+
+class Sampler:
+    """后台采样器：按固定节奏在后台线程中运行到期的采集器，供 get_status() 直接读取"""
+    
+    def __init__(self, interval: float = 1.0, history_size: int = 3600, backend: str = "auto",
+                 intervals: Dict[str, float] = None, timeout: float = 2.0, max_workers: int = 8):
+        """
+        初始化采样器
+        
+        Args:
+            interval: 采样间隔（秒）
+            history_size: 时间序列存储保留的采样次数
+            backend: 热点指标的数据源，"auto"、"procfs" 或 "psutil"（见 core.procfs）
+            intervals: 覆盖内置采集器的刷新间隔，如 {"disk": 30}
+            timeout: 单个采集器的默认超时时间（秒），超时后沿用上一次的值
+            max_workers: 并行执行采集器的线程数上限
+        """
+        self.interval = interval
+        self.backend = create_backend(backend)
+        self.store = MetricStore(history_size)
+        self.rates = RateTracker()
+        self.registry = CollectorRegistry(max_workers, timeout)
+        self._latest = None
+        self._last_cpu_times = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._register_builtin_collectors(intervals or {})
+    
+    def _register_builtin_collectors(self, intervals: Dict[str, float]):
+        """注册内置采集器；静态信息在此时采集一次"""
+        intervals = {**DEFAULT_INTERVALS, **intervals}
+        registry = self.registry
+        registry.register("system", _collect_system_info, static=True)
+        registry.register("cpu_count", _collect_cpu_count, static=True)
+        registry.register("cpu", self._collect_cpu, intervals["cpu"])
+        registry.register("memory", self.backend.virtual_memory, intervals["memory"])
+        registry.register("disk", lambda: psutil.disk_usage('/'), intervals["disk"])
+        registry.register("io", lambda: _collect_io(self.rates, self.backend), intervals["io"])
+        registry.register("processes", lambda: len(psutil.pids()), intervals["processes"])
+    
+    def register_collector(self, name: str, func, interval: float = 0.0, static: bool = False,
+                           timeout: float = None):
+        """
+        注册自定义采集器，结果出现在状态字典的 details[name] 中
+        
+        Args:
+            name: 采集器名称（不能与内置采集器重名）
+            func: 无参数的采集函数
+            interval: 刷新间隔（秒）
+            static: 是否只在注册时采集一次
+            timeout: 超时时间（秒），None表示使用采样器的默认值
+        """
+        if name in _BUILTIN_COLLECTORS:
+            raise ValueError(f"不能覆盖内置采集器: {name}")
+        return self.registry.register(name, func, interval, static, timeout)
+    
+    def unregister_collector(self, name: str) -> bool:
+        """注销自定义采集器"""
+        if name in _BUILTIN_COLLECTORS:
+            return False
+        return self.registry.unregister(name)
+    
+    def _collect_cpu(self) -> float:
+        """CPU使用率，按距上次采样的时间段计算"""
+        cpu_times = self.backend.cpu_times()
+        previous = self._last_cpu_times or cpu_times
+        self._last_cpu_times = cpu_times
+        return _cpu_busy_percent(previous, cpu_times)
+    
+    def start(self):
+        """启动后台采样线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._last_cpu_times is None:
+                self._last_cpu_times = self.backend.cpu_times()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = None):
+        """停止后台采样线程"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+    
+    @property
+    def running(self) -> bool:
+        """采样线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self):
+        """采样循环：启动后先以较短的间隔发布第一份快照，之后按 interval 采样"""
+        delay = min(self.interval, WARMUP_INTERVAL)
+        while not self._stop_event.wait(delay):
+            self.sample()
+            delay = self.interval
+    
+    def sample(self, force: bool = False) -> Dict[str, Any]:
+        """
+        立即采集一次（不阻塞），只运行到期的采集器
+        
+        Args:
+            force: 是否忽略刷新间隔，刷新全部非静态采集器
+        
+        Returns:
+            系统状态字典
+        """
+        with self._lock:
+            self.registry.wait(self.registry.submit(force))
+            return self._publish()
+    
+    async def sample_async(self, force: bool = False) -> Dict[str, Any]:
+        """
+        sample() 的协程版本，等待采集器期间不阻塞事件循环
+        
+        Args:
+            force: 是否忽略刷新间隔，刷新全部非静态采集器
+        
+        Returns:
+            系统状态字典
+        """
+        with self._lock:
+            pending = self.registry.submit(force)
+        await self.registry.wait_async(pending)
+        with self._lock:
+            return self._publish()
+    
+    def _publish(self) -> Dict[str, Any]:
+        """用采集器的最新值组装快照，更新最新结果并写入时间序列存储（调用方持有锁）"""
+        status = _assemble_status(self.registry.snapshot())
+        self._latest = status
+        if status.get("details"):
+            self.store.append(status)
+        self._ready.set()
+        return status
+    
+    def prime(self):
+        """以当前时刻为CPU和IO速率的基准，配合随后的 sample(force=True) 测量固定时间段"""
+        with self._lock:
+            self._collect_cpu()
+            _collect_io(self.rates, self.backend)
+    
+    def fresh_sample(self, interval: float = 1.0) -> Dict[str, Any]:
+        """
+        以当前时刻为基准等待interval秒，再刷新全部采集器，CPU与IO速率覆盖同一时间段
+        
+        Args:
+            interval: 测量时长（秒）
+            
+        Returns:
+            系统状态字典
+        """
+        try:
+            self.prime()
+        except Exception as e:
+            return _error_status(e)
+        time.sleep(interval)
+        return self.sample(force=True)
+    
+    async def fresh_sample_async(self, interval: float = 1.0) -> Dict[str, Any]:
+        """fresh_sample() 的协程版本，等待期间不阻塞事件循环"""
+        try:
+            self.prime()
+        except Exception as e:
+            return _error_status(e)
+        await asyncio.sleep(interval)
+        return await self.sample_async(force=True)
+    
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """获取最近一次的采样结果，尚未采样时返回None"""
+        return self._latest
+    
+    def wait_for_sample(self, timeout: float = None) -> Optional[Dict[str, Any]]:
+        """
+        等待第一次采样完成
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            最近一次的采样结果，超时返回None
+        """
+        self._ready.wait(timeout)
+        return self._latest
+
+
+def get_status(fresh: bool = False, block: bool = True) -> Dict[str, Any]:
     """
     获取系统状态信息
     
+    默认直接返回后台采样器的最新快照（首次调用时自动启动采样器），不再阻塞1秒。
+    
+    Args:
+        fresh: 为True时阻塞1秒测量CPU并刷新全部采集器，不受各采集器刷新间隔限制
+        block: 采样器尚无快照时是否等待第一次采样；为False时立即返回一次非阻塞采样
+    
     Returns:
         包含系统各项指标的字典:
         {
@@ -20,61 +354,125 @@ def get_status() -> Dict[str, Any]:
             "disk": float,          # 磁盘使用率 (%)
             "network_sent": int,    # 网络发送字节数
             "network_recv": int,    # 网络接收字节数
+            "network_sent_rate": float,  # 网络发送速率 (字节/秒)
+            "network_recv_rate": float,  # 网络接收速率 (字节/秒)
             "summary": str,         # 系统状态摘要
             "timestamp": str,       # 时间戳
             "details": dict         # 详细信息
         }
     """
+    sampler = get_sampler()
+    if fresh:
+        return sampler.fresh_sample()
+    
+    if not sampler.running:
+        sampler.start()
+    
+    status = sampler.latest()
+    if status is None and block:
+        status = sampler.wait_for_sample(sampler.interval * 2)
+    if status is None:
+        status = sampler.sample()
+    
+    # 返回浅拷贝，避免调用方修改共享快照的顶层字段
+    return dict(status)
+
+
+def _collect_io(rates: RateTracker, backend: Any = psutil) -> tuple:
+    """
+    一次性读取网卡和磁盘的累计计数器，并更新速率
+    
+    Args:
+        rates: 速率跟踪器
+        backend: 数据源（psutil模块或ProcfsCollector）
+        
+    Returns:
+        (pernic计数器, 网卡速率, 磁盘速率)
+    """
+    now = time.monotonic()
+    pernic = backend.net_io_counters(pernic=True) or {}
+    net_rates = rates.update("net", pernic, _NET_FIELDS, now)
+    try:
+        perdisk = psutil.disk_io_counters(perdisk=True) or {}
+    except Exception:
+        # 部分容器/平台无法读取磁盘IO计数
+        perdisk = {}
+    disk_rates = rates.update("disk", perdisk, _DISK_FIELDS, now)
+    return pernic, net_rates, disk_rates
+
+
+def _assemble_status(collectors: Dict[str, Collector]) -> Dict[str, Any]:
+    """
+    用各采集器的最新值组装系统状态字典
+    
+    Args:
+        collectors: {采集器名称: 采集器}
+        
+    Returns:
+        系统状态字典
+    """
     try:
+        values = {}
+        stale = []
+        for name, collector in collectors.items():
+            value = collector.value
+            if collector.stale:
+                stale.append(name)
+            if value is None and name in _PLACEHOLDER_VALUES:
+                value = _PLACEHOLDER_VALUES[name]
+            if value is None and name in _BUILTIN_COLLECTORS:
+                raise collector.error or RuntimeError(f"采集器 {name} 没有数据")
+            values[name] = value
+        
         # CPU信息
-        cpu_percent = psutil.cpu_percent(interval=1)
-        cpu_count = psutil.cpu_count(logical=False)
-        cpu_count_logical = psutil.cpu_count(logical=True)
+        cpu_percent = values["cpu"]
+        cpu_count = values["cpu_count"]
         
         # 内存信息
-        memory = psutil.virtual_memory()
+        memory = values["memory"]
         memory_percent = memory.percent
         memory_used = memory.used
         memory_total = memory.total
         
         # 磁盘信息
-        disk = psutil.disk_usage('/')
+        disk = values["disk"]
         disk_percent = disk.percent
         disk_used = disk.used
         disk_total = disk.total
         
-        # 网络信息
-        net_io = psutil.net_io_counters()
-        network_sent = net_io.bytes_sent
-        network_recv = net_io.bytes_recv
+        # 网络与磁盘IO信息（累计值与速率来自同一次读取）
+        pernic, net_rates, disk_rates = values["io"]
+        network_sent = sum(nic.bytes_sent for nic in pernic.values())
+        network_recv = sum(nic.bytes_recv for nic in pernic.values())
+        packets_sent = sum(nic.packets_sent for nic in pernic.values())
+        packets_recv = sum(nic.packets_recv for nic in pernic.values())
+        network_sent_rate = round(sum(r["bytes_sent"] for r in net_rates.values()), 2)
+        network_recv_rate = round(sum(r["bytes_recv"] for r in net_rates.values()), 2)
         
         # 进程信息
-        process_count = len(psutil.pids())
+        process_count = values["processes"]
         
         # 系统信息
-        system_info = {
-            "platform": platform.system(),
-            "platform_version": platform.version(),
-            "architecture": platform.machine(),
-            "processor": platform.processor()
-        }
+        system_info = values["system"]
         
         # 生成状态摘要
         summary = generate_summary(cpu_percent, memory_percent, disk_percent)
         
-        return {
+        status = {
             "cpu": round(cpu_percent, 2),
             "memory": round(memory_percent, 2),
             "disk": round(disk_percent, 2),
             "network_sent": network_sent,
             "network_recv": network_recv,
+            "network_sent_rate": network_sent_rate,
+            "network_recv_rate": network_recv_rate,
             "summary": summary,
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "details": {
                 "cpu": {
                     "percent": cpu_percent,
-                    "count_physical": cpu_count,
-                    "count_logical": cpu_count_logical
+                    "count_physical": cpu_count["count_physical"],
+                    "count_logical": cpu_count["count_logical"]
                 },
                 "memory": {
                     "percent": memory_percent,
@@ -91,24 +489,87 @@ def get_status() -> Dict[str, Any]:
                 "network": {
                     "bytes_sent": network_sent,
                     "bytes_recv": network_recv,
-                    "packets_sent": net_io.packets_sent,
-                    "packets_recv": net_io.packets_recv
+                    "packets_sent": packets_sent,
+                    "packets_recv": packets_recv,
+                    "bytes_sent_per_sec": network_sent_rate,
+                    "bytes_recv_per_sec": network_recv_rate
+                },
+                "network_io": {
+                    name: {f"{field}_per_sec": value for field, value in nic.items()}
+                    for name, nic in net_rates.items()
+                },
+                "disk_io": {
+                    name: {
+                        "read_iops": counters["read_count"],
+                        "write_iops": counters["write_count"],
+                        "read_bytes_per_sec": counters["read_bytes"],
+                        "write_bytes_per_sec": counters["write_bytes"]
+                    }
+                    for name, counters in disk_rates.items()
                 },
                 "process_count": process_count,
-                "system": system_info
+                "system": system_info,
+                "stale": stale
             }
         }
+        
+        # 自定义采集器
+        for name, value in values.items():
+            if name not in _BUILTIN_COLLECTORS:
+                status["details"][name] = value
+        return status
     except Exception as e:
-        return {
-            "cpu": 0,
-            "memory": 0,
-            "disk": 0,
-            "network_sent": 0,
-            "network_recv": 0,
-            "summary": f"获取系统状态失败: {str(e)}",
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "details": {}
-        }
+        return _error_status(e)
+
+
+def _error_status(e: Exception) -> Dict[str, Any]:
+    """采集失败时返回的状态字典"""
+    return {
+        "cpu": 0,
+        "memory": 0,
+        "disk": 0,
+        "network_sent": 0,
+        "network_recv": 0,
+        "network_sent_rate": 0,
+        "network_recv_rate": 0,
+        "summary": f"获取系统状态失败: {str(e)}",
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "details": {}
+    }
+
+
+# 默认采样器实例
+_default_sampler = None
+
+def get_sampler(interval: float = 1.0, backend: str = "auto", intervals: Dict[str, float] = None) -> Sampler:
+    """获取默认的采样器实例"""
+    global _default_sampler
+    if _default_sampler is None:
+        _default_sampler = Sampler(interval, backend=backend, intervals=intervals)
+    return _default_sampler
+
+
+def register_collector(name: str, func, interval: float = 0.0, static: bool = False,
+                       timeout: float = None) -> Collector:
+    """
+    向默认采样器注册自定义采集器
+    
+    Args:
+        name: 采集器名称，结果出现在 get_status()["details"][name]
+        func: 无参数的采集函数
+        interval: 刷新间隔（秒），0表示每次采样都刷新
+        static: 是否只在注册时采集一次
+        timeout: 超时时间（秒），超时后沿用上一次的值并出现在 details["stale"] 中
+        
+    Returns:
+        注册的采集器
+    """
+    return get_sampler().register_collector(name, func, interval, static, timeout)
+
+
+def get_metric_store() -> MetricStore:
+    """获取默认采样器的时间序列存储"""
+    return get_sampler().store
 
 
 def generate_summary(cpu: float, memory: float, disk: float) -> str:
@@ -146,33 +607,21 @@ def generate_summary(cpu: float, memory: float, disk: float) -> str:
         return "注意: " + "、".join(issues)
 
 
-def get_top_processes(limit: int = 5) -> List[Dict[str, Any]]:
+def get_top_processes(limit: int = 5, sort_by: str = "cpu") -> List[Dict[str, Any]]:
     """
     获取占用资源最多的进程
     
+    进程对象在调用之间持续复用（见 ProcessTracker），CPU使用率以上一次调用为基准。
+    
     Args:
         limit: 返回的进程数量
+        sort_by: 排序依据，"cpu"、"rss"、"io" 或 "fds"
         
     Returns:
         进程信息列表
     """
     try:
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                pinfo = proc.info
-                processes.append({
-                    'pid': pinfo['pid'],
-                    'name': pinfo['name'],
-                    'cpu': pinfo['cpu_percent'],
-                    'memory': pinfo['memory_percent']
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        # 按CPU使用率排序
-        processes.sort(key=lambda x: x['cpu'], reverse=True)
-        return processes[:limit]
+        return get_process_tracker().top(limit, sort_by)
     except Exception as e:
         print(f"获取进程信息失败: {e}")
         return []
@@ -206,10 +655,34 @@ def get_system_uptime() -> str:
         return f"获取失败: {e}"
 
 
+# 告警指标对应的中文名称
+ALERT_LABELS = {
+    "cpu": "CPU使用率",
+    "memory": "内存使用率",
+    "disk": "磁盘使用率"
+}
+
+
+def format_alert(metric: str, value: float) -> str:
+    """
+    生成告警文本
+    
+    Args:
+        metric: 指标名（"cpu"、"memory"、"disk"）
+        value: 指标值
+        
+    Returns:
+        告警文本，如 "⚠️ CPU使用率过高: 85%"
+    """
+    return f"⚠️ {ALERT_LABELS.get(metric, metric)}过高: {value}%"
+
+
 def check_alerts(status: Dict[str, Any], thresholds: Dict[str, float] = None) -> List[str]:
     """
     检查是否有需要告警的指标
     
+    这是无状态的单点检查；需要迟滞、持续时长或变化率条件时请使用 core.alert_rules.AlertEngine。
+    
     Args:
         status: 系统状态字典
         thresholds: 告警阈值字典
@@ -226,13 +699,8 @@ def check_alerts(status: Dict[str, Any], thresholds: Dict[str, float] = None) ->
     
     alerts = []
     
-    if status.get("cpu", 0) > thresholds["cpu"]:
-        alerts.append(f"⚠️ CPU使用率过高: {status['cpu']}%")
-    
-    if status.get("memory", 0) > thresholds["memory"]:
-        alerts.append(f"⚠️ 内存使用率过高: {status['memory']}%")
-    
-    if status.get("disk", 0) > thresholds["disk"]:
-        alerts.append(f"⚠️ 磁盘使用率过高: {status['disk']}%")
+    for metric in ALERT_LABELS:
+        if status.get(metric, 0) > thresholds[metric]:
+            alerts.append(format_alert(metric, status[metric]))
     
     return alerts
@@ -0,0 +1,281 @@
+"""
+时间序列存储模块
+以固定容量的环形缓冲区保存最近N次采样的全部数值指标，支持滚动窗口统计
+"""
+import math
+import random
+import threading
+import time
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时使用纯Python实现
+    np = None
+
+
+_NAN = float("nan")
+
+
+def flatten_metrics(status: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """
+    将系统状态字典展开为 {指标名: 数值} 形式，嵌套键以"."连接
+
+    Args:
+        status: 系统状态字典（来自get_status()）
+        prefix: 键名前缀
+
+    Returns:
+        指标字典，如 {"cpu": 12.5, "details.memory.used": 123456}
+    """
+    result = {}
+    for key, value in status.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            result[name] = float(value)
+        elif isinstance(value, dict):
+            result.update(flatten_metrics(value, name + "."))
+    return result
+
+
+def _select(values: List[float], k: int) -> float:
+    """快速选择：平均O(n)求第k小的值（k从0开始）"""
+    while True:
+        if len(values) == 1:
+            return values[0]
+        pivot = values[random.randrange(len(values))]
+        lows = [v for v in values if v < pivot]
+        if k < len(lows):
+            values = lows
+            continue
+        pivots = len(values) - len(lows) - sum(1 for v in values if v > pivot)
+        if k < len(lows) + pivots:
+            return pivot
+        k -= len(lows) + pivots
+        values = [v for v in values if v > pivot]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """
+    计算百分位数（线性插值，与numpy.percentile默认行为一致）
+
+    Args:
+        values: 非空数值列表
+        q: 百分位（0-100）
+
+    Returns:
+        百分位数值
+    """
+    position = (len(values) - 1) * q / 100.0
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+    low_value = _select(values, lower)
+    if upper == lower or position == lower:
+        return low_value
+    high_value = _select(values, upper)
+    return low_value + (high_value - low_value) * (position - lower)
+
+
+class MetricStore:
+    """固定容量的指标环形缓冲区，每个指标一列 array('d')，内存占用恒定"""
+
+    def __init__(self, capacity: int = 3600):
+        """
+        初始化存储
+
+        Args:
+            capacity: 保存的最大采样次数
+        """
+        self.capacity = capacity
+        self._timestamps = array('d', [_NAN]) * capacity
+        self._columns: Dict[str, array] = {}
+        self._last_seen: Dict[str, int] = {}
+        self._count = 0
+        # 默认时间戳 = 创建时的墙上时间 + 单调时钟的流逝，系统时间被NTP向回调整时仍然单调递增
+        self._epoch = time.time() - time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def metrics(self) -> List[str]:
+        """获取当前保存的指标名列表"""
+        return list(self._columns)
+
+    def append(self, status: Dict[str, Any], timestamp: float = None):
+        """
+        写入一次采样
+
+        Args:
+            status: 系统状态字典或已展开的指标字典
+            timestamp: 采样时间（Unix时间戳），默认为当前时间（按单调时钟推算）；
+                       早于上一次采样时按上一次的时间记录，保证时间列有序
+        """
+        if timestamp is None:
+            timestamp = self._epoch + time.monotonic()
+        values = flatten_metrics(status)
+
+        with self._lock:
+            seq = self._count
+            slot = seq % self.capacity
+            if seq:
+                # 窗口查询对时间列二分查找，不能出现倒退
+                timestamp = max(timestamp, self._timestamps[(seq - 1) % self.capacity])
+            self._timestamps[slot] = timestamp
+
+            for name, value in values.items():
+                column = self._columns.get(name)
+                if column is None:
+                    column = array('d', [_NAN]) * self.capacity
+                    self._columns[name] = column
+                column[slot] = value
+                self._last_seen[name] = seq
+
+            # 本次未出现的指标写入NaN；整个缓冲区周期内都未出现的指标直接删除
+            for name in list(self._columns):
+                if name in values:
+                    continue
+                if seq - self._last_seen[name] >= self.capacity:
+                    del self._columns[name]
+                    del self._last_seen[name]
+                else:
+                    self._columns[name][slot] = _NAN
+
+            self._count = seq + 1
+
+    def _range(self, seconds: float = None, count: int = None) -> Tuple[int, int]:
+        """
+        计算窗口对应的采样序号区间 [start, end)
+
+        Args:
+            seconds: 时间窗口（秒），相对于最新一次采样
+            count: 最近的采样次数
+        """
+        end = self._count
+        start = max(0, end - self.capacity)
+        if count is not None:
+            start = max(start, end - count)
+        if seconds is not None and end > start:
+            capacity = self.capacity
+            timestamps = self._timestamps
+            cutoff = timestamps[(end - 1) % capacity] - seconds
+            # 时间戳单调递增，二分查找窗口起点
+            low, high = start, end
+            while low < high:
+                mid = (low + high) // 2
+                if timestamps[mid % capacity] < cutoff:
+                    low = mid + 1
+                else:
+                    high = mid
+            start = low
+        return start, end
+
+    def _slice(self, column: array, start: int, end: int) -> array:
+        """按序号区间取出环形缓冲区中的数据（最多拼接两段）"""
+        if end <= start:
+            return array('d')
+        a = start % self.capacity
+        b = a + (end - start)
+        if b <= self.capacity:
+            return column[a:b]
+        return column[a:] + column[:b - self.capacity]
+
+    def series(self, metric: str, seconds: float = None, count: int = None) -> Tuple[List[float], List[float]]:
+        """
+        获取指标在窗口内的时间序列
+
+        Args:
+            metric: 指标名，如 "cpu"、"details.memory.used"
+            seconds: 时间窗口（秒）
+            count: 最近的采样次数
+
+        Returns:
+            (timestamps, values)，已去除缺失值
+        """
+        with self._lock:
+            column = self._columns.get(metric)
+            if column is None:
+                return [], []
+            start, end = self._range(seconds, count)
+            timestamps = self._slice(self._timestamps, start, end)
+            values = self._slice(column, start, end)
+        pairs = [(t, v) for t, v in zip(timestamps, values) if v == v]
+        return [t for t, _ in pairs], [v for _, v in pairs]
+
+    def values(self, metric: str, seconds: float = None, count: int = None) -> List[float]:
+        """获取指标在窗口内的取值列表（已去除缺失值）"""
+        return self.series(metric, seconds, count)[1]
+
+    def stats(self, metric: str, seconds: float = None, count: int = None) -> Optional[Dict[str, float]]:
+        """
+        计算指标在窗口内的滚动统计
+
+        Args:
+            metric: 指标名
+            seconds: 时间窗口（秒）
+            count: 最近的采样次数
+
+        Returns:
+            {"count", "min", "max", "mean", "p95", "p99"}，窗口内无数据时返回None
+        """
+        values = self.values(metric, seconds, count)
+        if not values:
+            return None
+
+        if np is not None:
+            data = np.asarray(values)
+            p95, p99 = np.percentile(data, [95, 99])
+            return {
+                "count": len(values),
+                "min": float(data.min()),
+                "max": float(data.max()),
+                "mean": float(data.mean()),
+                "p95": float(p95),
+                "p99": float(p99)
+            }
+
+        return {
+            "count": len(values),
+            "min": min(values),
+            "max": max(values),
+            "mean": math.fsum(values) / len(values),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99)
+        }
+
+    def percentile(self, metric: str, q: float, seconds: float = None, count: int = None) -> Optional[float]:
+        """计算指标在窗口内的百分位数，窗口内无数据时返回None"""
+        values = self.values(metric, seconds, count)
+        if not values:
+            return None
+        if np is not None:
+            return float(np.percentile(np.asarray(values), q))
+        return _percentile(values, q)
+
+    def rate(self, metric: str, seconds: float = None, count: int = None) -> Optional[float]:
+        """
+        计算指标在窗口内的变化率（每秒）
+
+        Args:
+            metric: 指标名
+            seconds: 时间窗口（秒）
+            count: 最近的采样次数
+
+        Returns:
+            (末值 - 首值) / 时间跨度，数据不足时返回None
+        """
+        timestamps, values = self.series(metric, seconds, count)
+        if len(values) < 2 or timestamps[-1] <= timestamps[0]:
+            return None
+        return (values[-1] - values[0]) / (timestamps[-1] - timestamps[0])
+
+    def clear(self):
+        """清空所有数据"""
+        with self._lock:
+            self._timestamps = array('d', [_NAN]) * self.capacity
+            self._columns.clear()
+            self._last_seen.clear()
+            self._count = 0